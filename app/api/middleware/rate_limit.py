@@ -0,0 +1,167 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Optional
+
+from app.core.adaptive import adaptive_limits
+from app.core.base import RateLimitDecision
+from app.core.composite import CompositeTokenBucketRateLimiter
+from app.core.decision_log import decision_log
+from app.core.key_builder import build_user_scoped_rate_limit_key
+from app.core.metrics import rate_limit_shadow_checks
+from app.core.policies import Policy, PolicyEngine
+
+logger = logging.getLogger(__name__)
+
+USER_ID_HEADER = b"user_id"
+
+
+def _build_body(detail: str) -> tuple[list[tuple[bytes, bytes]], dict]:
+    body = json.dumps({"detail": detail}).encode()
+    headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    return headers, {"type": "http.response.body", "body": body}
+
+
+def _build_response(status_code: int, detail: str) -> tuple[dict, dict]:
+    headers, body = _build_body(detail)
+    return {"type": "http.response.start", "status": status_code, "headers": headers}, body
+
+
+def _encode_headers(decision: RateLimitDecision) -> list[tuple[bytes, bytes]]:
+    return [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in decision.headers()]
+
+
+MISSING_USER_ID_RESPONSE = _build_response(400, "user_id header is required")
+# Every 429 carries the same body; only the rate limit headers differ per decision
+RATE_LIMITED_HEADERS, RATE_LIMITED_BODY = _build_body("Rate limit exceeded. Please try again later.")
+
+
+class RateLimitMiddleware:
+    """Raw ASGI middleware enforcing the matching rate limit policy before FastAPI routing.
+
+    Requests no policy matches pass straight through. Each policy limits every
+    user separately, under a key scoped by the policy name.
+    """
+
+    def __init__(self, app, engine: PolicyEngine):
+        self.app = app
+        self.engine = engine
+
+    @staticmethod
+    def _rejection_response(decision: RateLimitDecision, retry_after_seconds: int) -> tuple[dict, dict]:
+        headers = _encode_headers(decision)
+        if decision.retry_after_seconds is None:
+            # Limiters without a check_request of their own cannot say; use the policy's hint
+            headers.append((b"retry-after", str(retry_after_seconds).encode()))
+        start = {"type": "http.response.start", "status": 429, "headers": [*RATE_LIMITED_HEADERS, *headers]}
+        return start, RATE_LIMITED_BODY
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        engine = self.engine
+        wanted = engine.header_names
+        user_id = None
+        headers = {}
+        for name, value in scope["headers"]:
+            if name == USER_ID_HEADER:
+                user_id = value.decode("latin-1")
+            elif wanted:
+                decoded_name = name.decode("latin-1")
+                if decoded_name in wanted:
+                    headers[decoded_name] = value.decode("latin-1")
+
+        index = engine.index
+        policy = index.match(scope["path"], scope["method"], headers)
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not user_id:
+            logger.warning("Rate limit check attempted without user_id header")
+            await self._send(send, MISSING_USER_ID_RESPONSE)
+            return
+
+        # A reload closes this index's retired limiters only once no check is using them
+        index.in_flight += 1
+        try:
+            if policy.shadow is None:
+                decision = await self._check(policy, user_id, headers)
+            else:
+                # Shadow rules need micro-batching, so both checks go out in one pipeline
+                decision, shadow_decision = await asyncio.gather(
+                    self._check(policy, user_id, headers),
+                    self._shadow_check(policy.shadow, user_id, headers)
+                )
+                self._record_shadow(policy, user_id, decision, shadow_decision)
+        finally:
+            index.in_flight -= 1
+
+        if not decision.allowed:
+            decision_log.record("rejected", policy=policy.name, user_id=user_id, tier=decision.rejected_tier,
+                                retry_after_seconds=decision.retry_after_seconds)
+            await self._send(send, self._rejection_response(decision, policy.retry_after_seconds))
+            return
+
+        rate_limit_headers = _encode_headers(decision)
+        # The adaptive limit controller judges the upstream by how long it takes to start responding
+        observe = adaptive_limits.observe if adaptive_limits.enabled else None
+        if not rate_limit_headers and observe is None:
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                if observe is not None:
+                    observe(policy.name, time.perf_counter() - started)
+                if rate_limit_headers:
+                    message = {**message, "headers": [*message.get("headers", ()), *rate_limit_headers]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+    async def _check(self, policy: Policy, user_id: str, headers: dict[str, str]) -> RateLimitDecision:
+        limiter = policy.limiter
+        if isinstance(limiter, CompositeTokenBucketRateLimiter):
+            tenant_id = headers.get(self.engine.tenant_header)
+            return await limiter.check(limiter.keys_for(policy.name, user_id, tenant_id))
+
+        key = build_user_scoped_rate_limit_key(user_id, policy.name)
+        if policy.cost is not None:
+            return await limiter.check_request(key, policy.cost.for_request(headers))
+        return await limiter.check_request(key)
+
+    async def _shadow_check(self, shadow: Policy, user_id: str,
+                            headers: dict[str, str]) -> Optional[RateLimitDecision]:
+        try:
+            return await self._check(shadow, user_id, headers)
+        except Exception as e:
+            # Shadow limits never affect the response
+            logger.debug(f"Shadow check for policy '{shadow.name}' failed: {e}")
+            return None
+
+    @staticmethod
+    def _record_shadow(policy: Policy, user_id: str, decision: RateLimitDecision,
+                       shadow_decision: Optional[RateLimitDecision]) -> None:
+        enforced = "allowed" if decision.allowed else "rejected"
+        if shadow_decision is None:
+            rate_limit_shadow_checks.labels(policy=policy.name, enforced=enforced, shadow="error").inc()
+            return
+
+        shadow = "allowed" if shadow_decision.allowed else "rejected"
+        rate_limit_shadow_checks.labels(policy=policy.name, enforced=enforced, shadow=shadow).inc()
+        if shadow != enforced:
+            decision_log.record("shadow_" + shadow, policy=policy.name, user_id=user_id,
+                                tier=shadow_decision.rejected_tier,
+                                retry_after_seconds=shadow_decision.retry_after_seconds)
+
+    @staticmethod
+    async def _send(send, response: tuple[dict, dict]):
+        start, body = response
+        await send(start)
+        await send(body)
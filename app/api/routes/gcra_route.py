@@ -0,0 +1,16 @@
+import socket
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+router = APIRouter(tags=["rate-limited"])
+
+
+@router.get("/gcra")
+async def rate_limited_endpoint():
+    return JSONResponse(
+        content={
+            "message": "Request successful",
+            "handled_by": socket.gethostname()
+        }
+    )
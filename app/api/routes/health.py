@@ -1,6 +1,8 @@
 from fastapi import APIRouter, status
 from fastapi.responses import JSONResponse
 
+from app.config import settings
+from app.database.circuit_breaker import CLOSED
 from app.database.redis import redis_connection
 
 router = APIRouter(tags=["health"])
@@ -8,13 +10,24 @@ router = APIRouter(tags=["health"])
 
 @router.get("/health")
 async def health_check():
-    is_healthy = redis_connection.async_client is not None and 'token_bucket' in redis_connection.script_shas
+    is_healthy = settings.rate_limiter_backend == "memory" or (
+        redis_connection.async_client is not None and 'token_bucket' in redis_connection.script_shas)
+    breaker = redis_connection.breaker
+
+    # A tripped breaker still serves traffic from the local fallback limiters, so it
+    # degrades the status without failing the check (and draining every replica)
+    health_status = "healthy" if is_healthy else "unhealthy"
+    if is_healthy and breaker is not None and breaker.state != CLOSED:
+        health_status = "degraded"
 
     return JSONResponse(
         status_code=status.HTTP_200_OK if is_healthy else status.HTTP_503_SERVICE_UNAVAILABLE,
         content={
-            "status": "healthy" if is_healthy else "unhealthy",
+            "status": health_status,
+            "backend": settings.rate_limiter_backend,
+            "redis_mode": settings.redis_mode,
             "redis_connected": redis_connection.async_client is not None,
-            "scripts_loaded": list(redis_connection.script_shas.keys())
+            "scripts_loaded": list(redis_connection.script_shas.keys()),
+            "circuit_breaker": breaker.snapshot() if breaker is not None else None
         }
     )
@@ -1,14 +1,12 @@
 import socket
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter
 from fastapi.responses import JSONResponse
 
-from app.api.routes.dependencies.sliding_window_counter_dependency import enforce_sliding_window_counter_rate_limit
-
 router = APIRouter(tags=["rate-limited"])
 
 
-@router.get("/sliding-window-counter", dependencies=[Depends(enforce_sliding_window_counter_rate_limit)])
+@router.get("/sliding-window-counter")
 async def rate_limited_endpoint():
     return JSONResponse(
         content={
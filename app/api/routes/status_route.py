@@ -0,0 +1,79 @@
+import logging
+
+import redis
+from fastapi import APIRouter, HTTPException, Request, status
+
+from app.config import settings
+from app.core.composite import CompositeTokenBucketRateLimiter
+from app.core.factory import get_policy_engine
+from app.core.key_builder import build_user_scoped_rate_limit_key
+from app.database.redis import read_key_state, redis_connection
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["status"])
+
+
+@router.get("/rate-limit/status")
+async def rate_limit_status(request: Request, path: str, method: str = "GET"):
+    """The policy a request to ``path`` would be checked against, and the caller's stored state for it.
+
+    Read-only: nothing is consumed. With ``redis_read_from_replicas`` the state
+    comes from a replica and can lag the primary by the replication delay.
+    """
+    user_id = request.headers.get("user_id")
+    if not user_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="user_id header is required"
+        )
+
+    engine = get_policy_engine()
+    headers = {name: request.headers[name] for name in engine.header_names if name in request.headers}
+    policy = engine.match(path, method.upper(), headers)
+    if policy is None:
+        return {"path": path, "method": method.upper(), "policy": None}
+
+    keys = []
+    for checked in (policy, policy.shadow):
+        if checked is None:
+            continue
+        limiter = checked.limiter
+        if isinstance(limiter, CompositeTokenBucketRateLimiter):
+            keys.extend(key for key in limiter.keys_for(checked.name, user_id, headers.get(engine.tenant_header))
+                        if key)
+        else:
+            keys.append(build_user_scoped_rate_limit_key(user_id, checked.name))
+
+    state = None
+    if settings.rate_limiter_backend == "redis":
+        if redis_connection.read_client is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Redis connection not available"
+            )
+        try:
+            state = {key: await read_key_state(key) for key in keys}
+        except redis.exceptions.RedisError as e:
+            logger.error(f"Rate limit status read failed for user: {user_id}: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Redis connection not available"
+            )
+
+    return {
+        "path": path,
+        "method": method.upper(),
+        "policy": {
+            "name": policy.name,
+            "algorithm": policy.algorithm,
+            "params": policy.params,
+            # Share of the configured limits enforced right now (below 1 while adaptive limits back off)
+            "limit_multiplier": policy.limiter.limit_multiplier,
+            "shadow": {
+                "algorithm": policy.shadow.algorithm,
+                "params": policy.shadow.params,
+            } if policy.shadow is not None else None,
+        },
+        "state": state,
+    }
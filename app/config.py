@@ -1,35 +1,209 @@
+from typing import Optional
+
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
     # Redis configuration
-    # redis_host: str
-    # redis_port: int
     redis_db: int = 0
     redis_password: str
-    redis_host_node_1: str
-    redis_port_node_1: int
-    redis_host_node_2: str
-    redis_port_node_2: int
-    redis_host_node_3: str
-    redis_port_node_3: int
-    redis_host_node_4: str
-    redis_port_node_4: int
-    redis_host_node_5: str
-    redis_port_node_5: int
-    redis_host_node_6: str
-    redis_port_node_6: int
+    # Topology: "cluster", "standalone" or "sentinel"
+    redis_mode: str = "cluster"
+    # Comma-separated host:port list: cluster startup nodes (any number), the
+    # standalone server, or the sentinels
+    redis_nodes: str = ""
+    redis_sentinel_master: str = "mymaster"
+    # Legacy six-node cluster settings, used when redis_nodes is empty
+    redis_host_node_1: Optional[str] = None
+    redis_port_node_1: Optional[int] = None
+    redis_host_node_2: Optional[str] = None
+    redis_port_node_2: Optional[int] = None
+    redis_host_node_3: Optional[str] = None
+    redis_port_node_3: Optional[int] = None
+    redis_host_node_4: Optional[str] = None
+    redis_port_node_4: Optional[int] = None
+    redis_host_node_5: Optional[str] = None
+    redis_port_node_5: Optional[int] = None
+    redis_host_node_6: Optional[str] = None
+    redis_port_node_6: Optional[int] = None
+
+    # Connection pool of each node, per process: size it to the checks one uvicorn
+    # worker has in flight against a node, not to the whole deployment
+    redis_max_connections_per_node: int = 300
+    # Standalone mode: how long a call waits for a free connection at the cap
+    redis_pool_timeout_ms: int = 100
+    redis_socket_timeout_ms: int = 1000
+    redis_socket_connect_timeout_ms: int = 500
+    redis_health_check_interval_seconds: int = 30
+    # Serve read-only status queries from replicas (cluster and sentinel modes)
+    redis_read_from_replicas: bool = False
+
+    # Fraction of checks that log their slot/node attribution (0 disables it)
+    cluster_diagnostics_sample_rate: float = 0.0
+
+    # Limiter state backend: "redis" (shared) or "memory" (per process)
+    rate_limiter_backend: str = "redis"
+
+    # Let the Lua scripts read Redis TIME instead of each replica's clock
+    rate_limiter_use_redis_time: bool = False
+
+    # Micro-batching of script calls into per-node pipelines
+    redis_batching_enabled: bool = False
+    redis_batch_window_us: int = 200
+    redis_batch_max_size: int = 128
+    redis_batch_max_queue_depth: int = 10000
+    redis_batch_max_wait_ms: int = 250
+
+    # Circuit breaker around Redis script calls; while open, checks go to a local
+    # fallback limiter holding 1/circuit_breaker_fallback_worker_count of each limit
+    # (defaults to every worker process in the deployment, see server_replicas)
+    circuit_breaker_enabled: bool = True
+    circuit_breaker_window_size: int = 100
+    circuit_breaker_minimum_calls: int = 20
+    circuit_breaker_failure_rate: float = 0.5
+    circuit_breaker_slow_call_ms: int = 250
+    circuit_breaker_slow_call_rate: float = 0.8
+    circuit_breaker_open_seconds: float = 5.0
+    circuit_breaker_half_open_probes: int = 3
+    circuit_breaker_fallback_worker_count: Optional[int] = None
+
+    # Token bucket lease mode: workers spend leased slices of each bucket locally
+    token_bucket_lease_enabled: bool = False
+    token_bucket_lease_fraction: float = 0.1
+    token_bucket_lease_ttl_ms: int = 1000
+    # Smallest lease worth a Redis call, capped at the bucket size
+    token_bucket_lease_min_tokens: int = 4
+
+    # Hybrid limiter: local admission with periodic Redis reconciliation; each
+    # worker admits 1/hybrid_worker_count of a limit between syncs (defaults to
+    # every worker process in the deployment, see server_replicas)
+    hybrid_worker_count: Optional[int] = None
+    hybrid_sync_interval_ms: int = 100
+    hybrid_error_bound: float = 0.1
+
+    # Declarative per-route/tenant limits, re-read when the file changes (0 disables reloads)
+    rate_limit_policy_file: str = "app/policies.yaml"
+    rate_limit_policy_reload_seconds: float = 5.0
+    rate_limit_tenant_header: str = "tenant_id"
+
+    # Sampled, rate-bounded log of rejections and shadow-limit disagreements,
+    # written to the app.decisions logger off the request path
+    decision_log_enabled: bool = True
+    decision_log_sample_rate: float = 0.01
+    decision_log_max_per_second: float = 100.0
+    decision_log_queue_size: int = 10000
+
+    # Logging pipeline: records are queued and written by a background thread.
+    # Below WARNING, each message type (logger + unformatted message) is sampled
+    # by log_sample_rate (or a per-logger rate from log_sample_rates, e.g.
+    # "app.core=0.01,app.database=1"); every type is capped at
+    # log_max_per_second_per_message, with up to one second of burst
+    log_level: str = "INFO"
+    log_format: str = "json"
+    log_async: bool = True
+    log_queue_size: int = 10000
+    log_sample_rate: float = 1.0
+    log_sample_rates: str = ""
+    log_max_per_second_per_message: float = 10.0
+
+    # Adaptive limits: every interval each worker judges each policy overloaded when
+    # more than adaptive_slow_share of its upstream responses (time to response
+    # head) or of its algorithm's checks were slower than their targets, or the
+    # Redis circuit breaker is open. Multipliers on the configured limits shrink by
+    # adaptive_decrease_factor while any worker sees overload and recover by
+    # adaptive_increase_step otherwise; they are shared through one Redis key
+    adaptive_limits_enabled: bool = False
+    adaptive_interval_seconds: float = 5.0
+    adaptive_upstream_latency_target_ms: float = 250.0
+    adaptive_check_latency_target_ms: float = 25.0
+    adaptive_slow_share: float = 0.1
+    adaptive_min_samples: int = 20
+    adaptive_decrease_factor: float = 0.8
+    adaptive_increase_step: float = 0.05
+    adaptive_min_multiplier: float = 0.2
+
+    # Per-worker cache of keys known to be rejected until a given time
+    rejection_cache_enabled: bool = True
+    rejection_cache_capacity: int = 10000
+    rejection_cache_max_ttl_seconds: float = 60.0
+
+    # Bounded tracking of the hottest keys exposed on /metrics
+    metrics_hot_keys_top_k: int = 20
+    metrics_hot_keys_capacity: int = 1000
+
+    # Buffer hot-path metric updates locally and flush every N ms (0 disables it)
+    metrics_buffer_flush_ms: int = 0
+
+    # Serving with python -m app.serve: uvicorn worker processes per container. Each
+    # worker has its own Redis pools and loads scripts and builds limiters at startup
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: int = 1
+    # Containers behind the load balancer (deploy.replicas in docker-compose.yml);
+    # settings that split a limit across workers count server_replicas x server_workers
+    server_replicas: int = 3
+    # Prometheus multiprocess files when server_workers > 1 (emptied at startup)
+    metrics_multiprocess_dir: str = "/tmp/rate_limiter_metrics"
+    # How often each worker copies its scrape-time metrics into the multiprocess files
+    metrics_multiprocess_sample_seconds: float = 5.0
 
     # Application settings
     app_name: str = "100k Rate Limiter"
     app_version: str = "1.0.0"
     debug: bool = False
 
+    @model_validator(mode="after")
+    def derive_worker_counts(self) -> "Settings":
+        workers = max(1, self.server_replicas) * max(1, self.server_workers)
+        for name in ("circuit_breaker_fallback_worker_count", "hybrid_worker_count"):
+            count = getattr(self, name)
+            if count is None:
+                setattr(self, name, workers)
+            elif count < self.server_workers:
+                # One container alone runs server_workers processes sharing the limit
+                raise ValueError(f"{name}={count} is below server_workers={self.server_workers}; "
+                                 f"it counts every worker process in the deployment")
+        return self
+
+    @property
+    def redis_node_addresses(self) -> list[tuple[str, int]]:
+        if self.redis_nodes.strip():
+            addresses = []
+            for node in self.redis_nodes.split(","):
+                host, _, port = node.strip().rpartition(":")
+                addresses.append((host, int(port)))
+            return addresses
+
+        legacy = [
+            (self.redis_host_node_1, self.redis_port_node_1),
+            (self.redis_host_node_2, self.redis_port_node_2),
+            (self.redis_host_node_3, self.redis_port_node_3),
+            (self.redis_host_node_4, self.redis_port_node_4),
+            (self.redis_host_node_5, self.redis_port_node_5),
+            (self.redis_host_node_6, self.redis_port_node_6),
+        ]
+        return [(host, port) for host, port in legacy if host and port]
+
     @property
     def redis_url(self) -> str:
+        # First configured node (a sentinel in sentinel mode)
+        addresses = self.redis_node_addresses
+        if not addresses:
+            raise ValueError("No Redis nodes configured")
+        host, port = addresses[0]
         if self.redis_password:
-            return f"redis://:{self.redis_password}@{self.redis_host}:{self.redis_port}/{self.redis_db}"
-        return f"redis://{self.redis_host}:{self.redis_port}/{self.redis_db}"
+            return f"redis://:{self.redis_password}@{host}:{port}/{self.redis_db}"
+        return f"redis://{host}:{port}/{self.redis_db}"
+
+    @property
+    def log_sample_rate_overrides(self) -> dict[str, float]:
+        overrides = {}
+        for entry in self.log_sample_rates.split(","):
+            if entry.strip():
+                logger_name, _, rate = entry.strip().partition("=")
+                overrides[logger_name.strip()] = float(rate)
+        return overrides
 
     class Config:
         env_file = "../.env"
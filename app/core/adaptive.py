@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Optional
+
+import redis
+
+from app.config import settings
+from app.core.in_memory import InMemoryScriptStore
+from app.core.metrics import adaptive_limit_multiplier, adaptive_overload_signals, rate_limit_check_duration
+from app.core.policies import Policy, PolicyEngine
+from app.database.circuit_breaker import OPEN
+from app.database.redis import redis_connection, run_script, script_clock_ms
+
+logger = logging.getLogger(__name__)
+
+# One hash for the whole deployment: every worker reports to it and reads the multipliers back
+ADAPTIVE_LIMITS_KEY = "rate_limit:adaptive"
+
+
+class AdaptiveLimitController:
+    """Scales each policy's limits down while its backend or Redis is struggling, and back up after.
+
+    Every ``interval_seconds`` the worker judges each policy overloaded when,
+    over the interval, more than ``slow_share`` of its upstream responses took
+    longer than ``upstream_latency_target_seconds`` to start, more than
+    ``slow_share`` of its algorithm's checks took longer than
+    ``check_latency_target_seconds`` (both given ``min_samples``), or the Redis
+    circuit breaker is open. The verdicts go to the ``adaptive_limits`` script,
+    which keeps one multiplier per policy for all workers and steps it once per
+    interval: times ``decrease_factor`` (not below ``min_multiplier``) if any
+    worker saw the policy overloaded, plus ``increase_step`` (not above 1)
+    otherwise. Multipliers only ever tighten the configured limits. When Redis
+    cannot be asked the worker steps its last multipliers on its own verdicts.
+    """
+
+    __slots__ = ("enabled", "interval_seconds", "upstream_latency_target_seconds", "check_latency_target_seconds",
+                 "slow_share", "min_samples", "decrease_factor", "increase_step", "min_multiplier", "multipliers",
+                 "_upstream", "_check_counts", "_store", "_task")
+
+    def __init__(self, enabled: bool, interval_seconds: float, upstream_latency_target_seconds: float,
+                 check_latency_target_seconds: float, slow_share: float, min_samples: int, decrease_factor: float,
+                 increase_step: float, min_multiplier: float):
+        self.enabled = enabled
+        self.interval_seconds = interval_seconds
+        self.upstream_latency_target_seconds = upstream_latency_target_seconds
+        self.check_latency_target_seconds = check_latency_target_seconds
+        self.slow_share = slow_share
+        self.min_samples = min_samples
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.min_multiplier = min_multiplier
+        # Last multiplier applied per policy name
+        self.multipliers: dict[str, float] = {}
+        # Policy name -> [responses, slow responses] since the last step
+        self._upstream: dict[str, list[int]] = {}
+        # Algorithm -> cumulative (checks, slow checks) at the last step
+        self._check_counts: dict[str, tuple[float, float]] = {}
+        # The memory backend keeps the multipliers in process, through the same script mirror
+        self._store: Optional[InMemoryScriptStore] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def observe(self, policy_name: str, seconds: float) -> None:
+        """Record how long the upstream took to start its response to a request ``policy_name`` admitted."""
+        counts = self._upstream.get(policy_name)
+        if counts is None:
+            counts = self._upstream[policy_name] = [0, 0]
+        counts[0] += 1
+        if seconds > self.upstream_latency_target_seconds:
+            counts[1] += 1
+
+    def start(self, engine: PolicyEngine) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run(engine))
+
+    async def _run(self, engine: PolicyEngine):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.step(engine)
+            except Exception as e:
+                logger.error(f"Adaptive limit step failed: {e}")
+
+    async def step(self, engine: PolicyEngine) -> dict[str, float]:
+        """Judge every policy over the last interval, exchange the verdicts and apply the multipliers."""
+        policies = engine.index.policies
+        verdicts = self._verdicts(policies)
+        multipliers = await self._exchange(verdicts)
+        self._apply(policies, multipliers)
+        return multipliers
+
+    def _verdicts(self, policies: list[Policy]) -> dict[str, bool]:
+        upstream, self._upstream = self._upstream, {}
+        slow_algorithms = self._slow_algorithms()
+        circuit_open = redis_connection.breaker is not None and redis_connection.breaker.state == OPEN
+
+        verdicts = {}
+        for policy in policies:
+            signals = []
+            responses, slow = upstream.get(policy.name, (0, 0))
+            if responses >= self.min_samples and slow > responses * self.slow_share:
+                signals.append("upstream_latency")
+            if getattr(policy.limiter, "metrics", None) is not None and \
+                    policy.limiter.metrics.algorithm in slow_algorithms:
+                signals.append("check_latency")
+            if circuit_open:
+                signals.append("circuit_open")
+
+            for signal in signals:
+                adaptive_overload_signals.labels(policy=policy.name, signal=signal).inc()
+            verdicts[policy.name] = bool(signals)
+        return verdicts
+
+    def _slow_algorithms(self) -> set[str]:
+        """Algorithms whose checks since the last step were too often slower than the check latency target."""
+        # Cumulative count per algorithm, and per bucket boundary
+        totals: dict[str, float] = {}
+        buckets: dict[str, list[tuple[float, float]]] = {}
+        for metric in rate_limit_check_duration.collect():
+            for sample in metric.samples:
+                if not sample.name.endswith("_bucket"):
+                    continue
+                algorithm, bound = sample.labels["algorithm"], float(sample.labels["le"])
+                if bound == float("inf"):
+                    totals[algorithm] = sample.value
+                else:
+                    buckets.setdefault(algorithm, []).append((bound, sample.value))
+
+        slow_algorithms = set()
+        for algorithm, total in totals.items():
+            # Checks above the smallest bucket boundary at or past the target
+            within = [count for bound, count in sorted(buckets.get(algorithm, ()))
+                      if bound >= self.check_latency_target_seconds]
+            slow = total - within[0] if within else 0.0
+            previous_total, previous_slow = self._check_counts.get(algorithm, (0.0, 0.0))
+            self._check_counts[algorithm] = (total, slow)
+
+            checks, slow_checks = total - previous_total, slow - previous_slow
+            if checks >= self.min_samples and slow_checks > checks * self.slow_share:
+                slow_algorithms.add(algorithm)
+        return slow_algorithms
+
+    async def _exchange(self, verdicts: dict[str, bool]) -> dict[str, float]:
+        """Report ``verdicts`` and return the multiplier of every policy known to the script."""
+        args = [script_clock_ms(), int(self.interval_seconds * 1000), self.decrease_factor, self.increase_step,
+                self.min_multiplier, int(self.interval_seconds * 10_000)]
+        for policy_name, overloaded in verdicts.items():
+            args.extend((policy_name, int(overloaded)))
+
+        if settings.rate_limiter_backend == "memory":
+            if self._store is None:
+                self._store = InMemoryScriptStore()
+            reply = self._store.run('adaptive_limits', [ADAPTIVE_LIMITS_KEY], *args)
+        else:
+            try:
+                reply = await run_script('adaptive_limits', [ADAPTIVE_LIMITS_KEY], *args)
+            except redis.exceptions.RedisError as e:
+                logger.warning(f"Adaptive limits not shared, stepping this worker's multipliers locally: {e}")
+                return self._local_step(verdicts)
+
+        return {_decode(name): float(multiplier) for name, multiplier in zip(reply[::2], reply[1::2])}
+
+    def _local_step(self, verdicts: dict[str, bool]) -> dict[str, float]:
+        multipliers = dict(self.multipliers)
+        for policy_name, overloaded in verdicts.items():
+            multiplier = multipliers.get(policy_name, 1.0)
+            if overloaded:
+                multipliers[policy_name] = max(self.min_multiplier, multiplier * self.decrease_factor)
+            else:
+                multipliers[policy_name] = min(1.0, multiplier + self.increase_step)
+        return multipliers
+
+    def _apply(self, policies: list[Policy], multipliers: dict[str, float]) -> None:
+        # A limiter shared by several policies enforces the tightest of their multipliers
+        scaled: dict[int, tuple] = {}
+        for policy in policies:
+            multiplier = multipliers.get(policy.name, 1.0)
+            adaptive_limit_multiplier.labels(policy=policy.name).set(multiplier)
+            if multiplier != self.multipliers.get(policy.name, 1.0):
+                logger.info(f"Policy '{policy.name}' now enforces {multiplier:.2f} of its configured limits")
+            for limiter in policy.limiters():
+                current = scaled.get(id(limiter))
+                if current is None or multiplier < current[1]:
+                    scaled[id(limiter)] = (limiter, multiplier)
+
+        for limiter, multiplier in scaled.values():
+            if limiter.limit_multiplier != multiplier:
+                limiter.scale_limits(multiplier)
+        self.multipliers = multipliers
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+adaptive_limits = AdaptiveLimitController(
+    enabled=settings.adaptive_limits_enabled,
+    interval_seconds=settings.adaptive_interval_seconds,
+    upstream_latency_target_seconds=settings.adaptive_upstream_latency_target_ms / 1000,
+    check_latency_target_seconds=settings.adaptive_check_latency_target_ms / 1000,
+    slow_share=settings.adaptive_slow_share,
+    min_samples=settings.adaptive_min_samples,
+    decrease_factor=settings.adaptive_decrease_factor,
+    increase_step=settings.adaptive_increase_step,
+    min_multiplier=settings.adaptive_min_multiplier
+)
@@ -1,7 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
 from abc import ABC, abstractmethod
+from typing import Optional, Sequence
+
+import redis
+
+from app.core.metrics import LimiterMetrics, rate_limit_fallback_checks
+from app.core.rejection_cache import RejectionCache
+from app.database.circuit_breaker import CircuitOpenError
+from app.database.redis import redis_connection, run_script
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitDecision:
+    """Outcome of one check, with the quota details a client needs to pace itself.
+
+    ``limit``, ``remaining``, ``reset_seconds`` and ``retry_after_seconds`` are
+    None when the limiter does not know them (e.g. it failed open).
+    """
+
+    __slots__ = ("allowed", "limit", "remaining", "reset_seconds", "retry_after_seconds", "rejected_tier")
+
+    def __init__(self, allowed: bool, limit: Optional[int] = None, remaining: Optional[int] = None,
+                 reset_seconds: Optional[float] = None, retry_after_seconds: Optional[float] = None,
+                 rejected_tier: Optional[str] = None):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_seconds = reset_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self.rejected_tier = rejected_tier
+
+    def headers(self) -> list[tuple[str, str]]:
+        """``RateLimit-*`` (and, when rejected, ``Retry-After``) headers for this decision."""
+        headers = []
+        if self.limit is not None:
+            headers.append(("RateLimit-Limit", str(self.limit)))
+        if self.remaining is not None:
+            headers.append(("RateLimit-Remaining", str(max(0, self.remaining))))
+        if self.reset_seconds is not None:
+            headers.append(("RateLimit-Reset", str(math.ceil(self.reset_seconds))))
+        if not self.allowed and self.retry_after_seconds is not None:
+            headers.append(("Retry-After", str(max(1, math.ceil(self.retry_after_seconds)))))
+        return headers
 
 
 class RateLimiterStrategy(ABC):
+    # Local limiter that decides while Redis is unavailable (set by the factory); None fails open
+    fallback: Optional[RateLimiterStrategy] = None
+    # Share of the configured limits being enforced (set by the adaptive limit controller)
+    limit_multiplier: float = 1.0
+    # Set by limiters that decide with a Lua script (see _script_check)
+    metrics: LimiterMetrics
+    rejection_cache: Optional[RejectionCache] = None
+    # What the second field of the script's reply counts, for debug logs
+    reply_count_name = "remaining"
+
     @abstractmethod
     async def is_request_allowed(self, key: str) -> bool:
         pass
+
+    async def check_request(self, key: str) -> RateLimitDecision:
+        return RateLimitDecision(await self.is_request_allowed(key))
+
+    async def are_requests_allowed(self, keys: Sequence[str]) -> list[bool]:
+        return list(await asyncio.gather(*(self.is_request_allowed(key) for key in keys)))
+
+    async def degraded_check(self, key: str) -> RateLimitDecision:
+        """Decision for ``key`` when Redis could not be asked."""
+        if self.fallback is None:
+            return RateLimitDecision(True)
+
+        rate_limit_fallback_checks.labels(algorithm=self.metrics.algorithm).inc()
+        return await self.fallback.check_request(key)
+
+    async def _script_check(self, key: str, limit: int, script_name: str, *args,
+                            cost: Optional[int] = None) -> RateLimitDecision:
+        """Decide ``key`` with one script call replying ``allowed, count, retry_after_ms, reset_ms``.
+
+        A denial in the rejection cache answers without Redis. When Redis fails
+        the check is degraded, except for errors that are not Redis's, which
+        fail open. ``cost`` is passed on to the hooks and the fallback.
+        """
+        if not key:
+            logger.warning("Rate limit check called with empty key")
+            return RateLimitDecision(False)
+
+        checked_at = time.time()
+
+        with self.metrics.check():
+            if self.rejection_cache is not None:
+                denial = self.rejection_cache.denial(key, checked_at)
+                if denial is not None:
+                    retry_after_seconds, reset_seconds = denial
+                    self._record_decision(key, 0, None)
+                    return RateLimitDecision(False, limit=limit, remaining=0, reset_seconds=reset_seconds,
+                                             retry_after_seconds=retry_after_seconds)
+
+            try:
+                redis_connection.slot_map.log_key_attribution(key)
+
+                result = await self._run_script(script_name, [key], *args)
+                self.metrics.redis_success()
+            except redis.exceptions.RedisError as e:
+                # An open breaker refuses calls without reaching Redis; it already logged why
+                if not isinstance(e, CircuitOpenError):
+                    logger.error(f"Redis error during {self.metrics.algorithm} rate limit check: {e}")
+                    redis_connection.slot_map.observe_error(e)
+                    self.metrics.redis_error()
+                return await (self.degraded_check(key) if cost is None else self.degraded_check(key, cost))
+            except Exception as e:
+                logger.error(f"Unexpected error during {self.metrics.algorithm} rate limit check for key '{key}': {e}")
+                self.metrics.redis_error()
+                return RateLimitDecision(True)
+
+            allowed, count, retry_after_ms, reset_ms = result
+            if allowed != 1:
+                self._cache_rejection(key, checked_at, retry_after_ms, reset_ms, cost)
+
+            return RateLimitDecision(
+                self._record_decision(key, allowed, count),
+                limit=limit,
+                remaining=self._remaining(count, cost),
+                reset_seconds=reset_ms / 1000,
+                retry_after_seconds=retry_after_ms / 1000
+            )
+
+    def _remaining(self, count, cost: Optional[int]) -> int:
+        """Requests left, from the count a script replied with; by default the count is what is left."""
+        return count
+
+    def _cache_rejection(self, key: str, checked_at: float, retry_after_ms: float, reset_ms: float,
+                         cost: Optional[int]) -> None:
+        if self.rejection_cache is not None:
+            self.rejection_cache.deny(key, checked_at, retry_after_ms / 1000, reset_ms / 1000)
+
+    def _record_decision(self, key: str, allowed: int, count) -> bool:
+        # count is None when the rejection came from the local rejection cache
+        self.metrics.record_decision(key, allowed == 1, count)
+
+        if allowed == 1:
+            logger.debug("Request allowed for key: %s, %s: %s", key, self.reply_count_name, count)
+        else:
+            logger.debug("Rate limit exceeded for key: %s, %s: %s", key, self.reply_count_name, count)
+
+        return allowed == 1
+
+    async def _run_script(self, script_name: str, keys: Sequence[str], *args):
+        return await run_script(script_name, keys, *args)
+
+    def scale_limits(self, multiplier: float) -> None:
+        """Enforce ``multiplier`` times the configured limits (1.0 restores them); the fallback follows."""
+        self.limit_multiplier = multiplier
+        if self.fallback is not None:
+            self.fallback.scale_limits(multiplier)
+
+    async def close(self):
+        pass
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+from typing import Optional, Sequence
+
+import redis
+
+from app.core.base import RateLimitDecision, RateLimiterStrategy
+from app.core.key_builder import build_composite_rate_limit_key
+from app.core.metrics import (
+    LimiterMetrics, composite_refunds, composite_tier_rejections, rate_limit_fallback_checks
+)
+from app.database.circuit_breaker import CircuitOpenError
+from app.database.cluster import group_keys_by_slot
+from app.database.redis import redis_connection, run_script, script_clock_ms
+
+logger = logging.getLogger(__name__)
+
+TIER_SCOPES = ("user", "tenant", "global")
+
+
+class BucketTier:
+    __slots__ = ("name", "scope", "tokens_per_second", "max_tokens", "tokens_per_request", "expiry_seconds",
+                 "rejections", "configured_limits")
+
+    def __init__(self, name: str, scope: str, tokens_per_second: float, max_tokens: int,
+                 tokens_per_request: int = 1, expiry_seconds: int = 0):
+        if scope not in TIER_SCOPES:
+            raise ValueError(f"Unknown tier scope '{scope}', expected one of {', '.join(TIER_SCOPES)}")
+
+        self.name = name
+        self.scope = scope
+        self.tokens_per_second = tokens_per_second
+        self.max_tokens = max_tokens
+        self.tokens_per_request = tokens_per_request
+        self.expiry_seconds = expiry_seconds or max(1, math.ceil(max_tokens / tokens_per_second))
+        self.rejections = composite_tier_rejections.labels(tier=name)
+        self.configured_limits = (tokens_per_second, max_tokens)
+
+    def scale(self, multiplier: float) -> None:
+        tokens_per_second, max_tokens = self.configured_limits
+        self.tokens_per_second = tokens_per_second * multiplier
+        self.max_tokens = max(self.tokens_per_request, int(max_tokens * multiplier))
+
+    def script_args(self) -> tuple:
+        return self.max_tokens, self.tokens_per_second, self.tokens_per_request, self.expiry_seconds
+
+    @property
+    def limit(self) -> int:
+        return self.max_tokens // self.tokens_per_request
+
+    def reset_seconds(self, tokens: float) -> float:
+        return math.ceil((self.max_tokens - tokens) / self.tokens_per_second)
+
+
+class CompositeTokenBucketRateLimiter(RateLimiterStrategy):
+    """Chain of token buckets (e.g. user, tenant, global) that admit a request together.
+
+    A request is admitted only if every tier has tokens, and a rejection takes
+    tokens from none of them. ``keys_for`` gives all tiers of a request one
+    hash tag, so they share a slot and are decided by one
+    ``token_bucket_chain`` call. When keys span several slots, each slot
+    group is reserved concurrently with its own chain call (phase one); if any
+    group rejects, the groups that admitted get their tokens back through the
+    lease script (phase two). A concurrent request can see those reserved
+    tokens as taken, so the cross-slot path may briefly under-admit, never
+    over-admit.
+    """
+
+    def __init__(self, tiers: Sequence[dict]):
+        if not tiers:
+            raise ValueError("A composite limit needs at least one tier")
+
+        self.tiers = [BucketTier(**tier) for tier in tiers]
+        self.metrics = LimiterMetrics(algorithm="composite", endpoint="composite")
+
+    def keys_for(self, policy_name: str, user_id: str, tenant_id: Optional[str]) -> list[Optional[str]]:
+        """Build one key per tier; tenant tiers get None (and are skipped) without a tenant.
+
+        The keys share the hash tag of the widest tier: with a global tier every
+        key of the policy lives in the global key's slot, which every request
+        touches anyway; otherwise a tenant's users share the tenant's slot.
+        """
+        scopes = {tier.scope for tier in self.tiers}
+        if "global" in scopes:
+            hash_tag = f"global:{policy_name}"
+        elif "tenant" in scopes and tenant_id:
+            hash_tag = f"tenant:{tenant_id}"
+        else:
+            hash_tag = f"user:{user_id}"
+
+        keys = []
+        for tier in self.tiers:
+            if tier.scope == "user":
+                keys.append(build_composite_rate_limit_key(hash_tag, f"user:{user_id}:{policy_name}:{tier.name}"))
+            elif tier.scope == "tenant":
+                keys.append(build_composite_rate_limit_key(
+                    hash_tag, f"tenant:{tenant_id}:{policy_name}:{tier.name}") if tenant_id else None)
+            else:
+                keys.append(build_composite_rate_limit_key(hash_tag, f"{policy_name}:{tier.name}"))
+        return keys
+
+    async def is_request_allowed(self, key: str) -> bool:
+        return (await self.check_request(key)).allowed
+
+    async def check_request(self, key: str, policy_name: str = "") -> RateLimitDecision:
+        """Decide ``key``'s user tiers and ``policy_name``'s global tiers; tenant tiers need ``check``.
+
+        Global tiers get the keys ``keys_for`` gives them, so both ways of
+        checking a policy draw from the same global buckets.
+        """
+        keys = [f"{key}:{tier.name}" if tier.scope == "user"
+                else build_composite_rate_limit_key(f"global:{policy_name}", f"{policy_name}:{tier.name}")
+                if tier.scope == "global" else None for tier in self.tiers]
+        return await self.check(keys)
+
+    async def check(self, keys: Sequence[Optional[str]]) -> RateLimitDecision:
+        """Decide a request against every keyed tier.
+
+        The limit, remaining and reset reported are those of the tier with the
+        fewest requests left, since that is the one the client runs into first.
+        """
+        active = [i for i, key in enumerate(keys) if key is not None]
+        if not active:
+            # e.g. a tenant-only chain and a request without a tenant: no tier applies
+            return RateLimitDecision(True)
+
+        now = script_clock_ms()
+
+        with self.metrics.check():
+            slot_groups = list(group_keys_by_slot([keys[i] for i in active]).values())
+            groups = [[active[position] for position in positions] for positions in slot_groups]
+
+            try:
+                replies = await asyncio.gather(*(self._reserve(keys, group, now) for group in groups))
+                self.metrics.redis_success()
+            except redis.exceptions.RedisError as e:
+                if not isinstance(e, CircuitOpenError):
+                    logger.error(f"Redis error during composite rate limit check for keys {keys}: {e}")
+                    redis_connection.slot_map.observe_error(e)
+                    self.metrics.redis_error()
+                return await self._degraded_check(keys)
+            except Exception as e:
+                logger.error(f"Unexpected error during composite rate limit check for keys {keys}: {e}")
+                self.metrics.redis_error()
+                return RateLimitDecision(True)
+
+            rejected = [(group, reply) for group, reply in zip(groups, replies) if reply[0] != 1]
+            tightest, tokens = self._tightest_tier(groups, replies, refunded=bool(rejected))
+            remaining = int(tokens) // tightest.tokens_per_request
+            if not rejected:
+                self.metrics.record_decision(keys[active[0]], True)
+                return RateLimitDecision(True, limit=tightest.limit, remaining=remaining,
+                                         reset_seconds=tightest.reset_seconds(tokens))
+
+            admitted = [group for group, reply in zip(groups, replies) if reply[0] == 1]
+            if admitted:
+                await self._refund(keys, [i for group in admitted for i in group], now)
+
+            # Chain replies name the first short tier within their own group
+            rejected_tier = min(group[reply[1] - 1] for group, reply in rejected)
+            retry_after_ms = max(reply[2] for _, reply in rejected)
+
+            tier = self.tiers[rejected_tier]
+            tier.rejections.inc()
+            self.metrics.record_decision(keys[active[0]], False)
+            logger.debug("Composite limit rejected by tier '%s' for keys %s", tier.name, keys)
+            return RateLimitDecision(False, limit=tightest.limit, remaining=remaining,
+                                     reset_seconds=tightest.reset_seconds(tokens),
+                                     retry_after_seconds=retry_after_ms / 1000, rejected_tier=tier.name)
+
+    def _tightest_tier(self, groups: list[list[int]], replies: list,
+                       refunded: bool) -> tuple[BucketTier, float]:
+        # Chain replies carry each bucket's tokens after the three status fields
+        tightest, tightest_tokens = None, 0.0
+        for group, reply in zip(groups, replies):
+            for position, i in enumerate(group):
+                tier, tokens = self.tiers[i], float(reply[3 + position])
+                if refunded and reply[0] == 1:
+                    tokens += tier.tokens_per_request
+                if tightest is None or (tokens // tier.tokens_per_request
+                                        < tightest_tokens // tightest.tokens_per_request):
+                    tightest, tightest_tokens = tier, tokens
+        return tightest, tightest_tokens
+
+    async def _reserve(self, keys: Sequence[Optional[str]], group: list[int], now: int) -> list:
+        args = []
+        for i in group:
+            args.extend(self.tiers[i].script_args())
+        return await self._run_script('token_bucket_chain', [keys[i] for i in group], now, *args)
+
+    async def _refund(self, keys: Sequence[Optional[str]], tier_indexes: list[int], now: int) -> None:
+        refunds = []
+        for i in tier_indexes:
+            tier = self.tiers[i]
+            refunds.append(self._run_script('token_bucket_lease', [keys[i]], tier.max_tokens, tier.tokens_per_second,
+                                            now, tier.tokens_per_request, 0, tier.expiry_seconds))
+
+        results = await asyncio.gather(*refunds, return_exceptions=True)
+        failures = [result for result in results if isinstance(result, Exception)]
+        composite_refunds.inc(len(results) - len(failures))
+        if failures:
+            logger.warning(f"Failed to refund {len(failures)} reserved composite tiers: {failures[0]}")
+
+    async def _degraded_check(self, keys: Sequence[Optional[str]]) -> RateLimitDecision:
+        if self.fallback is None:
+            return RateLimitDecision(True)
+
+        rate_limit_fallback_checks.labels(algorithm="composite").inc()
+        return await self.fallback.check(keys)
+
+    async def _run_script(self, script_name: str, keys: Sequence[str], *args):
+        return await run_script(script_name, keys, *args)
+
+    def scale_limits(self, multiplier: float) -> None:
+        super().scale_limits(multiplier)
+        for tier in self.tiers:
+            tier.scale(multiplier)
+
+    async def close(self):
+        self.metrics.flush()
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from typing import Optional
+
+from app.config import settings
+from app.core.metrics import decision_log_events
+
+logger = logging.getLogger(__name__)
+# Decision records go to their own logger so they can be routed or silenced separately;
+# the logging pipeline leaves its volume to the bounds below
+decision_logger = logging.getLogger("app.decisions")
+
+_BATCH_SIZE = 256
+
+
+class DecisionLog:
+    """Sampled, rate-bounded log of rate limit decisions, written off the request path.
+
+    ``record()`` never blocks or does I/O: it keeps a ``sample_rate`` share of
+    events, at most ``max_per_second`` of them (with up to one second of burst),
+    and queues them for a background task that writes them in batches from a
+    worker thread. Past those bounds, or with the queue full, events are dropped
+    and counted, so an attack costs a counter increment per request, not a log line.
+    """
+
+    __slots__ = ("sample_rate", "max_per_second", "_queue", "_tokens", "_refilled_at", "_task")
+
+    def __init__(self, sample_rate: float, max_per_second: float, queue_size: int):
+        self.sample_rate = sample_rate
+        self.max_per_second = max_per_second
+        self._queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=queue_size)
+        self._tokens = max_per_second
+        self._refilled_at = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, event: str, **fields) -> None:
+        if self.sample_rate <= 0 or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+            return
+
+        now = time.monotonic()
+        self._tokens = min(self.max_per_second, self._tokens + (now - self._refilled_at) * self.max_per_second)
+        self._refilled_at = now
+        if self._tokens < 1:
+            decision_log_events.labels(result="rate_limited").inc()
+            return
+        self._tokens -= 1
+
+        try:
+            self._queue.put_nowait({"event": event, "time": round(time.time(), 3), **fields})
+        except asyncio.QueueFull:
+            decision_log_events.labels(result="queue_full").inc()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < _BATCH_SIZE and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await asyncio.to_thread(_write, batch)
+            except Exception as e:
+                logger.error(f"Writing {len(batch)} decision log records failed: {e}")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        batch = []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        if batch:
+            _write(batch)
+
+
+def _write(batch: list[dict]) -> None:
+    # The fields travel as ``extra``, so the JSON log format writes them as top-level keys
+    for record in batch:
+        decision_logger.info(record.pop("event"), extra=record)
+    decision_log_events.labels(result="written").inc(len(batch))
+
+
+decision_log = DecisionLog(
+    sample_rate=settings.decision_log_sample_rate if settings.decision_log_enabled else 0.0,
+    max_per_second=settings.decision_log_max_per_second,
+    queue_size=settings.decision_log_queue_size
+)
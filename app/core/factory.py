@@ -2,50 +2,173 @@ from __future__ import annotations
 
 import logging
 
+from app.config import settings
 from app.database.redis import redis_connection
+from .base import RateLimiterStrategy
+from .composite import CompositeTokenBucketRateLimiter
+from .fixed_window import FixedWindowRateLimiter
+from .gcra import GcraRateLimiter
+from .hybrid import HybridRateLimiter
+from .in_memory import (
+    InMemoryCompositeTokenBucketRateLimiter, InMemoryFixedWindowRateLimiter, InMemoryGcraRateLimiter,
+    InMemorySlidingWindowCounterRateLimiter, InMemorySlidingWindowLogRateLimiter, InMemoryTokenBucketRateLimiter
+)
+from .policies import LimiterUnavailableError, PolicyEngine
+from .rejection_cache import RejectionCache
 from .sliding_window_counter import SlidingWindowCounterRateLimiter
+from .sliding_window_log import SlidingWindowLogRateLimiter
 from .token_bucket import TokenBucketRateLimiter
+from .token_lease import TokenLeaseRateLimiter
 
 logger = logging.getLogger(__name__)
 
-_token_bucket_limiter: TokenBucketRateLimiter | None = None
-__sliding_window_counter_limiter: SlidingWindowCounterRateLimiter | None = None
-
-
-def get_token_bucket_rate_limiter() -> TokenBucketRateLimiter:
-    global _token_bucket_limiter
-
-    if _token_bucket_limiter is None:
-        if redis_connection.async_client is None:
-            raise RuntimeError("Redis client not initialized")
-
-        _token_bucket_limiter = TokenBucketRateLimiter(
+_policy_engine: PolicyEngine | None = None
+
+
+def _build_rejection_cache(algorithm: str) -> RejectionCache | None:
+    if not settings.rejection_cache_enabled:
+        return None
+
+    return RejectionCache(
+        algorithm=algorithm,
+        capacity=settings.rejection_cache_capacity,
+        max_ttl_seconds=settings.rejection_cache_max_ttl_seconds
+    )
+
+
+def build_rate_limiter(algorithm: str, params: dict) -> RateLimiterStrategy:
+    """Build a limiter for ``algorithm`` on the configured backend from policy parameters."""
+    if algorithm not in ("token_bucket", "sliding_window_counter", "hybrid", "composite", "gcra", "fixed_window",
+                         "sliding_window_log"):
+        raise ValueError(f"Unknown rate limiting algorithm: {algorithm}")
+
+    if settings.rate_limiter_backend == "memory":
+        if algorithm == "token_bucket":
+            return InMemoryTokenBucketRateLimiter(**params)
+        if algorithm == "sliding_window_counter":
+            return InMemorySlidingWindowCounterRateLimiter(**params)
+        if algorithm == "composite":
+            return InMemoryCompositeTokenBucketRateLimiter(**params)
+        # No rejection cache: it would only save an in-process call
+        if algorithm == "gcra":
+            return InMemoryGcraRateLimiter(**params)
+        if algorithm == "fixed_window":
+            return InMemoryFixedWindowRateLimiter(**params)
+        if algorithm == "sliding_window_log":
+            return InMemorySlidingWindowLogRateLimiter(**params)
+        raise ValueError("The hybrid limiter needs the redis backend")
+
+    if redis_connection.async_client is None:
+        raise LimiterUnavailableError("Redis client not initialized")
+
+    limiter = _build_redis_rate_limiter(algorithm, params)
+    # The hybrid limiter already admits locally between syncs
+    if settings.circuit_breaker_enabled and algorithm != "hybrid":
+        limiter.fallback = _FALLBACK_LIMITERS[algorithm](
+            **_fallback_params(algorithm, params, max(1, settings.circuit_breaker_fallback_worker_count))
+        )
+    return limiter
+
+
+def _build_redis_rate_limiter(algorithm: str, params: dict) -> RateLimiterStrategy:
+    if algorithm == "token_bucket":
+        if settings.token_bucket_lease_enabled:
+            return TokenLeaseRateLimiter(
+                redis_client=redis_connection.async_client,
+                lease_fraction=settings.token_bucket_lease_fraction,
+                lease_ttl_seconds=settings.token_bucket_lease_ttl_ms / 1000,
+                min_lease_tokens=settings.token_bucket_lease_min_tokens,
+                **params
+            )
+        return TokenBucketRateLimiter(
             redis_client=redis_connection.async_client,
-            tokens_per_second=1,
-            max_tokens=5,
-            expiry_seconds=10,
-            tokens_per_request=1
+            rejection_cache=_build_rejection_cache("token_bucket"),
+            **params
         )
 
-        logger.info("Token bucket rate limiter initialized")
-
-    return _token_bucket_limiter
+    if algorithm == "sliding_window_counter":
+        return SlidingWindowCounterRateLimiter(
+            redis_client=redis_connection.async_client,
+            rejection_cache=_build_rejection_cache("sliding_window_counter"),
+            **params
+        )
 
+    if algorithm == "composite":
+        return CompositeTokenBucketRateLimiter(**params)
 
-def get_sliding_window_counter_rate_limiter() -> SlidingWindowCounterRateLimiter:
-    global __sliding_window_counter_limiter
+    if algorithm == "gcra":
+        return GcraRateLimiter(
+            redis_client=redis_connection.async_client,
+            rejection_cache=_build_rejection_cache("gcra"),
+            **params
+        )
 
-    if __sliding_window_counter_limiter is None:
-        if redis_connection.async_client is None:
-            raise RuntimeError("Redis client not initialized")
+    if algorithm == "fixed_window":
+        return FixedWindowRateLimiter(
+            redis_client=redis_connection.async_client,
+            rejection_cache=_build_rejection_cache("fixed_window"),
+            **params
+        )
 
-        __sliding_window_counter_limiter = SlidingWindowCounterRateLimiter(
+    if algorithm == "sliding_window_log":
+        return SlidingWindowLogRateLimiter(
             redis_client=redis_connection.async_client,
-            window_size_seconds=60,
-            max_requests=10,
-            expiry_seconds=60
+            rejection_cache=_build_rejection_cache("sliding_window_log"),
+            **params
         )
 
-        logger.info("Sliding window counter rate limiter initialized")
+    return HybridRateLimiter(
+        worker_count=settings.hybrid_worker_count,
+        sync_interval_seconds=settings.hybrid_sync_interval_ms / 1000,
+        error_bound=settings.hybrid_error_bound,
+        **params
+    )
+
+
+_FALLBACK_LIMITERS = {
+    "token_bucket": InMemoryTokenBucketRateLimiter,
+    "sliding_window_counter": InMemorySlidingWindowCounterRateLimiter,
+    "composite": InMemoryCompositeTokenBucketRateLimiter,
+    "gcra": InMemoryGcraRateLimiter,
+    "fixed_window": InMemoryFixedWindowRateLimiter,
+    "sliding_window_log": InMemorySlidingWindowLogRateLimiter,
+}
+
+
+def _fallback_params(algorithm: str, params: dict, worker_count: int) -> dict:
+    """``params`` with every limit split evenly across ``worker_count`` workers deciding on their own."""
+    if algorithm == "token_bucket":
+        return dict(params, tokens_per_second=params["tokens_per_second"] / worker_count,
+                    max_tokens=max(params["tokens_per_request"], params["max_tokens"] // worker_count))
+    if algorithm == "composite":
+        return dict(params, tiers=[
+            dict(tier, tokens_per_second=tier["tokens_per_second"] / worker_count,
+                 max_tokens=max(tier.get("tokens_per_request", 1), tier["max_tokens"] // worker_count))
+            for tier in params["tiers"]
+        ])
+    if algorithm == "gcra":
+        return dict(params, requests_per_second=params["requests_per_second"] / worker_count,
+                    burst=max(1, params["burst"] // worker_count))
+    return dict(params, max_requests=max(1, params["max_requests"] // worker_count))
+
+
+def get_policy_engine() -> PolicyEngine:
+    global _policy_engine
+
+    if _policy_engine is None:
+        _policy_engine = PolicyEngine(
+            path=settings.rate_limit_policy_file,
+            build_limiter=build_rate_limiter,
+            tenant_header=settings.rate_limit_tenant_header,
+            reload_interval_seconds=settings.rate_limit_policy_reload_seconds,
+            # A shadow check only shares the enforced check's round trip in a batched pipeline
+            shadow_enabled=settings.redis_batching_enabled or settings.rate_limiter_backend == "memory"
+        )
+
+    return _policy_engine
+
 
-    return __sliding_window_counter_limiter
+async def close_rate_limiters():
+    if _policy_engine is not None:
+        await _policy_engine.close()
+        logger.info("Closed policy limiters")
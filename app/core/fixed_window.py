@@ -0,0 +1,46 @@
+from typing import Optional
+
+import redis
+
+from app.core.base import RateLimitDecision, RateLimiterStrategy
+from app.core.metrics import LimiterMetrics, fixed_window_request_count
+from app.core.rejection_cache import RejectionCache
+from app.database.redis import script_clock_ms
+
+
+class FixedWindowRateLimiter(RateLimiterStrategy):
+    """Fixed window counter: at most ``max_requests`` per window aligned to the epoch.
+
+    The cheapest algorithm: one integer per key, INCR per check and PEXPIRE
+    once per window. A client can get up to twice the limit across a window
+    boundary.
+    """
+
+    reply_count_name = "count"
+
+    def __init__(self, window_size_seconds: float, max_requests: int, redis_client: redis.Redis,
+                 rejection_cache: RejectionCache | None = None):
+        self.window_size_seconds = window_size_seconds
+        self.max_requests = max_requests
+        self.configured_max_requests = max_requests
+        self.redis_client = redis_client
+        self.rejection_cache = rejection_cache
+        self.metrics = LimiterMetrics(algorithm="fixed_window", endpoint="fixed_window",
+                                      remaining=fixed_window_request_count)
+
+    async def is_request_allowed(self, key: str) -> bool:
+        return (await self.check_request(key)).allowed
+
+    async def check_request(self, key: str) -> RateLimitDecision:
+        return await self._script_check(key, self.max_requests, 'fixed_window', self.window_size_seconds,
+                                        self.max_requests, script_clock_ms())
+
+    def scale_limits(self, multiplier: float) -> None:
+        super().scale_limits(multiplier)
+        self.max_requests = max(1, int(self.configured_max_requests * multiplier))
+
+    async def close(self):
+        self.metrics.flush()
+
+    def _remaining(self, request_count, cost: Optional[int]) -> int:
+        return max(self.max_requests - request_count, 0)
@@ -0,0 +1,45 @@
+import redis
+
+from app.core.base import RateLimitDecision, RateLimiterStrategy
+from app.core.metrics import LimiterMetrics, gcra_requests_remaining
+from app.core.rejection_cache import RejectionCache
+from app.database.redis import script_clock_ms
+
+
+class GcraRateLimiter(RateLimiterStrategy):
+    """Generic cell rate algorithm: a token bucket that stores one number per key.
+
+    Each key holds the theoretical arrival time (TAT) of its next request as a
+    plain string with a PX expiry, so a check is a GET plus, when allowed, a
+    SET. The token bucket instead keeps a hash and also runs HSET and PEXPIRE.
+    Admission matches a token bucket with ``max_tokens=burst`` refilling at
+    ``requests_per_second``.
+    """
+
+    def __init__(self, requests_per_second: float, burst: int, redis_client: redis.Redis,
+                 rejection_cache: RejectionCache | None = None):
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.configured_limits = (requests_per_second, burst)
+        self.redis_client = redis_client
+        # Whole microseconds keep the TAT arithmetic exact in Lua's doubles
+        self.emission_interval_us = max(1, round(1_000_000 / requests_per_second))
+        self.rejection_cache = rejection_cache
+        self.metrics = LimiterMetrics(algorithm="gcra", endpoint="gcra", remaining=gcra_requests_remaining)
+
+    async def is_request_allowed(self, key: str) -> bool:
+        return (await self.check_request(key)).allowed
+
+    async def check_request(self, key: str) -> RateLimitDecision:
+        return await self._script_check(key, self.burst, 'gcra', self.emission_interval_us, self.burst,
+                                        script_clock_ms(), 1)
+
+    def scale_limits(self, multiplier: float) -> None:
+        super().scale_limits(multiplier)
+        requests_per_second, burst = self.configured_limits
+        self.requests_per_second = requests_per_second * multiplier
+        self.burst = max(1, int(burst * multiplier))
+        self.emission_interval_us = max(1, round(1_000_000 / self.requests_per_second))
+
+    async def close(self):
+        self.metrics.flush()
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+
+from app.core.base import RateLimitDecision, RateLimiterStrategy
+from app.core.metrics import LimiterMetrics, hybrid_sync_duration, redis_operations_total
+from app.database.redis import redis_connection
+
+logger = logging.getLogger(__name__)
+
+SYNC_CHUNK_SIZE = 1000
+
+
+class _WindowCounter:
+    __slots__ = ("window", "global_count", "pending", "active", "expiry_set")
+
+    def __init__(self, window: int):
+        self.window = window
+        self.global_count = 0
+        self.pending = 0
+        # Checked since the last sync, so its global count is worth refreshing
+        self.active = True
+        # The window's Redis key already has its TTL
+        self.expiry_set = False
+
+
+class HybridRateLimiter(RateLimiterStrategy):
+    """Fixed-window limiter that admits locally and reconciles with Redis in bulk.
+
+    Between syncs each worker may admit up to ``(max_requests - global_count) *
+    (1 + error_bound) / worker_count`` requests per key, where ``global_count``
+    is the cluster-wide total pulled back at its last sync. A background task
+    flushes the local deltas to Redis on every ``sync_interval_seconds`` wall-clock
+    tick and refreshes the totals in the same round trip, so the hot path never
+    waits on Redis. A sync only touches keys checked since the previous one:
+    ``INCRBY`` for keys with deltas (plus ``EXPIRE`` on a window's first flush)
+    and ``GET`` for keys that were only rejected, so Redis load follows traffic
+    rather than the number of keys seen in the window.
+
+    Error bound, with ``W = worker_count`` matching the number of workers,
+    ``M = max_requests``, ``e = error_bound``, ``s = sync_interval_seconds`` and
+    ``r`` the key's request rate summed over all workers: a sync reads back a
+    total that includes every delta flushed at earlier ticks, but can miss the
+    ones other workers flush at the same tick. Admissions are therefore decided
+    on counts at most two sync intervals old. Per epoch the workers admit at
+    most ``(1 + e) * (M - count) + W`` (each share is rounded up), and no more
+    than arrive, ``r * s``. The last two epochs of a window are the only
+    ones not yet counted, so a key is admitted at most
+    ``M + min((1 + 2 * e) * M + 2 * W, 2 * r * s)`` times per window. This
+    assumes a sync round trip shorter than ``s``; every failed sync adds one
+    more interval of ``r * s`` to the bound.
+    """
+
+    def __init__(self, window_size_seconds: int, max_requests: int, worker_count: int,
+                 sync_interval_seconds: float, error_bound: float):
+        self.window_size_seconds = window_size_seconds
+        self.max_requests = max_requests
+        self.configured_max_requests = max_requests
+        self.worker_count = max(1, worker_count)
+        self.sync_interval_seconds = sync_interval_seconds
+        self.error_bound = error_bound
+        self.ttl_seconds = window_size_seconds * 2
+        self._counters: dict[str, _WindowCounter] = {}
+        self._retired: list[tuple[str, _WindowCounter]] = []
+        self._syncer: asyncio.Task | None = None
+        self.metrics = LimiterMetrics(algorithm="hybrid", endpoint="hybrid")
+
+    async def is_request_allowed(self, key: str) -> bool:
+        return (await self.check_request(key)).allowed
+
+    async def check_request(self, key: str) -> RateLimitDecision:
+        if self._syncer is None:
+            self._syncer = asyncio.create_task(self._sync_forever())
+
+        with self.metrics.check():
+            now = time.time()
+            window = math.floor(now / self.window_size_seconds)
+            counter = self._counters.get(key)
+
+            if counter is None or counter.window < window:
+                if counter is not None and counter.pending:
+                    # Unsynced deltas from the previous window still get flushed
+                    self._retired.append((key, counter))
+                counter = _WindowCounter(window)
+                self._counters[key] = counter
+
+            counter.active = True
+            remaining = self.max_requests - counter.global_count
+            local_share = remaining * (1 + self.error_bound) / self.worker_count
+            reset_seconds = (window + 1) * self.window_size_seconds - now
+
+            if counter.pending < local_share:
+                counter.pending += 1
+                self.metrics.record_decision(key, True)
+                return RateLimitDecision(True, limit=self.max_requests, remaining=remaining - counter.pending,
+                                         reset_seconds=reset_seconds)
+
+            self.metrics.record_decision(key, False)
+            logger.debug("Rate limit exceeded for key: %s, global count: %s/%s",
+                         key, counter.global_count, self.max_requests)
+
+            # Budget left in the window is handed out again at the next sync
+            retry_after_seconds = reset_seconds if remaining <= 0 else min(
+                reset_seconds, self.sync_interval_seconds - now % self.sync_interval_seconds)
+            return RateLimitDecision(False, limit=self.max_requests, remaining=remaining - counter.pending,
+                                     reset_seconds=reset_seconds, retry_after_seconds=retry_after_seconds)
+
+    async def _sync_forever(self):
+        while True:
+            # Sync on wall-clock ticks so all workers refresh from near-identical totals
+            await asyncio.sleep(self.sync_interval_seconds - time.time() % self.sync_interval_seconds)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Hybrid limiter sync failed: {e}")
+
+    async def sync(self):
+        current_window = math.floor(time.time() / self.window_size_seconds)
+        entries = [(key, counter) for key, counter in self._counters.items() if counter.active or counter.pending]
+        entries += self._retired
+        self._retired = []
+        for _, counter in entries:
+            # Checks during the round trip mark it active again for the next sync
+            counter.active = False
+
+        with hybrid_sync_duration.time():
+            for start in range(0, len(entries), SYNC_CHUNK_SIZE):
+                await self._sync_chunk(entries[start:start + SYNC_CHUNK_SIZE])
+
+        # Forget keys whose window is over once their deltas are in Redis
+        expired = [key for key, counter in self._counters.items()
+                   if counter.window < current_window and not counter.pending]
+        for key in expired:
+            del self._counters[key]
+
+    async def _sync_chunk(self, entries: list[tuple[str, _WindowCounter]]):
+        pipeline = redis_connection.async_client.pipeline(transaction=False)
+        # (counter, delta flushed, position of its total in the results, sets the TTL)
+        sent = []
+        position = 0
+
+        for key, counter in entries:
+            redis_key = f"{key}:hybrid:{counter.window}"
+            delta = counter.pending
+            if delta:
+                pipeline.incrby(redis_key, delta)
+            else:
+                pipeline.get(redis_key)
+            sets_expiry = bool(delta) and not counter.expiry_set
+            sent.append((counter, delta, position, sets_expiry))
+            position += 1
+            if sets_expiry:
+                pipeline.expire(redis_key, self.ttl_seconds)
+                position += 1
+
+        try:
+            results = await pipeline.execute()
+            redis_operations_total.labels(operation="pipeline", status="success").inc()
+        except Exception as e:
+            logger.error(f"Hybrid limiter sync of {len(entries)} keys failed: {e}")
+            redis_operations_total.labels(operation="pipeline", status="error").inc()
+            for key, counter in entries:
+                if self._counters.get(key) is not counter:
+                    # Keep deltas of already-retired windows around for the next attempt
+                    if counter.pending:
+                        self._retired.append((key, counter))
+                else:
+                    counter.active = True
+            return
+
+        for counter, delta, index, sets_expiry in sent:
+            # Checks admitted during the round trip stay pending for the next sync
+            counter.pending -= delta
+            counter.global_count = int(results[index] or 0)
+            if sets_expiry:
+                counter.expiry_set = True
+
+    def scale_limits(self, multiplier: float) -> None:
+        super().scale_limits(multiplier)
+        self.max_requests = max(1, int(self.configured_max_requests * multiplier))
+
+    async def close(self):
+        if self._syncer is not None:
+            self._syncer.cancel()
+            self._syncer = None
+        await self.sync()
+        self.metrics.flush()
@@ -0,0 +1,475 @@
+from __future__ import annotations
+
+import bisect
+import math
+import re
+import time
+from typing import Callable, Optional, Sequence
+
+from app.core.composite import CompositeTokenBucketRateLimiter
+from app.core.fixed_window import FixedWindowRateLimiter
+from app.core.gcra import GcraRateLimiter
+from app.core.rejection_cache import RejectionCache
+from app.core.sliding_window_counter import SlidingWindowCounterRateLimiter
+from app.core.sliding_window_log import SlidingWindowLogRateLimiter
+from app.core.token_bucket import TokenBucketRateLimiter
+
+
+def _lua_stored(value: float) -> float:
+    # Redis stores Lua numbers passed to HSET as "%.14g" strings
+    return float("%.14g" % value)
+
+
+def _lua_mod(a: float, b: float) -> float:
+    # Lua's % is a - floor(a / b) * b, which can differ from Python's for non-integer b
+    return a - math.floor(a / b) * b
+
+
+_LOG_MEMBER_COUNT = re.compile(r":(\d+)$")
+
+
+class _TokenBucketState:
+    __slots__ = ("tokens", "timestamp", "expires_at")
+
+    def __init__(self, tokens: float, timestamp: float, expires_at: float):
+        self.tokens = tokens
+        self.timestamp = timestamp
+        self.expires_at = expires_at
+
+
+class _SlidingWindowState:
+    __slots__ = ("current_count", "previous_count", "window", "expires_at")
+
+    def __init__(self, current_count: float, previous_count: float, window: float, expires_at: float):
+        self.current_count = current_count
+        self.previous_count = previous_count
+        self.window = window
+        self.expires_at = expires_at
+
+
+class _GcraState:
+    __slots__ = ("tat", "expires_at")
+
+    def __init__(self, tat: float, expires_at: float):
+        self.tat = tat
+        self.expires_at = expires_at
+
+
+class _FixedWindowState:
+    __slots__ = ("count", "expires_at")
+
+    def __init__(self, count: int, expires_at: float):
+        self.count = count
+        self.expires_at = expires_at
+
+
+class _AdaptiveLimitsState:
+    __slots__ = ("multipliers", "overloaded", "updated_at", "expires_at")
+
+    def __init__(self):
+        self.multipliers: dict[str, float] = {}
+        self.overloaded: set[str] = set()
+        self.updated_at: Optional[float] = None
+        self.expires_at = 0.0
+
+
+class _WindowLogState:
+    __slots__ = ("scores", "members", "expires_at")
+
+    def __init__(self):
+        # Sorted by score, as ZRANGE returns them
+        self.scores: list[float] = []
+        self.members: list[str] = []
+        self.expires_at = 0.0
+
+
+class InMemoryScriptStore:
+    """Pure-Python mirror of the Lua scripts in app/database/lua.
+
+    Each script takes the same KEYS/ARGV and returns the same reply shape as
+    its Lua counterpart (numbers truncated to integers as Redis does), so it
+    can replace Redis for single-node deployments and serve as a
+    differential-testing oracle. ``now`` is in epoch milliseconds; a ``now``
+    of 0 (the Redis server clock) reads the local clock instead. Key expiry
+    follows ``now``.
+    """
+
+    def __init__(self, sweep_interval_seconds: float = 10.0):
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._token_buckets: dict[str, _TokenBucketState] = {}
+        self._sliding_windows: dict[str, _SlidingWindowState] = {}
+        self._gcra: dict[str, _GcraState] = {}
+        self._fixed_windows: dict[str, _FixedWindowState] = {}
+        self._window_logs: dict[str, _WindowLogState] = {}
+        self._adaptive_limits: dict[str, _AdaptiveLimitsState] = {}
+        self._next_sweep_at = 0.0
+        self._scripts: dict[str, Callable[[Sequence[str], Sequence], list]] = {
+            'token_bucket': self._token_bucket,
+            'sliding_window_counter': self._sliding_window_counter,
+            'token_bucket_batch': self._token_bucket_batch,
+            'sliding_window_counter_batch': self._sliding_window_counter_batch,
+            'token_bucket_lease': self._token_bucket_lease,
+            'token_bucket_chain': self._token_bucket_chain,
+            'gcra': self._gcra_check,
+            'fixed_window': self._fixed_window,
+            'sliding_window_log': self._sliding_window_log,
+            'adaptive_limits': self._adaptive_limits_step,
+        }
+
+    def __len__(self) -> int:
+        return sum(len(states) for states in self._states())
+
+    def run(self, script_name: str, keys: Sequence[str], *args) -> list:
+        # Numbers arrive as floats, like tonumber(ARGV[i]); names (adaptive_limits) stay strings
+        return self._scripts[script_name](keys, [arg if isinstance(arg, str) else float(arg) for arg in args])
+
+    @staticmethod
+    def _now(now: float) -> float:
+        return now or float(time.time_ns() // 1_000_000)
+
+    def _states(self) -> tuple[dict, ...]:
+        return (self._token_buckets, self._sliding_windows, self._gcra, self._fixed_windows, self._window_logs,
+                self._adaptive_limits)
+
+    def _sweep(self, now: float) -> None:
+        if now < self._next_sweep_at:
+            return
+
+        self._next_sweep_at = now + self.sweep_interval_seconds * 1000
+        for states in self._states():
+            expired = [key for key, state in states.items() if state.expires_at <= now]
+            for key in expired:
+                del states[key]
+
+    def _refill(self, key: str, bucket_capacity: float, refill_rate: float, now: float) -> float:
+        state = self._token_buckets.get(key)
+
+        if state is None or state.expires_at <= now:
+            tokens, last_timestamp = bucket_capacity, now
+        else:
+            tokens, last_timestamp = state.tokens, state.timestamp
+
+        elapsed = max(0.0, now - last_timestamp)
+        return min(bucket_capacity, tokens + elapsed * refill_rate / 1000)
+
+    def _store_bucket(self, key: str, tokens: float, now: float, bucket_capacity: float, refill_rate: float,
+                      ttl_seconds: float) -> None:
+        # Kept until the bucket is full again, and at least ttl_seconds
+        reset_ms = math.ceil((bucket_capacity - tokens) * 1000 / refill_rate)
+        self._token_buckets[key] = _TokenBucketState(
+            _lua_stored(tokens), now, now + max(ttl_seconds * 1000, reset_ms))
+
+    def _decide_token_bucket(self, key: str, bucket_capacity: float, refill_rate: float, now: float,
+                             cost: float, ttl_seconds: float) -> tuple[list, float]:
+        """Returns the reply triple and the bucket's tokens (before Redis rounds them for storage)."""
+        self._sweep(now)
+        tokens = self._refill(key, bucket_capacity, refill_rate, now)
+
+        if tokens < cost:
+            return [0, int(tokens), math.ceil((cost - tokens) * 1000 / refill_rate)], tokens
+
+        tokens -= cost
+        self._store_bucket(key, tokens, now, bucket_capacity, refill_rate, ttl_seconds)
+        return [1, int(tokens), 0], tokens
+
+    def _decide_sliding_window(self, key: str, window_size: float, max_requests: float, now: float,
+                               ttl_seconds: float) -> list:
+        self._sweep(now)
+        window_ms = window_size * 1000
+        current_window = math.floor(now / window_ms)
+        state = self._sliding_windows.get(key)
+
+        if state is None or state.expires_at <= now:
+            current_count, previous_count, stored_window = 0.0, 0.0, None
+        else:
+            current_count, previous_count, stored_window = state.current_count, state.previous_count, state.window
+
+        new_window = stored_window is None or current_window != stored_window
+        if new_window:
+            if stored_window is not None and current_window == stored_window + 1:
+                previous_count = current_count
+            elif stored_window is not None and current_window > stored_window + 1:
+                previous_count = 0.0
+            current_count = 0.0
+
+        window_elapsed = _lua_mod(now, window_ms) / window_ms
+        effective_count = current_count + (previous_count * (1 - window_elapsed))
+        window_start = current_window * window_ms
+        next_window_start = window_start + window_ms
+
+        if effective_count < max_requests:
+            current_count += 1
+            if new_window:
+                # The counts matter until the next window ends
+                expires_at = now + max(ttl_seconds * 1000, math.ceil(next_window_start + window_ms - now))
+                self._sliding_windows[key] = _SlidingWindowState(
+                    current_count, previous_count, current_window, expires_at)
+            else:
+                state.current_count = current_count
+            return [1, math.floor(effective_count + 1), 0]
+
+        if current_count < max_requests:
+            threshold = window_start + window_ms * (1 - (max_requests - current_count) / previous_count)
+            retry_at = min(math.floor(threshold) + 1, next_window_start)
+        else:
+            threshold = next_window_start + window_ms * (1 - max_requests / current_count)
+            retry_at = math.floor(threshold) + 1
+
+        return [0, math.floor(effective_count), int(retry_at - now)]
+
+    def _token_bucket(self, keys: Sequence[str], args: Sequence[float]) -> list:
+        bucket_capacity, refill_rate, now, cost, ttl_seconds = args[:5]
+        now = self._now(now)
+        decision, tokens = self._decide_token_bucket(keys[0], bucket_capacity, refill_rate, now, cost, ttl_seconds)
+        return decision + [math.ceil((bucket_capacity - tokens) * 1000 / refill_rate)]
+
+    def _sliding_window_counter(self, keys: Sequence[str], args: Sequence[float]) -> list:
+        window_size, max_requests, now, ttl_seconds = args[:4]
+        now = self._now(now)
+        decision = self._decide_sliding_window(keys[0], window_size, max_requests, now, ttl_seconds)
+        window_ms = window_size * 1000
+        next_window_start = math.floor(now / window_ms) * window_ms + window_ms
+        return decision + [int(next_window_start - now)]
+
+    def _token_bucket_batch(self, keys: Sequence[str], args: Sequence[float]) -> list:
+        now = self._now(args[0])
+        decisions = []
+        for i, key in enumerate(keys):
+            bucket_capacity, refill_rate, cost, ttl_seconds = args[1 + i * 4:5 + i * 4]
+            decision, _ = self._decide_token_bucket(key, bucket_capacity, refill_rate, now, cost, ttl_seconds)
+            decisions.extend(decision)
+        return decisions
+
+    def _sliding_window_counter_batch(self, keys: Sequence[str], args: Sequence[float]) -> list:
+        now = self._now(args[0])
+        decisions = []
+        for i, key in enumerate(keys):
+            window_size, max_requests, ttl_seconds = args[1 + i * 3:4 + i * 3]
+            decisions.extend(self._decide_sliding_window(key, window_size, max_requests, now, ttl_seconds))
+        return decisions
+
+    def _token_bucket_lease(self, keys: Sequence[str], args: Sequence[float]) -> list:
+        bucket_capacity, refill_rate, now, returned, requested, ttl_seconds = args[:6]
+        now = self._now(now)
+        key = keys[0]
+        self._sweep(now)
+
+        tokens = min(bucket_capacity, self._refill(key, bucket_capacity, refill_rate, now) + returned)
+        granted = min(requested, math.floor(tokens))
+        tokens -= granted
+        if granted > 0 or returned > 0:
+            self._store_bucket(key, tokens, now, bucket_capacity, refill_rate, ttl_seconds)
+        return [int(granted), ("%.14g" % tokens).encode()]
+
+    def _token_bucket_chain(self, keys: Sequence[str], args: Sequence[float]) -> list:
+        now = self._now(args[0])
+        self._sweep(now)
+        tiers = [args[1 + i * 4:5 + i * 4] for i in range(len(keys))]
+        tokens = []
+        rejected_tier = 0
+        retry_after_ms = 0
+
+        for i, (key, (bucket_capacity, refill_rate, cost, _)) in enumerate(zip(keys, tiers)):
+            bucket_tokens = self._refill(key, bucket_capacity, refill_rate, now)
+            tokens.append(bucket_tokens)
+            if bucket_tokens < cost:
+                rejected_tier = rejected_tier or i + 1
+                retry_after_ms = max(retry_after_ms, math.ceil((cost - bucket_tokens) * 1000 / refill_rate))
+
+        if rejected_tier == 0:
+            for i, (key, (bucket_capacity, refill_rate, cost, ttl_seconds)) in enumerate(zip(keys, tiers)):
+                tokens[i] -= cost
+                self._store_bucket(key, tokens[i], now, bucket_capacity, refill_rate, ttl_seconds)
+
+        return [0 if rejected_tier else 1, rejected_tier, retry_after_ms] + [int(t) for t in tokens]
+
+    def _gcra_check(self, keys: Sequence[str], args: Sequence[float]) -> list:
+        emission_interval, burst, now, cost = args[:4]
+        # GCRA works in microseconds; expiry is tracked in milliseconds like the other scripts
+        now = self._now(now)
+        now_us = now * 1000
+        key = keys[0]
+        self._sweep(now)
+
+        state = self._gcra.get(key)
+        stored_tat = state.tat if state is not None and state.expires_at > now else now_us
+        tat = max(stored_tat, now_us)
+        new_tat = tat + emission_interval * cost
+        allow_at = new_tat - emission_interval * burst
+
+        if now_us < allow_at:
+            return [0, 0, math.ceil((allow_at - now_us) / 1000), math.ceil((tat - now_us) / 1000)]
+
+        reset_ms = math.ceil((new_tat - now_us) / 1000)
+        self._gcra[key] = _GcraState(new_tat, now + reset_ms)
+        return [1, math.floor((now_us - allow_at) / emission_interval), 0, reset_ms]
+
+    def _fixed_window(self, keys: Sequence[str], args: Sequence[float]) -> list:
+        window_size, max_requests, now = args[:3]
+        now = self._now(now)
+        key = keys[0]
+        self._sweep(now)
+
+        window_ms = window_size * 1000
+        reset_ms = math.ceil(window_ms - _lua_mod(now, window_ms))
+
+        state = self._fixed_windows.get(key)
+        if state is None or state.expires_at <= now:
+            state = self._fixed_windows[key] = _FixedWindowState(0, now + reset_ms)
+        state.count += 1
+
+        if state.count <= max_requests:
+            return [1, state.count, 0, reset_ms]
+        return [0, state.count, reset_ms, reset_ms]
+
+    def _sliding_window_log(self, keys: Sequence[str], args: Sequence[float]) -> list:
+        window_size, max_requests, now, bucket_ms = args[:4]
+        now = self._now(now)
+        key = keys[0]
+        self._sweep(now)
+
+        window_ms = window_size * 1000
+        span_ms = window_ms + max(bucket_ms, 0)
+        log = self._window_logs.get(key)
+        if log is None or log.expires_at <= now:
+            log = _WindowLogState()
+
+        # ZREMRANGEBYSCORE gets its bound as a "%.14g" string
+        expired = bisect.bisect_right(log.scores, _lua_stored(now - span_ms))
+        del log.scores[:expired], log.members[:expired]
+
+        if bucket_ms <= 0:
+            count = len(log.scores)
+            if count < max_requests:
+                self._log_add(key, log, now, "%d:%d" % (now, count), now + math.ceil(span_ms))
+                return [1, count + 1, 0, math.ceil(span_ms)]
+
+            oldest = log.scores[int(count - max_requests)]
+            self._window_logs[key] = log
+            return [0, count, math.ceil(oldest + span_ms - now), math.ceil(log.scores[-1] + span_ms - now)]
+
+        bucket = now - _lua_mod(now, bucket_ms)
+        counts = [int(_LOG_MEMBER_COUNT.search(member).group(1)) for member in log.members]
+        count = sum(counts)
+
+        if count < max_requests:
+            current_count = 0
+            if bucket in log.scores:
+                # Usually the newest bucket, unless another replica's clock runs ahead
+                position = log.scores.index(bucket)
+                current_count = counts[position]
+                del log.scores[position], log.members[position]
+            self._log_add(key, log, bucket, "%d:%d" % (bucket, current_count + 1), now + math.ceil(span_ms))
+            return [1, count + 1, 0, math.ceil(bucket + span_ms - now)]
+
+        retry_at = now
+        remaining = count
+        for score, bucket_count in zip(log.scores, counts):
+            remaining -= bucket_count
+            retry_at = score + span_ms
+            if remaining < max_requests:
+                break
+
+        self._window_logs[key] = log
+        return [0, count, math.ceil(retry_at - now), math.ceil(log.scores[-1] + span_ms - now)]
+
+    def _adaptive_limits_step(self, keys: Sequence[str], args: Sequence) -> list:
+        now, interval_ms, decrease_factor, increase_step, min_multiplier, ttl_ms = args[:6]
+        now = self._now(now)
+        self._sweep(now)
+        reports = [(args[i], args[i + 1] == 1) for i in range(6, len(args), 2)]
+
+        state = self._adaptive_limits.get(keys[0])
+        if state is None or state.expires_at <= now:
+            state = self._adaptive_limits[keys[0]] = _AdaptiveLimitsState()
+        state.overloaded.update(policy for policy, overloaded in reports if overloaded)
+
+        if state.updated_at is None or now - state.updated_at >= interval_ms:
+            for policy, _ in reports:
+                multiplier = state.multipliers.get(policy, 1)
+                if policy in state.overloaded:
+                    multiplier = max(min_multiplier, multiplier * decrease_factor)
+                    state.overloaded.discard(policy)
+                else:
+                    multiplier = min(1, multiplier + increase_step)
+                # HSET stores the number as "%.17g"
+                state.multipliers[policy] = float("%.17g" % multiplier)
+            state.updated_at = now
+        state.expires_at = now + ttl_ms
+
+        reply = []
+        for policy, multiplier in state.multipliers.items():
+            reply.extend((policy.encode(), ("%.17g" % multiplier).encode()))
+        return reply
+
+    def _log_add(self, key: str, log: _WindowLogState, score: float, member: str, expires_at: float) -> None:
+        position = bisect.bisect_right(log.scores, score)
+        log.scores.insert(position, score)
+        log.members.insert(position, member)
+        log.expires_at = expires_at
+        self._window_logs[key] = log
+
+
+class InMemoryTokenBucketRateLimiter(TokenBucketRateLimiter):
+    def __init__(self, tokens_per_second: float, max_tokens: int, expiry_seconds: int, tokens_per_request: int,
+                 store: InMemoryScriptStore | None = None, rejection_cache: RejectionCache | None = None):
+        super().__init__(tokens_per_second=tokens_per_second, max_tokens=max_tokens, redis_client=None,
+                         expiry_seconds=expiry_seconds, tokens_per_request=tokens_per_request,
+                         rejection_cache=rejection_cache)
+        self.store = store or InMemoryScriptStore()
+
+    async def _run_script(self, script_name: str, keys: Sequence[str], *args):
+        return self.store.run(script_name, keys, *args)
+
+
+class InMemorySlidingWindowCounterRateLimiter(SlidingWindowCounterRateLimiter):
+    def __init__(self, window_size_seconds: float, max_requests: int, expiry_seconds: int,
+                 store: InMemoryScriptStore | None = None, rejection_cache: RejectionCache | None = None):
+        super().__init__(redis_client=None, window_size_seconds=window_size_seconds, max_requests=max_requests,
+                         expiry_seconds=expiry_seconds, rejection_cache=rejection_cache)
+        self.store = store or InMemoryScriptStore()
+
+    async def _run_script(self, script_name: str, keys: Sequence[str], *args):
+        return self.store.run(script_name, keys, *args)
+
+
+class InMemoryCompositeTokenBucketRateLimiter(CompositeTokenBucketRateLimiter):
+    def __init__(self, tiers: Sequence[dict], store: InMemoryScriptStore | None = None):
+        super().__init__(tiers=tiers)
+        self.store = store or InMemoryScriptStore()
+
+    async def _run_script(self, script_name: str, keys: Sequence[str], *args):
+        return self.store.run(script_name, keys, *args)
+
+
+class InMemoryGcraRateLimiter(GcraRateLimiter):
+    def __init__(self, requests_per_second: float, burst: int, store: InMemoryScriptStore | None = None,
+                 rejection_cache: RejectionCache | None = None):
+        super().__init__(requests_per_second=requests_per_second, burst=burst, redis_client=None,
+                         rejection_cache=rejection_cache)
+        self.store = store or InMemoryScriptStore()
+
+    async def _run_script(self, script_name: str, keys: Sequence[str], *args):
+        return self.store.run(script_name, keys, *args)
+
+
+class InMemoryFixedWindowRateLimiter(FixedWindowRateLimiter):
+    def __init__(self, window_size_seconds: float, max_requests: int, store: InMemoryScriptStore | None = None,
+                 rejection_cache: RejectionCache | None = None):
+        super().__init__(window_size_seconds=window_size_seconds, max_requests=max_requests, redis_client=None,
+                         rejection_cache=rejection_cache)
+        self.store = store or InMemoryScriptStore()
+
+    async def _run_script(self, script_name: str, keys: Sequence[str], *args):
+        return self.store.run(script_name, keys, *args)
+
+
+class InMemorySlidingWindowLogRateLimiter(SlidingWindowLogRateLimiter):
+    def __init__(self, window_size_seconds: float, max_requests: int, max_entries: int = 1000, bucket_ms: int = 0,
+                 store: InMemoryScriptStore | None = None, rejection_cache: RejectionCache | None = None):
+        super().__init__(window_size_seconds=window_size_seconds, max_requests=max_requests, redis_client=None,
+                         max_entries=max_entries, bucket_ms=bucket_ms, rejection_cache=rejection_cache)
+        self.store = store or InMemoryScriptStore()
+
+    async def _run_script(self, script_name: str, keys: Sequence[str], *args):
+        return self.store.run(script_name, keys, *args)
@@ -1,3 +1,17 @@
 def build_user_rate_limit_key(user_id: str) -> str:
     sanitized_user_id = user_id.replace("{", "").replace("}", "")
     return f"rate_limit:{{user:{sanitized_user_id}}}"
+
+
+def build_user_scoped_rate_limit_key(user_id: str, scope: str) -> str:
+    # Shares the user's hash tag, so user/tenant/endpoint limits for one request
+    # land in the same slot and can be decided by a single batch script call.
+    sanitized_scope = scope.replace("{", "").replace("}", "")
+    return f"{build_user_rate_limit_key(user_id)}:{sanitized_scope}"
+
+
+def build_composite_rate_limit_key(hash_tag: str, scope: str) -> str:
+    # Every tier of one composite request shares hash_tag, so one chain script call decides them all
+    sanitized_hash_tag = hash_tag.replace("{", "").replace("}", "")
+    sanitized_scope = scope.replace("{", "").replace("}", "")
+    return f"rate_limit:{{{sanitized_hash_tag}}}:{sanitized_scope}"
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, TextIO
+
+from app.config import settings
+from app.core.metrics import log_records_dropped
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Loggers that bound their own volume; the decision log samples and rate-limits itself
+_PRESAMPLED_LOGGERS = ("app.decisions",)
+
+# Attributes every LogRecord has; anything else on a record came from ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: timestamp, level, logger, message, ``extra`` fields and any traceback."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name, value in vars(record).items():
+            if name not in _RECORD_ATTRIBUTES:
+                entry[name] = value
+
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Samples and throttles log records per message type before they are queued.
+
+    A message type is a logging call site (file and line), so f-string messages
+    that differ per request still count as one type and the state stays bounded
+    by the size of the code. Records below WARNING are kept with the sample rate
+    of the longest matching logger prefix in ``overrides`` (else ``sample_rate``).
+    Every type is then held to ``max_per_second`` by a token bucket; the next
+    record let through carries the number suppressed since the last one.
+    """
+
+    def __init__(self, sample_rate: float, overrides: dict[str, float], max_per_second: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+        # Longest prefix first, so "app.core.gcra" wins over "app.core"
+        self.overrides = sorted(overrides.items(), key=lambda override: len(override[0]), reverse=True)
+        self.max_per_second = max_per_second
+        self._rates: dict[str, float] = {}
+        # call site -> [tokens, refilled_at, suppressed]
+        self._buckets: dict[tuple[str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def rate_for(self, logger_name: str) -> float:
+        rate = self._rates.get(logger_name)
+        if rate is None:
+            rate = self.sample_rate
+            for prefix, override in self.overrides:
+                if logger_name == prefix or logger_name.startswith(prefix + "."):
+                    rate = override
+                    break
+            self._rates[logger_name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.name in _PRESAMPLED_LOGGERS:
+            return True
+
+        if record.levelno < logging.WARNING:
+            rate = self.rate_for(record.name)
+            if rate < 1 and (rate <= 0 or random.random() >= rate):
+                log_records_dropped.labels(reason="sampled").inc()
+                return False
+
+        if self.max_per_second <= 0:
+            return True
+
+        now = time.monotonic()
+        call_site = (record.pathname, record.lineno)
+        with self._lock:
+            bucket = self._buckets.get(call_site)
+            if bucket is None:
+                bucket = self._buckets[call_site] = [self.max_per_second, now, 0]
+            else:
+                bucket[0] = min(self.max_per_second, bucket[0] + (now - bucket[1]) * self.max_per_second)
+                bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                log_records_dropped.labels(reason="throttled").inc()
+                return False
+            bucket[0] -= 1
+            if bucket[2]:
+                record.suppressed = bucket[2]
+                bucket[2] = 0
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Hands records to the listener thread without formatting them or waiting on a full queue.
+
+    The stock handler formats the message in the caller's thread; here only a
+    traceback is rendered (while its frames are still live). Message arguments
+    are therefore formatted later on the listener thread and must not be mutated
+    after the call. Records arriving while the queue is full are dropped and counted.
+    """
+
+    _traceback_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self._traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_records_dropped.labels(reason="queue_full").inc()
+
+
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging(stream: Optional[TextIO] = None) -> None:
+    """(Re)configure the root logger from settings, writing to ``stream`` (stderr by default).
+
+    With ``log_async`` the root handler only filters and enqueues; a listener
+    thread formats and writes. Calling it again replaces the previous setup.
+    """
+    global _listener
+    stop_logging()
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+
+    output = logging.StreamHandler(stream)
+    output.setFormatter(JsonFormatter() if settings.log_format == "json" else logging.Formatter(TEXT_FORMAT))
+
+    if settings.log_async:
+        handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.log_queue_size))
+        _listener = QueueListener(handler.queue, output)
+        _listener.start()
+    else:
+        handler = output
+
+    handler.addFilter(SamplingFilter(
+        sample_rate=settings.log_sample_rate,
+        overrides=settings.log_sample_rate_overrides,
+        max_per_second=settings.log_max_per_second_per_message
+    ))
+    root.addHandler(handler)
+    root.setLevel(settings.log_level.upper())
+
+
+def stop_logging() -> None:
+    """Write out the queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
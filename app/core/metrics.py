@@ -1,6 +1,19 @@
+import asyncio
+import heapq
+import logging
+import os
 import time
+import weakref
+from bisect import bisect_left
+from typing import Callable, Optional
 
-from prometheus_client import Counter, Histogram, Gauge
+from prometheus_client import Counter, Histogram, Gauge, REGISTRY, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.mmap_dict import MmapedDict, mmap_key
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
 
 # Rate limiter metrics
 rate_limit_requests_total = Counter(
@@ -27,11 +40,15 @@ rate_limit_errors = Counter(
     ['algorithm', 'error_type']
 )
 
+_CHECK_DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, float("inf"))
+# Buckets of the *_remaining and *_request_count histograms
+_REMAINING_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, float("inf"))
+
 rate_limit_check_duration = Histogram(
     'rate_limiter_check_duration_seconds',
     'Time spent checking rate limits',
     ['algorithm'],
-    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+    buckets=_CHECK_DURATION_BUCKETS
 )
 
 # Redis metrics
@@ -53,24 +70,399 @@ redis_script_errors = Counter(
     ['script_name', 'error_type']
 )
 
-# Active connections gauge
-active_redis_connections = Gauge(
-    'redis_active_connections',
-    'Number of active Redis connections'
+# Redis micro-batching metrics
+redis_batch_size = Histogram(
+    'redis_batch_size',
+    'Number of script calls coalesced into one flush',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+)
+
+redis_batch_flushes = Counter(
+    'redis_batch_flushes_total',
+    'Total number of batch flushes',
+    ['reason']
+)
+
+redis_batch_queue_depth = Gauge(
+    'redis_batch_queue_depth',
+    'Number of batched script calls queued or in flight',
+    multiprocess_mode='livesum'
+)
+
+redis_batch_rejected = Counter(
+    'redis_batch_rejected_total',
+    'Total number of script calls rejected because the batch queue was full'
+)
+
+redis_batch_timeouts = Counter(
+    'redis_batch_timeouts_total',
+    'Total number of batched script calls that exceeded the max wait deadline'
+)
+
+# Redis circuit breaker metrics
+redis_circuit_breaker_state = Gauge(
+    'redis_circuit_breaker_state',
+    'State of the Redis circuit breaker (0 closed, 1 half-open, 2 open)',
+    multiprocess_mode='livemax'
+)
+
+redis_circuit_breaker_transitions = Counter(
+    'redis_circuit_breaker_transitions_total',
+    'Total number of Redis circuit breaker state changes, by the state entered',
+    ['state']
+)
+
+redis_circuit_breaker_short_circuits = Counter(
+    'redis_circuit_breaker_short_circuits_total',
+    'Total number of script calls refused without contacting Redis while the breaker was open'
+)
+
+rate_limit_fallback_checks = Counter(
+    'rate_limiter_fallback_checks_total',
+    'Total number of checks decided by the local fallback limiter while Redis was unavailable',
+    ['algorithm']
+)
+
+# Rejection cache metrics
+rejection_cache_hits = Counter(
+    'rejection_cache_hits_total',
+    'Total number of checks rejected from the in-process rejection cache',
+    ['algorithm']
+)
+
+rejection_cache_misses = Counter(
+    'rejection_cache_misses_total',
+    'Total number of checks not found in the in-process rejection cache',
+    ['algorithm']
+)
+
+rejection_cache_evictions = Counter(
+    'rejection_cache_evictions_total',
+    'Total number of entries evicted from the rejection cache at capacity',
+    ['algorithm']
+)
+
+rejection_cache_size = Gauge(
+    'rejection_cache_size',
+    'Number of keys currently held in the rejection cache',
+    ['algorithm'],
+    multiprocess_mode='livesum'
+)
+
+# Hybrid limiter metrics
+hybrid_sync_duration = Histogram(
+    'hybrid_sync_duration_seconds',
+    'Time spent flushing local deltas to Redis and pulling back global totals',
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+
+# Shadow limits and decision log metrics
+rate_limit_shadow_checks = Counter(
+    'rate_limiter_shadow_checks_total',
+    'Total number of requests checked against a policy\'s shadow limits, by enforced and shadow outcome',
+    ['policy', 'enforced', 'shadow']
+)
+
+decision_log_events = Counter(
+    'rate_limiter_decision_log_events_total',
+    'Total number of sampled decision log records, by whether they were written or dropped',
+    ['result']
+)
+
+log_records_dropped = Counter(
+    'rate_limiter_log_records_dropped_total',
+    'Total number of log records dropped by the logging pipeline before being written',
+    ['reason']
+)
+
+# Adaptive limit metrics
+adaptive_limit_multiplier = Gauge(
+    'rate_limiter_adaptive_limit_multiplier',
+    'Share of a policy\'s configured limits currently enforced by the adaptive limit controller',
+    ['policy'],
+    multiprocess_mode='livemin'
+)
+
+adaptive_overload_signals = Counter(
+    'rate_limiter_adaptive_overload_signals_total',
+    'Total number of controller intervals in which a policy was judged overloaded, by signal',
+    ['policy', 'signal']
+)
+
+# Redis connection pool metrics; pool sizes are read at scrape time by RedisPoolCollector
+redis_pool_wait_duration = Histogram(
+    'redis_pool_wait_duration_seconds',
+    'Time spent getting a pooled Redis connection, connecting included (standalone mode only)',
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
+
+redis_pool_exhausted = Counter(
+    'redis_pool_exhausted_total',
+    'Total number of Redis calls that found no free connection within the pool limit'
 )
 
 # Token bucket specific metrics
-token_bucket_tokens_remaining = Gauge(
+token_bucket_tokens_remaining = Histogram(
     'token_bucket_tokens_remaining',
-    'Number of tokens remaining in bucket',
-    ['user_id']
+    'Tokens left in the bucket after each check',
+    buckets=_REMAINING_BUCKETS
+)
+
+token_lease_renewals = Counter(
+    'token_lease_renewals_total',
+    'Total number of token lease renewals against Redis',
+    ['result']
+)
+
+composite_tier_rejections = Counter(
+    'composite_tier_rejections_total',
+    'Total number of composite limit checks rejected, by the first tier short of tokens',
+    ['tier']
+)
+
+composite_refunds = Counter(
+    'composite_refunds_total',
+    'Total number of composite tier reservations handed back after another hash slot rejected'
 )
 
 # Sliding window specific metrics
-sliding_window_request_count = Gauge(
+sliding_window_request_count = Histogram(
     'sliding_window_request_count',
-    'Current request count in sliding window',
-    ['user_id']
+    'Effective request count in the sliding window after each check',
+    buckets=_REMAINING_BUCKETS
+)
+
+gcra_requests_remaining = Histogram(
+    'gcra_requests_remaining',
+    'Requests of burst left under the GCRA limit after each check',
+    buckets=_REMAINING_BUCKETS
+)
+
+fixed_window_request_count = Histogram(
+    'fixed_window_request_count',
+    'Checks counted in the current fixed window after each check',
+    buckets=_REMAINING_BUCKETS
+)
+
+sliding_window_log_request_count = Histogram(
+    'sliding_window_log_request_count',
+    'Requests in the sliding window log after each check',
+    buckets=_REMAINING_BUCKETS
+)
+
+
+class HeavyHitters:
+    """Space-saving sketch of the most frequently checked keys.
+
+    Holds at most ``capacity`` counters regardless of how many keys are seen.
+    Any key with more than ``total / capacity`` checks is guaranteed to be
+    tracked, and a tracked count overestimates the true count by at most the
+    count of the key it evicted (kept as ``error``).
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.total = 0
+        self._counts: dict[str, int] = {}
+        self._errors: dict[str, int] = {}
+        # Min-heap of (count, key); entries go stale as counts grow and are fixed up lazily
+        self._heap: list[tuple[int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def add(self, key: str) -> None:
+        self.total += 1
+        counts = self._counts
+
+        if key in counts:
+            counts[key] += 1
+            return
+
+        if len(counts) < self.capacity:
+            counts[key] = 1
+            self._errors[key] = 0
+            heapq.heappush(self._heap, (1, key))
+            return
+
+        # Evict the smallest counter; the newcomer inherits its count as error
+        heap = self._heap
+        while True:
+            count, victim = heap[0]
+            if counts[victim] == count:
+                break
+            heapq.heapreplace(heap, (counts[victim], victim))
+
+        del counts[victim]
+        del self._errors[victim]
+        counts[key] = count + 1
+        self._errors[key] = count
+        heapq.heapreplace(heap, (count + 1, key))
+
+    def top(self, k: int) -> list[tuple[str, int, int]]:
+        """Return up to ``k`` ``(key, count, error)`` tuples, hottest first."""
+        hottest = heapq.nlargest(k, self._counts.items(), key=lambda item: item[1])
+        return [(key, count, self._errors[key]) for key, count in hottest]
+
+
+class HotKeysCollector:
+    """Exposes only the top-K keys of each algorithm's sketch at scrape time."""
+
+    def __init__(self, top_k: int, capacity: int):
+        self.top_k = top_k
+        self.capacity = capacity
+        self.sketches: dict[str, HeavyHitters] = {}
+
+    def record(self, algorithm: str, key: str) -> None:
+        sketch = self.sketches.get(algorithm)
+        if sketch is None:
+            sketch = self.sketches[algorithm] = HeavyHitters(self.capacity)
+        sketch.add(key)
+
+    def collect(self):
+        checks = GaugeMetricFamily(
+            'rate_limiter_hot_key_checks',
+            'Estimated rate limit checks for the hottest keys since startup',
+            labels=['algorithm', 'key']
+        )
+        errors = GaugeMetricFamily(
+            'rate_limiter_hot_key_checks_error',
+            'Maximum overestimate of rate_limiter_hot_key_checks',
+            labels=['algorithm', 'key']
+        )
+
+        for algorithm, sketch in list(self.sketches.items()):
+            for key, count, error in sketch.top(self.top_k):
+                checks.add_metric([algorithm, key], count)
+                errors.add_metric([algorithm, key], error)
+
+        yield checks
+        yield errors
+
+
+class RedisPoolCollector:
+    """Exposes per-node connection pool usage of the Redis client at scrape time."""
+
+    def __init__(self):
+        # Returns (node, role, in use, idle, max connections) per pool
+        self.stats: Optional[Callable[[], list[tuple[str, str, int, int, int]]]] = None
+
+    def bind(self, stats: Callable[[], list[tuple[str, str, int, int, int]]]) -> None:
+        self.stats = stats
+
+    def collect(self):
+        in_use = GaugeMetricFamily(
+            'redis_pool_connections_in_use',
+            'Pooled Redis connections currently checked out',
+            labels=['node', 'role']
+        )
+        idle = GaugeMetricFamily(
+            'redis_pool_connections_idle',
+            'Open pooled Redis connections waiting to be reused',
+            labels=['node', 'role']
+        )
+        capacity = GaugeMetricFamily(
+            'redis_pool_max_connections',
+            'Connection limit of each Redis pool',
+            labels=['node', 'role']
+        )
+
+        for node, role, node_in_use, node_idle, node_max in (self.stats() if self.stats else ()):
+            in_use.add_metric([node, role], node_in_use)
+            idle.add_metric([node, role], node_idle)
+            capacity.add_metric([node, role], node_max)
+
+        yield in_use
+        yield idle
+        yield capacity
+
+
+redis_pools = RedisPoolCollector()
+REGISTRY.register(redis_pools)
+
+hot_keys = HotKeysCollector(top_k=settings.metrics_hot_keys_top_k,
+                            capacity=settings.metrics_hot_keys_capacity)
+REGISTRY.register(hot_keys)
+
+
+def multiprocess_metrics_enabled() -> bool:
+    return "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+
+class MultiprocessCollectorSync:
+    """Copies scrape-time collectors into the multiprocess files on an interval.
+
+    With several worker processes, /metrics only aggregates what each worker
+    wrote to PROMETHEUS_MULTIPROC_DIR, and the collectors above run in whichever
+    worker serves the scrape. Each worker therefore rewrites a snapshot file of
+    livesum gauges with the same names, summed over live workers. Entries cannot
+    be deleted from an mmap file, so every sample writes a fresh file and
+    swaps it in: a key leaving the top K disappears instead of lingering at 0.
+    The file is written with prometheus_client.mmap_dict as of the pinned
+    prometheus_client 0.24.0.
+    """
+
+    def __init__(self, collectors: list, interval_seconds: float):
+        self.collectors = collectors
+        self.interval_seconds = interval_seconds
+        self._task: asyncio.Task | None = None
+
+    @staticmethod
+    def snapshot_path() -> str:
+        # MultiProcessCollector reads gauge_<mode>_<pid>.db; this worker's pid and mode, its own file
+        return os.path.join(os.environ["PROMETHEUS_MULTIPROC_DIR"], f"gauge_livesum_{os.getpid()}sampled.db")
+
+    def sample(self) -> None:
+        path = self.snapshot_path()
+        partial_path = path + ".partial"
+        if os.path.exists(partial_path):
+            # Left by an interrupted sample; MmapedDict would append to it
+            os.remove(partial_path)
+
+        snapshot = MmapedDict(partial_path)
+        try:
+            for collector in self.collectors:
+                for family in collector.collect():
+                    for sample in family.samples:
+                        key = mmap_key(family.name, sample.name, list(sample.labels), list(sample.labels.values()),
+                                       family.documentation)
+                        snapshot.write_value(key, sample.value, 0.0)
+        finally:
+            snapshot.close()
+        os.replace(partial_path, path)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Sampling metrics for multiprocess mode failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        # Drops this worker's live* gauges and sampled snapshot from the aggregate
+        multiprocess.mark_process_dead(os.getpid())
+        try:
+            os.remove(self.snapshot_path())
+        except FileNotFoundError:
+            pass
+
+
+multiprocess_sync = MultiprocessCollectorSync(
+    collectors=[redis_pools, hot_keys],
+    interval_seconds=settings.metrics_multiprocess_sample_seconds
 )
 
 
@@ -83,11 +475,11 @@ class MetricsContext:
         self.start_time = None
 
     def __enter__(self):
-        self.start_time = time.time()
+        self.start_time = time.perf_counter_ns()
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        duration = time.time() - self.start_time
+        duration = (time.perf_counter_ns() - self.start_time) / 1e9
         rate_limit_check_duration.labels(
             algorithm=self.algorithm).observe(duration)
 
@@ -99,3 +491,223 @@ class MetricsContext:
             ).inc()
 
         return False
+
+
+class _CheckTimer:
+    __slots__ = ("metrics", "start_ns")
+
+    def __init__(self, metrics: "LimiterMetrics"):
+        self.metrics = metrics
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.metrics.observe_duration(time.perf_counter_ns() - self.start_ns)
+
+        if exc_type is not None:
+            rate_limit_errors.labels(
+                algorithm=self.metrics.algorithm,
+                error_type=exc_type.__name__
+            ).inc()
+
+        return False
+
+
+class _HistogramBuffer:
+    """Local bucket counts for a histogram child, added to it in one step on flush.
+
+    Adding whole bucket counts needs the child's ``_upper_bounds``, ``_buckets``
+    and ``_sum``, which are private to prometheus_client (pinned to 0.24.0 in
+    requirements.txt). If a release drops them, each bucket is instead flushed
+    through the public ``observe()``, once per buffered value, at the mean of
+    the values it holds; bucket counts and the sum come out the same.
+    """
+
+    __slots__ = ("child", "upper_bounds", "counts", "sums", "total", "add_counts")
+
+    def __init__(self, child, upper_bounds: tuple):
+        self.child = child
+        self.add_counts = all(hasattr(child, field) for field in ("_upper_bounds", "_buckets", "_sum"))
+        # Histogram children keep non-cumulative bucket values next to their bounds
+        self.upper_bounds = child._upper_bounds if self.add_counts else upper_bounds
+        self.counts = [0] * len(self.upper_bounds)
+        self.sums = [0.0] * len(self.upper_bounds)
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        bucket = bisect_left(self.upper_bounds, value)
+        self.total += value
+        self.counts[bucket] += 1
+        self.sums[bucket] += value
+
+    def flush(self) -> None:
+        if not any(self.counts):
+            return
+
+        for i, count in enumerate(self.counts):
+            if not count:
+                continue
+            if self.add_counts:
+                self.child._buckets[i].inc(count)
+            else:
+                mean = self.sums[i] / count
+                for _ in range(count):
+                    self.child.observe(mean)
+            self.counts[i] = 0
+            self.sums[i] = 0.0
+        if self.add_counts:
+            self.child._sum.inc(self.total)
+        self.total = 0.0
+
+
+class LimiterMetrics:
+    """Hot-path metrics for one limiter, with label children bound up front.
+
+    With ``flush_interval_ms`` > 0 counts and histogram buckets are kept in plain
+    local fields and pushed to Prometheus at most once per interval: on the
+    first check after it elapses, and from ``metrics_flusher`` for limiters
+    that see no more checks. Exported values can lag by up to one interval.
+    """
+
+    def __init__(self, algorithm: str, endpoint: str, remaining: Histogram | None = None,
+                 flush_interval_ms: int | None = None):
+        if flush_interval_ms is None:
+            flush_interval_ms = settings.metrics_buffer_flush_ms
+
+        self.algorithm = algorithm
+        self.endpoint = endpoint
+        self.buffered = flush_interval_ms > 0
+        self.flush_interval_ns = flush_interval_ms * 1_000_000
+
+        self._allowed = rate_limit_allowed.labels(algorithm=algorithm, endpoint=endpoint)
+        self._allowed_total = rate_limit_requests_total.labels(
+            algorithm=algorithm, result="allowed", endpoint=endpoint)
+        self._rejected = rate_limit_rejected.labels(algorithm=algorithm, endpoint=endpoint)
+        self._rejected_total = rate_limit_requests_total.labels(
+            algorithm=algorithm, result="rejected", endpoint=endpoint)
+        self._redis_success = redis_operations_total.labels(operation="evalsha", status="success")
+        self._redis_error = redis_operations_total.labels(operation="evalsha", status="error")
+        self._duration = rate_limit_check_duration.labels(algorithm=algorithm)
+        self._remaining = remaining
+
+        self._allowed_count = 0
+        self._rejected_count = 0
+        self._redis_success_count = 0
+        self._redis_error_count = 0
+        self._duration_buffer = _HistogramBuffer(self._duration, _CHECK_DURATION_BUCKETS)
+        self._remaining_buffer = _HistogramBuffer(remaining, _REMAINING_BUCKETS) if remaining is not None else None
+        self._flush_at_ns = time.perf_counter_ns() + self.flush_interval_ns
+        if self.buffered:
+            metrics_flusher.register(self)
+
+    def check(self) -> _CheckTimer:
+        return _CheckTimer(self)
+
+    def observe_duration(self, duration_ns: int) -> None:
+        if self.buffered:
+            self._duration_buffer.observe(duration_ns / 1e9)
+            self._maybe_flush()
+        else:
+            self._duration.observe(duration_ns / 1e9)
+
+    def record_decision(self, key: str, allowed: bool, remaining=None) -> None:
+        hot_keys.record(self.algorithm, key)
+
+        if self.buffered:
+            if allowed:
+                self._allowed_count += 1
+            else:
+                self._rejected_count += 1
+            if remaining is not None and self._remaining_buffer is not None:
+                self._remaining_buffer.observe(remaining)
+            return
+
+        if allowed:
+            self._allowed.inc()
+            self._allowed_total.inc()
+        else:
+            self._rejected.inc()
+            self._rejected_total.inc()
+        if remaining is not None and self._remaining is not None:
+            self._remaining.observe(remaining)
+
+    def redis_success(self) -> None:
+        if self.buffered:
+            self._redis_success_count += 1
+        else:
+            self._redis_success.inc()
+
+    def redis_error(self) -> None:
+        if self.buffered:
+            self._redis_error_count += 1
+        else:
+            self._redis_error.inc()
+
+    def _maybe_flush(self) -> None:
+        if time.perf_counter_ns() >= self._flush_at_ns:
+            self.flush()
+
+    def flush(self) -> None:
+        self._flush_at_ns = time.perf_counter_ns() + self.flush_interval_ns
+
+        if self._allowed_count:
+            self._allowed.inc(self._allowed_count)
+            self._allowed_total.inc(self._allowed_count)
+            self._allowed_count = 0
+        if self._rejected_count:
+            self._rejected.inc(self._rejected_count)
+            self._rejected_total.inc(self._rejected_count)
+            self._rejected_count = 0
+        if self._redis_success_count:
+            self._redis_success.inc(self._redis_success_count)
+            self._redis_success_count = 0
+        if self._redis_error_count:
+            self._redis_error.inc(self._redis_error_count)
+            self._redis_error_count = 0
+
+        self._duration_buffer.flush()
+        if self._remaining_buffer is not None:
+            self._remaining_buffer.flush()
+
+
+class MetricsFlusher:
+    """Flushes buffered LimiterMetrics every interval.
+
+    A buffered limiter otherwise only flushes on its next check, so one that
+    goes idle would never export its last interval.
+    """
+
+    def __init__(self, interval_ms: int):
+        self.interval_seconds = interval_ms / 1000
+        self._metrics: weakref.WeakSet[LimiterMetrics] = weakref.WeakSet()
+        self._task: asyncio.Task | None = None
+
+    def register(self, metrics: LimiterMetrics) -> None:
+        self._metrics.add(metrics)
+
+    def start(self) -> None:
+        if self.interval_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            self.flush()
+
+    def flush(self) -> None:
+        for metrics in list(self._metrics):
+            try:
+                metrics.flush()
+            except Exception as e:
+                logger.error(f"Flushing buffered {metrics.algorithm} metrics failed: {e}")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.flush()
+
+
+metrics_flusher = MetricsFlusher(interval_ms=settings.metrics_buffer_flush_ms)
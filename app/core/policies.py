@@ -0,0 +1,379 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from typing import Callable, Mapping, Optional
+
+import yaml
+
+from app.core.base import RateLimiterStrategy
+
+logger = logging.getLogger(__name__)
+
+ANY_METHOD = "*"
+
+LimiterBuilder = Callable[[str, dict], RateLimiterStrategy]
+
+class LimiterUnavailableError(RuntimeError):
+    """Raised by a limiter builder when the backend is not ready yet; the rule is retried on the next tick."""
+
+
+# How long limiters dropped by a reload stay open for checks still using them
+RETIRE_GRACE_SECONDS = 30.0
+RETIRE_POLL_SECONDS = 0.05
+
+
+class RequestCost:
+    """Tokens a request is charged by a token bucket policy.
+
+    A rule's ``cost`` is either a fixed count (``cost: 5``) or derived from a
+    numeric request header, one token per started ``per`` units, clamped to
+    ``[min, max]`` (``cost: {header: content-length, per: 1024, max: 64}``). A
+    missing or unparsable header (including ``inf`` and ``nan``) costs ``min``.
+    """
+
+    __slots__ = ("tokens", "header", "per", "maximum")
+
+    def __init__(self, tokens: int = 1, header: Optional[str] = None, per: float = 1, maximum: Optional[int] = None):
+        self.tokens = tokens
+        self.header = header
+        self.per = per
+        self.maximum = maximum
+
+    @classmethod
+    def from_rule(cls, cost) -> RequestCost:
+        if isinstance(cost, dict):
+            request_cost = cls(tokens=int(cost.get("min", 1)), header=cost["header"].lower(),
+                               per=cost.get("per", 1), maximum=cost.get("max"))
+        else:
+            request_cost = cls(tokens=int(cost))
+        if request_cost.tokens < 1 or request_cost.per <= 0:
+            raise ValueError(f"Invalid cost {cost!r}: tokens and per must be positive")
+        return request_cost
+
+    def for_request(self, headers: Mapping[str, str]) -> int:
+        if self.header is None:
+            return self.tokens
+
+        try:
+            tokens = max(self.tokens, math.ceil(float(headers.get(self.header, 0)) / self.per))
+        except (ValueError, OverflowError):
+            return self.tokens
+        return tokens if self.maximum is None else min(tokens, self.maximum)
+
+
+class Policy:
+    __slots__ = ("name", "algorithm", "params", "retry_after_seconds", "limiter", "shadow", "cost")
+
+    def __init__(self, name: str, algorithm: str, params: dict, retry_after_seconds: int,
+                 limiter: RateLimiterStrategy, shadow: Optional[Policy] = None, cost: Optional[RequestCost] = None):
+        self.name = name
+        self.algorithm = algorithm
+        self.params = params
+        self.retry_after_seconds = retry_after_seconds
+        self.limiter = limiter
+        # Candidate limits checked next to the enforced ones, never rejecting; keyed by "<name>:shadow"
+        self.shadow = shadow
+        # Tokens per request for token bucket policies; None charges the limiter's tokens_per_request
+        self.cost = cost
+
+    def limiters(self) -> list[RateLimiterStrategy]:
+        return [self.limiter] if self.shadow is None else [self.limiter, self.shadow.limiter]
+
+
+class _RouteTable:
+    """Policies for one route (or route prefix), keyed by their exact match conditions."""
+
+    __slots__ = ("policies", "header_names")
+
+    def __init__(self):
+        # (method, tenant, header name, header value) -> policy; None means "any"
+        self.policies: dict[tuple, Policy] = {}
+        self.header_names: list[str] = []
+
+    def add(self, conditions: tuple, policy: Policy) -> None:
+        if conditions in self.policies:
+            raise ValueError(f"Policies '{self.policies[conditions].name}' and '{policy.name}' "
+                             f"have identical match conditions")
+
+        self.policies[conditions] = policy
+        header_name = conditions[2]
+        if header_name is not None and header_name not in self.header_names:
+            self.header_names.append(header_name)
+
+    def match(self, method: str, tenant: Optional[str], headers: Mapping[str, str]) -> Optional[Policy]:
+        # Most specific first: method, then tenant, then header
+        policies = self.policies
+        for method_key in (method, ANY_METHOD):
+            for tenant_key in ((tenant, None) if tenant else (None,)):
+                for header_name in self.header_names:
+                    header_value = headers.get(header_name)
+                    if header_value is not None:
+                        policy = policies.get((method_key, tenant_key, header_name, header_value))
+                        if policy is not None:
+                            return policy
+
+                policy = policies.get((method_key, tenant_key, None, None))
+                if policy is not None:
+                    return policy
+
+        return None
+
+
+class PolicyIndex:
+    """Rules compiled into hash tables keyed by route and match conditions.
+
+    A lookup costs a handful of dict probes per path segment, independent of
+    the number of rules. Exact routes win over ``/prefix/*`` routes, and longer
+    prefixes win over shorter ones.
+    """
+
+    def __init__(self, tenant_header: str):
+        self.tenant_header = tenant_header
+        self.exact: dict[str, _RouteTable] = {}
+        self.prefixes: dict[str, _RouteTable] = {}
+        self.policies: list[Policy] = []
+        # Lower-case request headers the index needs to see
+        self.header_names: frozenset[str] = frozenset()
+        # Checks running against this index's limiters (maintained by the middleware)
+        self.in_flight = 0
+
+    def add(self, rule: dict, policy: Policy) -> None:
+        route = rule["route"]
+        if route.endswith("/*"):
+            table = self.prefixes.setdefault(route[:-2], _RouteTable())
+        else:
+            table = self.exact.setdefault(route, _RouteTable())
+
+        header = rule.get("header")
+        header_name = header["name"].lower() if header else None
+        header_value = str(header["value"]) if header else None
+        tenant = rule.get("tenant")
+
+        table.add((rule.get("method", ANY_METHOD).upper(), str(tenant) if tenant is not None else None,
+                   header_name, header_value), policy)
+        self.policies.append(policy)
+
+        header_names = set()
+        # Composite limits key their tenant tiers by the tenant header too
+        composite = policy.algorithm == "composite" or (policy.shadow is not None
+                                                        and policy.shadow.algorithm == "composite")
+        if tenant is not None or composite:
+            header_names.add(self.tenant_header)
+        if header_name is not None:
+            header_names.add(header_name)
+        for checked in (policy, policy.shadow):
+            if checked is not None and checked.cost is not None and checked.cost.header is not None:
+                header_names.add(checked.cost.header)
+        if header_names:
+            self.header_names = self.header_names | header_names
+
+    def match(self, path: str, method: str, headers: Mapping[str, str]) -> Optional[Policy]:
+        tenant = headers.get(self.tenant_header)
+
+        table = self.exact.get(path)
+        if table is not None:
+            policy = table.match(method, tenant, headers)
+            if policy is not None:
+                return policy
+
+        if not self.prefixes:
+            return None
+
+        prefix = path.rstrip("/")
+        while True:
+            table = self.prefixes.get(prefix)
+            if table is not None:
+                policy = table.match(method, tenant, headers)
+                if policy is not None:
+                    return policy
+            if not prefix:
+                return None
+            prefix = prefix[:prefix.rfind("/")]
+
+
+def load_rules(path: str) -> list[dict]:
+    with open(path) as f:
+        if path.endswith(".json"):
+            document = json.load(f)
+        else:
+            document = yaml.safe_load(f)
+
+    rules = (document or {}).get("rules", [])
+    for i, rule in enumerate(rules):
+        missing = [field for field in ("name", "route", "algorithm") if field not in rule]
+        if missing:
+            raise ValueError(f"Rule #{i} in {path} is missing {', '.join(missing)}")
+    return rules
+
+
+class PolicyEngine:
+    """Loads rate limit rules from a YAML/JSON file and matches requests against them.
+
+    Reloads build a complete new ``PolicyIndex`` and swap it in with a single
+    assignment, so a request sees either the old or the new rules. Limiters
+    whose algorithm and parameters did not change are carried over with their
+    state; the others are closed once the checks running against the old index
+    have finished (or after ``RETIRE_GRACE_SECONDS``). A rule whose limiter
+    cannot be built (bad parameters, an algorithm the backend lacks) is skipped,
+    and a file that cannot be parsed keeps the current rules; either way the
+    file is read again only once it changes. Rules skipped with
+    ``LimiterUnavailableError`` (Redis not connected yet) are the exception:
+    they are retried every ``reload_interval_seconds`` until they build.
+
+    Without ``shadow_enabled`` rules are enforced without their shadow limits:
+    a shadow check is a second Redis call per request unless micro-batching
+    puts it in the same pipeline as the enforced one.
+    """
+
+    def __init__(self, path: str, build_limiter: LimiterBuilder, tenant_header: str = "tenant_id",
+                 reload_interval_seconds: float = 0.0, shadow_enabled: bool = True):
+        self.path = path
+        self.build_limiter = build_limiter
+        self.shadow_enabled = shadow_enabled
+        self.tenant_header = tenant_header.lower()
+        self.reload_interval_seconds = reload_interval_seconds
+        self.index = PolicyIndex(self.tenant_header)
+        self._loaded_mtime: float | None = None
+        # Rules were skipped because the backend was not ready
+        self._retry_pending = False
+        self._watcher: asyncio.Task | None = None
+        self._retiring: set[asyncio.Task] = set()
+
+    @property
+    def header_names(self) -> frozenset[str]:
+        return self.index.header_names
+
+    def match(self, path: str, method: str, headers: Mapping[str, str]) -> Optional[Policy]:
+        return self.index.match(path, method, headers)
+
+    def compile(self, rules: list[dict]) -> tuple[PolicyIndex, int]:
+        """Build an index for ``rules``; returns it with the number of rules skipped."""
+        current = {}
+        for policy in self.index.policies:
+            for existing in (policy, policy.shadow):
+                if existing is not None:
+                    current[(existing.algorithm, _params_signature(existing.params))] = existing.limiter
+        built: dict[tuple, RateLimiterStrategy] = {}
+        index = PolicyIndex(self.tenant_header)
+        skipped = 0
+        self._retry_pending = False
+
+        def limiter_for(algorithm: str, params: dict) -> RateLimiterStrategy:
+            signature = (algorithm, _params_signature(params))
+            limiter = built.get(signature) or current.get(signature)
+            if limiter is None:
+                limiter = self.build_limiter(algorithm, params)
+            built[signature] = limiter
+            return limiter
+
+        for rule in rules:
+            algorithm = rule["algorithm"]
+            params = rule.get("params", {})
+            retry_after_seconds = int(rule.get("retry_after_seconds", 1))
+            try:
+                cost = RequestCost.from_rule(rule["cost"]) if "cost" in rule else None
+                if cost is not None and algorithm != "token_bucket":
+                    raise ValueError("cost is only supported by the token_bucket algorithm")
+                limiter = limiter_for(algorithm, params)
+                shadow = None
+                if rule.get("shadow") and not self.shadow_enabled:
+                    logger.warning(f"Ignoring the shadow limits of policy '{rule['name']}': "
+                                   f"they need REDIS_BATCHING_ENABLED=true")
+                elif rule.get("shadow"):
+                    shadow_algorithm = rule["shadow"].get("algorithm", algorithm)
+                    shadow_params = rule["shadow"].get("params", {})
+                    shadow = Policy(
+                        name=f"{rule['name']}:shadow",
+                        algorithm=shadow_algorithm,
+                        params=shadow_params,
+                        retry_after_seconds=retry_after_seconds,
+                        limiter=limiter_for(shadow_algorithm, shadow_params),
+                        # Weighing requests the same way only makes sense for another token bucket
+                        cost=cost if shadow_algorithm == "token_bucket" else None
+                    )
+            except LimiterUnavailableError as e:
+                logger.warning(f"Skipping rate limit policy '{rule['name']}' until its limiter can be built: {e}")
+                self._retry_pending = True
+                skipped += 1
+                continue
+            except Exception as e:
+                logger.error(f"Skipping rate limit policy '{rule['name']}': {e}")
+                skipped += 1
+                continue
+
+            index.add(rule, Policy(
+                name=rule["name"],
+                algorithm=algorithm,
+                params=params,
+                retry_after_seconds=retry_after_seconds,
+                limiter=limiter,
+                shadow=shadow,
+                cost=cost
+            ))
+
+        return index, skipped
+
+    async def load(self) -> None:
+        # Recorded up front so a file that fails to parse is not retried until it changes
+        self._loaded_mtime = os.stat(self.path).st_mtime
+        index, skipped = self.compile(load_rules(self.path))
+
+        previous, self.index = self.index, index
+        logger.info(f"Loaded {len(index.policies)} rate limit policies from {self.path}"
+                    + (f", skipped {skipped}" if skipped else ""))
+
+        kept = {id(limiter) for policy in index.policies for limiter in policy.limiters()}
+        retired = {id(limiter): limiter for policy in previous.policies for limiter in policy.limiters()
+                   if id(limiter) not in kept}
+        if retired:
+            task = asyncio.create_task(self._retire(previous, list(retired.values())))
+            self._retiring.add(task)
+            task.add_done_callback(self._retiring.discard)
+
+    @staticmethod
+    async def _retire(index: PolicyIndex, limiters: list[RateLimiterStrategy]) -> None:
+        # Closing a limiter a check still holds would restart its background tasks after close
+        deadline = time.monotonic() + RETIRE_GRACE_SECONDS
+        while index.in_flight and time.monotonic() < deadline:
+            await asyncio.sleep(RETIRE_POLL_SECONDS)
+        if index.in_flight:
+            logger.warning(f"Closing {len(limiters)} retired limiters with {index.in_flight} checks still running")
+
+        for limiter in limiters:
+            try:
+                await limiter.close()
+            except Exception as e:
+                logger.error(f"Failed to close retired rate limiter: {e}")
+
+    def start_watching(self) -> None:
+        if self.reload_interval_seconds > 0 and self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.reload_interval_seconds)
+            try:
+                if self._retry_pending or os.stat(self.path).st_mtime != self._loaded_mtime:
+                    await self.load()
+            except Exception as e:
+                logger.error(f"Failed to reload rate limit policies from {self.path}, keeping current ones: {e}")
+
+    async def close(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+        if self._retiring:
+            await asyncio.gather(*self._retiring)
+
+        limiters = {id(limiter): limiter for policy in self.index.policies for limiter in policy.limiters()}
+        for limiter in limiters.values():
+            await limiter.close()
+
+
+def _params_signature(params: dict) -> str:
+    return json.dumps(params, sort_keys=True)
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.metrics import (
+    rejection_cache_evictions, rejection_cache_hits, rejection_cache_misses, rejection_cache_size
+)
+
+
+class RejectionCache:
+    """Bounded per-worker LRU of keys that cannot be allowed before a known time.
+
+    Entries are filled from the retry-after the Lua scripts compute on a
+    rejection, so a cached denial never outlives the point where Redis could
+    allow the key again. The reset time replied with the rejection is kept
+    alongside, so a cached denial still reports when the limit resets.
+    """
+
+    def __init__(self, algorithm: str, capacity: int, max_ttl_seconds: float):
+        self.algorithm = algorithm
+        self.capacity = capacity
+        self.max_ttl_seconds = max_ttl_seconds
+        # key -> (denied until, limit resets at)
+        self._denied_until: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._hits = rejection_cache_hits.labels(algorithm=algorithm)
+        self._misses = rejection_cache_misses.labels(algorithm=algorithm)
+        self._evictions = rejection_cache_evictions.labels(algorithm=algorithm)
+        self._size = rejection_cache_size.labels(algorithm=algorithm)
+
+    def is_denied(self, key: str, now: float) -> bool:
+        return self.denial(key, now) is not None
+
+    def denial(self, key: str, now: float) -> Optional[tuple[float, float]]:
+        """``(retry_after_seconds, reset_seconds)`` if ``key`` is cached as denied, else None."""
+        entry = self._denied_until.get(key)
+
+        if entry is None:
+            self._misses.inc()
+            return None
+
+        denied_until, reset_at = entry
+        if denied_until <= now:
+            del self._denied_until[key]
+            self._size.set(len(self._denied_until))
+            self._misses.inc()
+            return None
+
+        self._denied_until.move_to_end(key)
+        self._hits.inc()
+        return denied_until - now, max(reset_at, denied_until) - now
+
+    def deny(self, key: str, now: float, retry_after_seconds: float, reset_seconds: float = 0.0) -> None:
+        if retry_after_seconds <= 0:
+            return
+
+        self._denied_until[key] = (now + min(retry_after_seconds, self.max_ttl_seconds), now + reset_seconds)
+        self._denied_until.move_to_end(key)
+
+        if len(self._denied_until) > self.capacity:
+            self._denied_until.popitem(last=False)
+            self._evictions.inc()
+
+        self._size.set(len(self._denied_until))
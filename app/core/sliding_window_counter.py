@@ -1,102 +1,100 @@
+import asyncio
 import logging
 import time
+from typing import Optional, Sequence
 
 import redis
 
-from app.core.base import RateLimiterStrategy
-from app.core.metrics import (
-    MetricsContext, rate_limit_requests_total, rate_limit_allowed,
-    rate_limit_rejected, redis_operations_total, redis_script_errors,
-    sliding_window_request_count
-)
-from app.database.redis import redis_connection
+from app.core.base import RateLimitDecision, RateLimiterStrategy
+from app.core.metrics import LimiterMetrics, sliding_window_request_count
+from app.core.rejection_cache import RejectionCache
+from app.database.circuit_breaker import CircuitOpenError
+from app.database.cluster import group_keys_by_slot
+from app.database.redis import redis_connection, script_clock_ms
 
 logger = logging.getLogger(__name__)
 
 
 class SlidingWindowCounterRateLimiter(RateLimiterStrategy):
-    def __init__(self, redis_client, window_size_seconds: int, max_requests: int, expiry_seconds: int):
+    reply_count_name = "count"
+
+    def __init__(self, redis_client, window_size_seconds: float, max_requests: int, expiry_seconds: int,
+                 rejection_cache: RejectionCache | None = None):
         self.redis_client = redis_client
         self.window_size_seconds = window_size_seconds
         self.max_requests = max_requests
+        self.configured_max_requests = max_requests
         self.current_window = time.time()
         self.request_count = 0
         self.previous_count = 0
         self.ttl_seconds = expiry_seconds
+        self.rejection_cache = rejection_cache
+        self.metrics = LimiterMetrics(algorithm="sliding_window_counter", endpoint="sliding_window_counter",
+                                      remaining=sliding_window_request_count)
 
     async def is_request_allowed(self, key: str) -> bool:
-        algorithm = "sliding_window_counter"
+        return (await self.check_request(key)).allowed
+
+    async def check_request(self, key: str) -> RateLimitDecision:
+        return await self._script_check(key, self.max_requests, 'sliding_window_counter', self.window_size_seconds,
+                                        self.max_requests, script_clock_ms(), self.ttl_seconds)
+
+    async def are_requests_allowed(self, keys: Sequence[str]) -> list[bool]:
+        now = script_clock_ms()
+        checked_at = time.time()
+        decisions = [True] * len(keys)
+        pending_keys = list(range(len(keys)))
 
-        try:
-            node_info = await redis_connection.async_client.cluster_keyslot(key)
-            logger.debug(f"Key '{key}' will be handled by node: {node_info}")
-        except Exception as e:
-            logger.warning(f"Could not determine node for key '{key}': {e}")
+        if self.rejection_cache is not None:
+            pending_keys = []
+            for i, key in enumerate(keys):
+                if self.rejection_cache.is_denied(key, checked_at):
+                    decisions[i] = self._record_decision(key, 0, None)
+                else:
+                    pending_keys.append(i)
 
-        now = time.time()
+        async def check_slot(indexes: list[int]):
+            slot_keys = [keys[i] for i in indexes]
+            args = []
+            for _ in slot_keys:
+                args.extend((self.window_size_seconds, self.max_requests, self.ttl_seconds))
 
-        with MetricsContext(algorithm=algorithm):
             try:
-                result = await redis_connection.async_client.evalsha(
-                    redis_connection.script_shas['sliding_window_counter'],
-                    1,
-                    key,
-                    self.window_size_seconds,
-                    self.max_requests,
-                    int(now),
-                    self.ttl_seconds,
-                )
-                redis_operations_total.labels(
-                    operation="evalsha", status="success").inc()
-
-            except redis.exceptions.NoScriptError:
-                logger.error(f"Lua script not loaded. Reloading...")
-                redis_script_errors.labels(
-                    script_name="sliding_window_counter", error_type="NoScriptError").inc()
-
-                sliding_window_counter_sha = await redis_connection.async_client.script_load(
-                    redis_connection.SLIDING_WINDOW_COUNTER_SCRIPT)
-                redis_connection.script_shas['sliding_window_counter'] = sliding_window_counter_sha
-                result = await redis_connection.async_client.evalsha(
-                    redis_connection.script_shas['sliding_window_counter'],
-                    1,
-                    key,
-                    self.window_size_seconds,
-                    self.max_requests,
-                    int(now),
-                    self.ttl_seconds,
-                )
-                redis_operations_total.labels(
-                    operation="evalsha", status="success").inc()
+                result = await self._run_script('sliding_window_counter_batch', slot_keys, now, *args)
+                self.metrics.redis_success()
             except redis.exceptions.RedisError as e:
-                logger.error(f"Redis error during rate limit check: {e}")
-                redis_operations_total.labels(
-                    operation="evalsha", status="error").inc()
-                return True
+                if not isinstance(e, CircuitOpenError):
+                    logger.error(f"Redis error during batch rate limit check: {e}")
+                    redis_connection.slot_map.observe_error(e)
+                    self.metrics.redis_error()
+                for i in indexes:
+                    decisions[i] = (await self.degraded_check(keys[i])).allowed
+                return
             except Exception as e:
                 logger.error(
-                    f"Error in SlidingWindowCounterRateLimiter for key '{key}': {e}")
-                redis_operations_total.labels(
-                    operation="evalsha", status="error").inc()
-                return True
-
-            allowed, request_count = result
-
-            sliding_window_request_count.labels(user_id=key).set(request_count)
-
-            if allowed == 1:
-                rate_limit_allowed.labels(
-                    algorithm=algorithm, endpoint="sliding_window_counter").inc()
-                rate_limit_requests_total.labels(
-                    algorithm=algorithm, result="allowed", endpoint="sliding_window_counter").inc()
-                logger.debug(
-                    f"Request allowed for key: {key}, count: {request_count}/{self.max_requests}")
-            else:
-                rate_limit_rejected.labels(
-                    algorithm=algorithm, endpoint="sliding_window_counter").inc()
-                rate_limit_requests_total.labels(
-                    algorithm=algorithm, result="rejected", endpoint="sliding_window_counter").inc()
-                logger.info(
-                    f"Rate limit exceeded for key: {key}, count: {request_count}/{self.max_requests}")
-
-            return allowed == 1
+                    f"Error in SlidingWindowCounterRateLimiter batch check for keys {slot_keys}: {e}")
+                self.metrics.redis_error()
+                return
+
+            for position, i in enumerate(indexes):
+                allowed, request_count, retry_after_ms = result[3 * position:3 * position + 3]
+                if allowed != 1 and self.rejection_cache is not None:
+                    self.rejection_cache.deny(keys[i], checked_at, retry_after_ms / 1000)
+                decisions[i] = self._record_decision(keys[i], allowed, request_count)
+
+        with self.metrics.check():
+            slot_groups = group_keys_by_slot([keys[i] for i in pending_keys])
+            await asyncio.gather(*(check_slot([pending_keys[j] for j in indexes])
+                                   for indexes in slot_groups.values()))
+
+        return decisions
+
+    def scale_limits(self, multiplier: float) -> None:
+        super().scale_limits(multiplier)
+        self.max_requests = max(1, int(self.configured_max_requests * multiplier))
+
+    async def close(self):
+        self.metrics.flush()
+
+    def _remaining(self, request_count, cost: Optional[int]) -> int:
+        return self.max_requests - request_count
@@ -0,0 +1,53 @@
+import math
+from typing import Optional
+
+import redis
+
+from app.core.base import RateLimitDecision, RateLimiterStrategy
+from app.core.metrics import LimiterMetrics, sliding_window_log_request_count
+from app.core.rejection_cache import RejectionCache
+from app.database.redis import script_clock_ms
+
+
+class SlidingWindowLogRateLimiter(RateLimiterStrategy):
+    """Sliding window log: at most ``max_requests`` in any trailing window.
+
+    Admitted requests are logged in a sorted set scored by time, which makes
+    the limit exact. The log holds at most ``max_requests`` members; when that
+    could exceed ``max_entries`` (or ``bucket_ms`` is set), timestamps are
+    grouped into buckets of ``bucket_ms`` so the set stays below about
+    ``window / bucket_ms`` members. A bucket counts until its last millisecond
+    leaves the window, so bucketing can under-admit but never over-admit.
+    """
+
+    reply_count_name = "count"
+
+    def __init__(self, window_size_seconds: float, max_requests: int, redis_client: redis.Redis,
+                 max_entries: int = 1000, bucket_ms: int = 0, rejection_cache: RejectionCache | None = None):
+        self.window_size_seconds = window_size_seconds
+        self.max_requests = max_requests
+        self.configured_max_requests = max_requests
+        self.redis_client = redis_client
+        if max_requests > max_entries:
+            bucket_ms = max(bucket_ms, math.ceil(window_size_seconds * 1000 / max_entries))
+        self.bucket_ms = bucket_ms
+        self.rejection_cache = rejection_cache
+        self.metrics = LimiterMetrics(algorithm="sliding_window_log", endpoint="sliding_window_log",
+                                      remaining=sliding_window_log_request_count)
+
+    async def is_request_allowed(self, key: str) -> bool:
+        return (await self.check_request(key)).allowed
+
+    async def check_request(self, key: str) -> RateLimitDecision:
+        return await self._script_check(key, self.max_requests, 'sliding_window_log', self.window_size_seconds,
+                                        self.max_requests, script_clock_ms(), self.bucket_ms)
+
+    def scale_limits(self, multiplier: float) -> None:
+        super().scale_limits(multiplier)
+        self.max_requests = max(1, int(self.configured_max_requests * multiplier))
+
+    async def close(self):
+        self.metrics.flush()
+
+    def _remaining(self, request_count, cost: Optional[int]) -> int:
+        return max(self.max_requests - request_count, 0)
@@ -1,106 +1,175 @@
+import asyncio
 import logging
+import math
 import time
+from typing import Optional, Sequence
 
 import redis
 
-from app.core.base import RateLimiterStrategy
-from app.core.metrics import (
-    MetricsContext, rate_limit_requests_total, rate_limit_allowed,
-    rate_limit_rejected, redis_operations_total, redis_script_errors,
-    token_bucket_tokens_remaining
-)
-from app.database.redis import redis_connection, TOKEN_BUCKET_SCRIPT
+from app.core.base import RateLimitDecision, RateLimiterStrategy
+from app.core.metrics import LimiterMetrics, rate_limit_fallback_checks, token_bucket_tokens_remaining
+from app.core.rejection_cache import RejectionCache
+from app.database.circuit_breaker import CircuitOpenError
+from app.database.cluster import group_keys_by_slot
+from app.database.redis import redis_connection, script_clock_ms
 
 logger = logging.getLogger(__name__)
 
 
 class TokenBucketRateLimiter(RateLimiterStrategy):
-    def __init__(self, tokens_per_second: int, max_tokens: int, redis_client: redis.Redis, expiry_seconds: int,
-                 tokens_per_request: int):
+    reply_count_name = "remaining tokens"
+
+    def __init__(self, tokens_per_second: float, max_tokens: int, redis_client: redis.Redis, expiry_seconds: int,
+                 tokens_per_request: int, rejection_cache: RejectionCache | None = None):
         self.tokens_per_second = tokens_per_second
         self.max_tokens = max_tokens
+        self.configured_limits = (tokens_per_second, max_tokens)
         self.redis_client = redis_client
-        self.expiry_seconds = expiry_seconds or int(
-            max_tokens / tokens_per_second)
+        # Keys live at least until a drained bucket is full again (EXPIRE needs whole seconds)
+        self.expiry_seconds = expiry_seconds or max(1, math.ceil(max_tokens / tokens_per_second))
         self.tokens_per_request = tokens_per_request
+        self.rejection_cache = rejection_cache
+        self.metrics = LimiterMetrics(algorithm="token_bucket", endpoint="token_bucket",
+                                      remaining=token_bucket_tokens_remaining)
 
     async def is_request_allowed(self, key: str) -> bool:
+        return (await self.check_request(key)).allowed
+
+    async def check_request(self, key: str, cost: Optional[int] = None) -> RateLimitDecision:
+        """Take ``cost`` tokens (default ``tokens_per_request``) from ``key``'s bucket if it holds them.
+
+        ``limit`` and ``remaining`` on the decision count requests of this cost.
+        """
         if not key:
             logger.warning("Rate limit check called with empty key")
-            return False
+            return RateLimitDecision(False)
+
+        cost = self.tokens_per_request if cost is None else cost
+        if cost <= 0:
+            raise ValueError(f"Token cost must be positive, got {cost}")
+        if cost > self.max_tokens:
+            # Not even a full bucket holds that many tokens
+            self._record_decision(key, 0, None)
+            return RateLimitDecision(False, limit=0, remaining=0)
+
+        return await self._script_check(key, self.max_tokens // cost, 'token_bucket', self.max_tokens,
+                                        self.tokens_per_second, script_clock_ms(), cost, self.expiry_seconds,
+                                        cost=cost)
+
+    async def consume(self, key: str, tokens: int) -> RateLimitDecision:
+        """Charge ``tokens`` units to ``key`` in one check, e.g. the items of a batch request."""
+        return await self.check_request(key, tokens)
 
-        now = int(time.time())
-        algorithm = "token_bucket"
+    async def consume_many(self, requests: Sequence[tuple[str, int]]) -> list[RateLimitDecision]:
+        """Charge every ``(key, tokens)`` pair, with one script call per hash slot instead of one per pair.
+
+        Each pair is admitted or rejected on its own. Pairs for the same key are
+        applied in order, each seeing the tokens the earlier ones took.
+        """
+        now = script_clock_ms()
+        checked_at = time.time()
+        decisions: list[Optional[RateLimitDecision]] = [None] * len(requests)
+        pending = []
+
+        for i, (key, cost) in enumerate(requests):
+            if not key:
+                logger.warning("Rate limit check called with empty key")
+                decisions[i] = RateLimitDecision(False)
+                continue
+            if cost <= 0:
+                raise ValueError(f"Token cost must be positive, got {cost} for key '{key}'")
+            if cost > self.max_tokens:
+                self._record_decision(key, 0, None)
+                decisions[i] = RateLimitDecision(False, limit=0, remaining=0)
+                continue
+            if self.rejection_cache is not None:
+                denial = self.rejection_cache.denial(key, checked_at)
+                if denial is not None:
+                    retry_after_seconds, reset_seconds = denial
+                    self._record_decision(key, 0, None)
+                    decisions[i] = RateLimitDecision(False, limit=self.max_tokens // cost, remaining=0,
+                                                     reset_seconds=reset_seconds,
+                                                     retry_after_seconds=retry_after_seconds)
+                    continue
+            pending.append(i)
+
+        async def check_slot(indexes: list[int]):
+            slot_keys = [requests[i][0] for i in indexes]
+            args = []
+            for i in indexes:
+                args.extend((self.max_tokens, self.tokens_per_second, requests[i][1], self.expiry_seconds))
 
-        with MetricsContext(algorithm=algorithm):
             try:
-                # node_info = await self._get_node_for_key(key)
-                node_info = await redis_connection.async_client.cluster_keyslot(key)
-                logger.info(
-                    f"Key '{key}' will be handled by node: {node_info}")
-
-                result = await redis_connection.async_client.evalsha(
-                    redis_connection.script_shas['token_bucket'],
-                    1,
-                    key,
-                    self.max_tokens,
-                    self.tokens_per_second,
-                    now,
-                    self.tokens_per_request,
-                    self.expiry_seconds,
-                )
-                redis_operations_total.labels(
-                    operation="evalsha", status="success").inc()
-            except redis.exceptions.NoScriptError:
-                logger.warning(
-                    "Token bucket script not found in Redis, reloading...")
-                redis_script_errors.labels(
-                    script_name="token_bucket", error_type="NoScriptError").inc()
-
-                token_bucket_sha = await redis_connection.async_client.script_load(TOKEN_BUCKET_SCRIPT)
-                redis_connection.script_shas['token_bucket'] = token_bucket_sha
-
-                result = await redis_connection.async_client.evalsha(
-                    redis_connection.script_shas['token_bucket'],
-                    1,
-                    key,
-                    self.max_tokens,
-                    self.tokens_per_second,
-                    now,
-                    self.tokens_per_request,
-                    self.expiry_seconds,
-                )
-                redis_operations_total.labels(
-                    operation="evalsha", status="success").inc()
+                result = await self._run_script('token_bucket_batch', slot_keys, now, *args)
+                self.metrics.redis_success()
             except redis.exceptions.RedisError as e:
-                logger.error(f"Redis error during rate limit check: {e}")
-                redis_operations_total.labels(
-                    operation="evalsha", status="error").inc()
-                return True
+                if not isinstance(e, CircuitOpenError):
+                    logger.error(f"Redis error during batch rate limit check: {e}")
+                    redis_connection.slot_map.observe_error(e)
+                    self.metrics.redis_error()
+                for i in indexes:
+                    decisions[i] = await self.degraded_check(*requests[i])
+                return
             except Exception as e:
-                logger.error(f"Unexpected error during rate limit check: {e}")
-                redis_operations_total.labels(
-                    operation="evalsha", status="error").inc()
-                return True
-
-            allowed, remaining_tokens = result
-
-            token_bucket_tokens_remaining.labels(
-                user_id=key).set(remaining_tokens)
-
-            if allowed == 1:
-                rate_limit_allowed.labels(
-                    algorithm=algorithm, endpoint="token_bucket").inc()
-                rate_limit_requests_total.labels(
-                    algorithm=algorithm, result="allowed", endpoint="token_bucket").inc()
-                logger.debug(
-                    f"Request allowed for key: {key}, remaining tokens: {remaining_tokens}")
-            else:
-                rate_limit_rejected.labels(
-                    algorithm=algorithm, endpoint="token_bucket").inc()
-                rate_limit_requests_total.labels(
-                    algorithm=algorithm, result="rejected", endpoint="token_bucket").inc()
-                logger.debug(
-                    f"Rate limit exceeded for key: {key}, remaining tokens: {remaining_tokens}")
-
-            return allowed == 1
+                logger.error(f"Unexpected error during batch rate limit check: {e}")
+                self.metrics.redis_error()
+                for i in indexes:
+                    decisions[i] = RateLimitDecision(True)
+                return
+
+            for position, i in enumerate(indexes):
+                key, cost = requests[i]
+                allowed, remaining_tokens, retry_after_ms = result[3 * position:3 * position + 3]
+                reset_ms = math.ceil((self.max_tokens - int(remaining_tokens)) * 1000 / self.tokens_per_second)
+                if allowed != 1:
+                    self._cache_rejection(key, checked_at, retry_after_ms, reset_ms, cost)
+                decisions[i] = RateLimitDecision(
+                    self._record_decision(key, allowed, remaining_tokens),
+                    limit=self.max_tokens // cost,
+                    remaining=int(remaining_tokens) // cost,
+                    reset_seconds=reset_ms / 1000,
+                    retry_after_seconds=retry_after_ms / 1000
+                )
+
+        with self.metrics.check():
+            slot_groups = group_keys_by_slot([requests[i][0] for i in pending])
+            await asyncio.gather(*(check_slot([pending[j] for j in indexes])
+                                   for indexes in slot_groups.values()))
+
+        return decisions
+
+    async def are_requests_allowed(self, keys: Sequence[str]) -> list[bool]:
+        decisions = await self.consume_many([(key, self.tokens_per_request) for key in keys])
+        return [decision.allowed for decision in decisions]
+
+    async def degraded_check(self, key: str, cost: Optional[int] = None) -> RateLimitDecision:
+        if self.fallback is None:
+            return RateLimitDecision(True)
+
+        rate_limit_fallback_checks.labels(algorithm=self.metrics.algorithm).inc()
+        if cost is not None:
+            # The fallback holds one worker's share of the bucket; a request this bucket
+            # could admit takes all of that share rather than being rejected outright
+            cost = min(cost, self.fallback.max_tokens)
+        return await self.fallback.check_request(key, cost)
+
+    def scale_limits(self, multiplier: float) -> None:
+        super().scale_limits(multiplier)
+        tokens_per_second, max_tokens = self.configured_limits
+        self.tokens_per_second = tokens_per_second * multiplier
+        self.max_tokens = max(self.tokens_per_request, int(max_tokens * multiplier))
+
+    def _remaining(self, remaining_tokens, cost: Optional[int]) -> int:
+        return int(remaining_tokens) // cost
+
+    def _cache_rejection(self, key: str, checked_at: float, retry_after_ms: float, reset_ms: float,
+                         cost: Optional[int]) -> None:
+        if self.rejection_cache is None:
+            return
+        # A cached denial turns away every cost, so it only lasts until the bucket could
+        # take tokens_per_request; costs below that may be rejected a little early
+        retry_after_ms -= max(0, cost - self.tokens_per_request) * 1000 / self.tokens_per_second
+        self.rejection_cache.deny(key, checked_at, retry_after_ms / 1000, reset_ms / 1000)
+
+    async def close(self):
+        self.metrics.flush()
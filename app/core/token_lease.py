@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import time
+from typing import Optional
+
+import redis
+
+from app.core.base import RateLimitDecision
+from app.core.metrics import MetricsContext, token_lease_renewals
+from app.core.token_bucket import TokenBucketRateLimiter
+from app.database.circuit_breaker import CircuitOpenError
+from app.database.redis import redis_connection, script_clock_ms
+
+logger = logging.getLogger(__name__)
+
+
+class _Lease:
+    __slots__ = ("tokens", "granted", "expires_at")
+
+    def __init__(self, tokens: int, expires_at: float):
+        self.tokens = tokens
+        self.granted = tokens
+        self.expires_at = expires_at
+
+
+class TokenLeaseRateLimiter(TokenBucketRateLimiter):
+    """Token bucket that leases slices of each bucket and spends them in process.
+
+    Every leased token was first deducted from the shared Redis bucket, and a
+    lease is only spent for ``lease_ttl_seconds`` after it was taken. Over any
+    interval of length T a key is therefore admitted at most
+    ``max_tokens + tokens_per_second * (T + lease_ttl_seconds)`` times across
+    all workers. Unused tokens go back to the bucket when the lease expires or
+    the limiter is closed.
+
+    A lease holds ``max_tokens * lease_fraction`` tokens, but never fewer than
+    ``min_lease_tokens`` (or the whole bucket, if it is smaller): a lease of one
+    request would cost a Redis call per check and save nothing. On buckets only
+    a few tokens deep one worker can therefore hold most of a key's tokens
+    until its lease expires, and other workers under-admit that key meanwhile.
+    """
+
+    def __init__(self, tokens_per_second: float, max_tokens: int, redis_client: redis.Redis, expiry_seconds: int,
+                 tokens_per_request: int, lease_fraction: float = 0.1, lease_ttl_seconds: float = 1.0,
+                 min_lease_tokens: int = 4):
+        super().__init__(tokens_per_second=tokens_per_second, max_tokens=max_tokens, redis_client=redis_client,
+                         expiry_seconds=expiry_seconds, tokens_per_request=tokens_per_request)
+        self.lease_size = max(tokens_per_request, math.ceil(max_tokens * lease_fraction),
+                              min(min_lease_tokens, max_tokens))
+        self.lease_ttl_seconds = lease_ttl_seconds
+        self._leases: dict[str, _Lease] = {}
+        self._renewals: dict[str, asyncio.Future] = {}
+        self._sweeper: asyncio.Task | None = None
+
+    async def check_request(self, key: str, cost: Optional[int] = None) -> RateLimitDecision:
+        if not key:
+            logger.warning("Rate limit check called with empty key")
+            return RateLimitDecision(False)
+
+        cost = self.tokens_per_request if cost is None else cost
+        if not 0 < cost <= self.lease_size:
+            # No lease is ever that large; charge the shared bucket directly (which rejects costs below 1)
+            return await super().check_request(key, cost)
+
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_expired_leases())
+
+        lease = self._leases.get(key)
+
+        if lease is None or lease.expires_at <= time.monotonic() or (lease.tokens < cost and lease.granted > 0):
+            try:
+                lease = await self._renew_lease(key)
+            except Exception as e:
+                if not isinstance(e, CircuitOpenError):
+                    logger.error(f"Error renewing token lease for key '{key}': {e}")
+                return await self.degraded_check(key, cost)
+
+        # The local lease says nothing about the shared bucket, so remaining/reset are unknown
+        limit = self.max_tokens // cost
+        if lease.tokens >= cost:
+            lease.tokens -= cost
+            return RateLimitDecision(self._record_decision(key, 1, lease.tokens), limit=limit)
+
+        # An empty lease expires when the bucket can next have a token
+        return RateLimitDecision(self._record_decision(key, 0, lease.tokens), limit=limit,
+                                 retry_after_seconds=max(0.0, lease.expires_at - time.monotonic()))
+
+    async def _renew_lease(self, key: str) -> _Lease:
+        # Concurrent checks for the same key share one renewal round trip
+        pending = self._renewals.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._renewals[key] = future
+        try:
+            lease = await self._acquire(key)
+            future.set_result(lease)
+            return lease
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so waiters-less failures do not log "exception never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._renewals[key]
+
+    async def _acquire(self, key: str) -> _Lease:
+        previous = self._leases.pop(key, None)
+        returned = previous.tokens if previous is not None else 0
+
+        with MetricsContext(algorithm="token_bucket_lease", operation="renew"):
+            try:
+                granted, bucket_tokens = await self._run_lease_script(key, returned, self.lease_size)
+            except Exception:
+                if previous is not None and previous.expires_at > time.monotonic():
+                    self._leases[key] = previous
+                raise
+
+        token_lease_renewals.labels(result="granted" if granted else "empty").inc()
+        now = time.monotonic()
+
+        if granted:
+            lease = _Lease(granted, now + self.lease_ttl_seconds)
+        else:
+            # Bucket is empty: reject locally until the next token can have refilled
+            wait = max(0.0, self.tokens_per_request - bucket_tokens) / self.tokens_per_second
+            lease = _Lease(0, now + min(wait, self.lease_ttl_seconds))
+
+        self._leases[key] = lease
+        return lease
+
+    async def _run_lease_script(self, key: str, returned: int, requested: int) -> tuple[int, float]:
+        try:
+            granted, bucket_tokens = await self._run_script(
+                'token_bucket_lease',
+                [key],
+                self.max_tokens,
+                self.tokens_per_second,
+                script_clock_ms(),
+                returned,
+                requested,
+                self.expiry_seconds,
+            )
+            self.metrics.redis_success()
+        except redis.exceptions.RedisError as e:
+            redis_connection.slot_map.observe_error(e)
+            self.metrics.redis_error()
+            raise
+
+        return int(granted), float(bucket_tokens)
+
+    async def _sweep_expired_leases(self):
+        while True:
+            await asyncio.sleep(self.lease_ttl_seconds)
+            now = time.monotonic()
+            expired = [key for key, lease in self._leases.items()
+                       if lease.expires_at <= now and key not in self._renewals]
+            await self._return_leases(expired)
+
+    async def _return_leases(self, keys: list[str]):
+        returns = []
+        for key in keys:
+            lease = self._leases.pop(key)
+            if lease.tokens > 0:
+                returns.append(self._run_lease_script(key, lease.tokens, 0))
+
+        results = await asyncio.gather(*returns, return_exceptions=True)
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            logger.warning(f"Failed to return {len(failures)} unused token leases: {failures[0]}")
+
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        await self._return_leases(list(self._leases))
+        await super().close()
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Sequence
+
+import redis
+
+from app.core.metrics import (
+    redis_batch_flushes, redis_batch_queue_depth, redis_batch_rejected,
+    redis_batch_size, redis_batch_timeouts, redis_operations_total
+)
+
+logger = logging.getLogger(__name__)
+
+ScriptRunner = Callable[..., Awaitable[Any]]
+
+
+class BatchQueueFullError(redis.exceptions.ConnectionError):
+    """Raised when too many calls are outstanding; treated like Redis being unreachable."""
+
+
+class BatchTimeoutError(redis.exceptions.TimeoutError):
+    """Raised when a batched call's result does not arrive within ``max_wait_seconds``."""
+
+
+class _PendingCall:
+    __slots__ = ("script_name", "keys", "args", "future")
+
+    def __init__(self, script_name: str, keys: Sequence[str], args: tuple, future: asyncio.Future):
+        self.script_name = script_name
+        self.keys = keys
+        self.args = args
+        self.future = future
+
+
+class ScriptBatcher:
+    """Coalesces concurrent EVALSHA calls into one pipeline per cluster node.
+
+    Calls are queued for at most ``window_seconds`` (or until ``max_batch_size``
+    calls are waiting), grouped by the node owning their first key's slot and
+    sent as a single non-transactional pipeline per node.
+    """
+
+    def __init__(self, connection, evalsha_with_reload: ScriptRunner, window_seconds: float,
+                 max_batch_size: int, max_queue_depth: int, max_wait_seconds: float):
+        self.connection = connection
+        self.evalsha_with_reload = evalsha_with_reload
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+        self.max_queue_depth = max_queue_depth
+        self.max_wait_seconds = max_wait_seconds
+        self._pending: list[_PendingCall] = []
+        self._outstanding = 0
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._inflight: set[asyncio.Task] = set()
+
+    async def submit(self, script_name: str, keys: Sequence[str], *args) -> Any:
+        if self._outstanding >= self.max_queue_depth:
+            redis_batch_rejected.inc()
+            raise BatchQueueFullError(
+                f"Redis batch queue is full ({self.max_queue_depth} calls outstanding)")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(_PendingCall(script_name, keys, args, future))
+        self._outstanding += 1
+        redis_batch_queue_depth.set(self._outstanding)
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush("size")
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_seconds, self._flush, "window")
+
+        try:
+            return await asyncio.wait_for(future, self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            redis_batch_timeouts.inc()
+            raise BatchTimeoutError(
+                f"No reply for batched {script_name} within {self.max_wait_seconds}s") from None
+        finally:
+            self._outstanding -= 1
+            redis_batch_queue_depth.set(self._outstanding)
+
+    def _flush(self, reason: str) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+
+        redis_batch_flushes.labels(reason=reason).inc()
+        redis_batch_size.observe(len(batch))
+
+        task = asyncio.create_task(self._execute(batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _execute(self, batch: list[_PendingCall]) -> None:
+        groups: dict[str | None, list[_PendingCall]] = defaultdict(list)
+        for call in batch:
+            groups[self.connection.slot_map.node_for_key(call.keys[0])].append(call)
+
+        await asyncio.gather(*(self._execute_group(calls) for calls in groups.values()))
+
+    async def _execute_group(self, calls: list[_PendingCall]) -> None:
+        script_shas = self.connection.script_shas
+
+        try:
+            pipeline = self.connection.async_client.pipeline(transaction=False)
+            for call in calls:
+                pipeline.evalsha(script_shas[call.script_name], len(call.keys), *call.keys, *call.args)
+            results = await pipeline.execute(raise_on_error=False)
+            redis_operations_total.labels(operation="pipeline", status="success").inc()
+        except Exception as e:
+            logger.error(f"Redis pipeline for {len(calls)} batched calls failed: {e}")
+            redis_operations_total.labels(operation="pipeline", status="error").inc()
+            self.connection.slot_map.observe_error(e)
+            for call in calls:
+                _set_exception(call.future, e)
+            return
+
+        for call, result in zip(calls, results):
+            if isinstance(result, redis.exceptions.NoScriptError):
+                # Rare (script cache flushed); reload and retry this call on its own
+                try:
+                    result = await self.evalsha_with_reload(call.script_name, call.keys, *call.args)
+                except Exception as e:
+                    result = e
+
+            if isinstance(result, Exception):
+                self.connection.slot_map.observe_error(result)
+                _set_exception(call.future, result)
+            elif not call.future.done():
+                call.future.set_result(result)
+
+    async def close(self) -> None:
+        self._flush("close")
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+
+def _set_exception(future: asyncio.Future, error: Exception) -> None:
+    if not future.done():
+        future.set_exception(error)
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import logging
+import time
+from collections import deque
+from typing import Callable, Optional
+
+import redis
+
+from app.core.metrics import (
+    redis_circuit_breaker_short_circuits, redis_circuit_breaker_state, redis_circuit_breaker_transitions
+)
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Errors that say Redis is unreachable or unhealthy; a script ResponseError is a
+# reply from a working server and counts as a success
+OUTAGE_ERRORS = (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError, redis.exceptions.ClusterError)
+
+
+class CircuitOpenError(redis.exceptions.ConnectionError):
+    """Raised instead of calling Redis while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Stops calling Redis when recent calls fail or are slow, and probes for recovery.
+
+    Closed: calls go through and the last ``window_size`` outcomes are kept.
+    Once ``minimum_calls`` are recorded and the share of failed calls reaches
+    ``failure_rate_threshold``, or the share of calls slower than
+    ``slow_call_seconds`` reaches ``slow_call_rate_threshold``, the breaker opens.
+    Open: calls are refused without touching Redis for ``open_seconds``.
+    Half-open: ``half_open_probes`` calls are let through; if all of them succeed
+    in time the breaker closes, and a failed or slow probe opens it again.
+
+    ``acquire()`` returns a ticket for each permitted call, to pass back to
+    ``record()``, or to ``release()`` if the call ended without an outcome;
+    outcomes of calls started before the last state change are ignored.
+    """
+
+    __slots__ = ("window_size", "minimum_calls", "failure_rate_threshold", "slow_call_seconds",
+                 "slow_call_rate_threshold", "open_seconds", "half_open_probes", "clock", "state",
+                 "_outcomes", "_failures", "_slow_calls", "_generation", "_opened_at", "_probes_started",
+                 "_probes_passed")
+
+    def __init__(self, window_size: int, minimum_calls: int, failure_rate_threshold: float,
+                 slow_call_seconds: float, slow_call_rate_threshold: float, open_seconds: float,
+                 half_open_probes: int, clock: Callable[[], float] = time.monotonic):
+        self.window_size = window_size
+        self.minimum_calls = max(1, min(minimum_calls, window_size))
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+        self.clock = clock
+        self.state = CLOSED
+        self._outcomes: deque[tuple[bool, bool]] = deque()
+        self._failures = 0
+        self._slow_calls = 0
+        self._generation = 0
+        self._opened_at = 0.0
+        self._probes_started = 0
+        self._probes_passed = 0
+        redis_circuit_breaker_state.set(_STATE_VALUES[CLOSED])
+
+    def acquire(self) -> Optional[int]:
+        """Ticket for a call that may go to Redis now, or None to short-circuit it."""
+        if self.state == OPEN:
+            if self.clock() - self._opened_at < self.open_seconds:
+                redis_circuit_breaker_short_circuits.inc()
+                return None
+            self._transition(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self._probes_started >= self.half_open_probes:
+                redis_circuit_breaker_short_circuits.inc()
+                return None
+            self._probes_started += 1
+
+        return self._generation
+
+    def record(self, ticket: int, duration_seconds: float, failed: bool) -> None:
+        if ticket != self._generation:
+            return
+
+        slow = duration_seconds >= self.slow_call_seconds
+        if self.state == HALF_OPEN:
+            if failed or slow:
+                logger.warning(f"Redis circuit breaker probe {'failed' if failed else 'was slow'}, reopening")
+                self._transition(OPEN)
+                return
+            self._probes_passed += 1
+            if self._probes_passed >= self.half_open_probes:
+                self._transition(CLOSED)
+            return
+
+        self._outcomes.append((failed, slow))
+        self._failures += failed
+        self._slow_calls += slow
+        if len(self._outcomes) > self.window_size:
+            old_failed, old_slow = self._outcomes.popleft()
+            self._failures -= old_failed
+            self._slow_calls -= old_slow
+
+        calls = len(self._outcomes)
+        if calls < self.minimum_calls:
+            return
+        if self._failures / calls >= self.failure_rate_threshold:
+            logger.error(f"Redis circuit breaker opened: {self._failures}/{calls} recent calls failed")
+            self._transition(OPEN)
+        elif self._slow_calls / calls >= self.slow_call_rate_threshold:
+            logger.error(f"Redis circuit breaker opened: {self._slow_calls}/{calls} recent calls "
+                         f"took over {self.slow_call_seconds * 1000:.0f} ms")
+            self._transition(OPEN)
+
+    def release(self, ticket: int) -> None:
+        """Hand back a ticket whose call was abandoned, freeing its probe slot."""
+        if ticket == self._generation and self.state == HALF_OPEN:
+            self._probes_started -= 1
+
+    def snapshot(self) -> dict:
+        calls = len(self._outcomes)
+        return {
+            "state": self.state,
+            "recent_calls": calls,
+            "failure_rate": round(self._failures / calls, 4) if calls else 0.0,
+            "slow_call_rate": round(self._slow_calls / calls, 4) if calls else 0.0,
+            "open_for_seconds": round(max(0.0, self._opened_at + self.open_seconds - self.clock()), 3)
+            if self.state == OPEN else 0.0,
+        }
+
+    def _transition(self, state: str) -> None:
+        if state == CLOSED:
+            logger.info("Redis circuit breaker closed")
+        elif state == HALF_OPEN:
+            logger.info("Redis circuit breaker half-open, probing Redis")
+
+        self.state = state
+        self._generation += 1
+        self._outcomes.clear()
+        self._failures = 0
+        self._slow_calls = 0
+        self._probes_started = 0
+        self._probes_passed = 0
+        if state == OPEN:
+            self._opened_at = self.clock()
+
+        redis_circuit_breaker_state.set(_STATE_VALUES[state])
+        redis_circuit_breaker_transitions.labels(state=state).inc()
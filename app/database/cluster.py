@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import logging
+import random
+from collections import defaultdict
+from typing import Optional, Sequence
+
+from redis.crc import REDIS_CLUSTER_HASH_SLOTS, key_slot
+from redis.exceptions import AskError, ClusterDownError, MovedError, TryAgainError
+
+logger = logging.getLogger(__name__)
+
+REDIS_CLUSTER_SLOTS = REDIS_CLUSTER_HASH_SLOTS
+
+# Errors that mean the cluster moved slots around since the map was built
+_TOPOLOGY_ERRORS = (MovedError, AskError, ClusterDownError, TryAgainError)
+
+
+def key_hash_slot(key: str | bytes) -> int:
+    """Compute the Redis Cluster hash slot of a key locally, with redis-py's own implementation."""
+    return key_slot(key.encode() if isinstance(key, str) else key)
+
+
+def group_keys_by_slot(keys: Sequence[str]) -> dict[int, list[int]]:
+    """Group key positions by hash slot so each group can go to one multi-key script call."""
+    groups: dict[int, list[int]] = defaultdict(list)
+    for i, key in enumerate(keys):
+        groups[key_hash_slot(key)].append(i)
+    return groups
+
+
+class ClusterSlotMap:
+    """Cached slot -> node mapping, rebuilt lazily after a MOVED/ASK redirect."""
+
+    def __init__(self, diagnostics_sample_rate: float = 0.0):
+        self.diagnostics_sample_rate = diagnostics_sample_rate
+        self._client = None
+        self._slot_nodes: list[Optional[str]] = [None] * REDIS_CLUSTER_SLOTS
+        self._stale = True
+
+    def bind(self, client) -> None:
+        self._client = client
+        self.refresh()
+
+    def refresh(self) -> None:
+        slot_nodes: list[Optional[str]] = [None] * REDIS_CLUSTER_SLOTS
+        nodes_manager = getattr(self._client, "nodes_manager", None)
+
+        # The cluster client already keeps the CLUSTER SLOTS reply it bootstrapped
+        # from, so rebuilding our flat table costs no round trip.
+        if nodes_manager is not None:
+            for slot, nodes in nodes_manager.slots_cache.items():
+                if nodes:
+                    slot_nodes[slot] = nodes[0].name
+
+        self._slot_nodes = slot_nodes
+        self._stale = False
+
+    def invalidate(self) -> None:
+        self._stale = True
+
+    def observe_error(self, error: Exception) -> None:
+        if isinstance(error, _TOPOLOGY_ERRORS):
+            logger.warning(f"Cluster topology changed ({type(error).__name__}), refreshing slot map")
+            self.invalidate()
+
+    def node_for_slot(self, slot: int) -> Optional[str]:
+        if self._stale:
+            self.refresh()
+        return self._slot_nodes[slot]
+
+    def node_for_key(self, key: str | bytes) -> Optional[str]:
+        return self.node_for_slot(key_hash_slot(key))
+
+    def log_key_attribution(self, key: str) -> None:
+        if not self.diagnostics_sample_rate or random.random() >= self.diagnostics_sample_rate:
+            return
+
+        slot = key_hash_slot(key)
+        logger.info("Key '%s' hashes to slot %s on node %s", key, slot, self.node_for_slot(slot))
@@ -0,0 +1,70 @@
+-- Adaptive Limits (AIMD)
+-- One hash holds the limit multiplier of every policy ("m:<policy>"). Each call
+-- reports the policies the calling worker saw overloaded during its last
+-- interval; reports are OR-ed into per-policy flags ("o:<policy>") until the
+-- next step. The first call at least interval_ms after the previous step
+-- ("updated_at") applies one step to the policies it reports: a flagged
+-- policy's multiplier is multiplied by decrease_factor (not below
+-- min_multiplier), any other gains increase_step (not above 1), and the flags
+-- are cleared. The hash expires once no worker has called for ttl_ms, which
+-- puts every policy back at its configured limits.
+-- KEYS[1] = adaptive limits key
+-- ARGV[1] = now (epoch milliseconds, 0 to use the Redis server clock)
+-- ARGV[2] = interval_ms
+-- ARGV[3] = decrease_factor
+-- ARGV[4] = increase_step
+-- ARGV[5] = min_multiplier
+-- ARGV[6] = ttl_ms
+-- ARGV[7..] = policy name, overloaded (1 or 0) pairs
+-- Returns {policy_1, multiplier_1, policy_2, multiplier_2, ...} for every policy in the hash,
+-- multipliers as strings (Lua numbers would be truncated to integers)
+
+local key = KEYS[1]
+
+local now = tonumber(ARGV[1])
+local interval_ms = tonumber(ARGV[2])
+local decrease_factor = tonumber(ARGV[3])
+local increase_step = tonumber(ARGV[4])
+local min_multiplier = tonumber(ARGV[5])
+local ttl_ms = tonumber(ARGV[6])
+
+if now == 0 then
+    -- Server clock: one time source for every app replica
+    local time = redis.call("TIME")
+    now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+end
+
+for i = 7, #ARGV, 2 do
+    if ARGV[i + 1] == "1" then
+        redis.call("HSET", key, "o:" .. ARGV[i], 1)
+    end
+end
+
+local updated_at = tonumber(redis.call("HGET", key, "updated_at"))
+if updated_at == nil or now - updated_at >= interval_ms then
+    for i = 7, #ARGV, 2 do
+        local policy = ARGV[i]
+        local multiplier = tonumber(redis.call("HGET", key, "m:" .. policy)) or 1
+        if redis.call("HEXISTS", key, "o:" .. policy) == 1 then
+            multiplier = math.max(min_multiplier, multiplier * decrease_factor)
+            redis.call("HDEL", key, "o:" .. policy)
+        else
+            multiplier = math.min(1, multiplier + increase_step)
+        end
+        redis.call("HSET", key, "m:" .. policy, multiplier)
+    end
+    redis.call("HSET", key, "updated_at", now)
+end
+
+redis.call("PEXPIRE", key, ttl_ms)
+
+local multipliers = {}
+local fields = redis.call("HGETALL", key)
+for i = 1, #fields, 2 do
+    if string.sub(fields[i], 1, 2) == "m:" then
+        multipliers[#multipliers + 1] = string.sub(fields[i], 3)
+        multipliers[#multipliers + 1] = fields[i + 1]
+    end
+end
+
+return multipliers
@@ -0,0 +1,37 @@
+-- Fixed Window Counter Rate Limiter
+-- One integer per key, counting every check in the current window (rejected
+-- ones too), that expires when the window ends: INCR, plus PEXPIRE on the
+-- first check of a window.
+-- KEYS[1] = rate limit key
+-- ARGV[1] = window_size (seconds, may be fractional)
+-- ARGV[2] = max_requests
+-- ARGV[3] = now (epoch milliseconds, 0 to use the Redis server clock)
+-- Returns {allowed, count, retry_after_ms, reset_ms}
+--   retry_after_ms: until the window ends (0 if allowed)
+--   reset_ms: until the window ends
+
+local key = KEYS[1]
+
+local window_size = tonumber(ARGV[1])
+local max_requests = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+
+if now == 0 then
+    -- Server clock: one time source for every app replica
+    local time = redis.call("TIME")
+    now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+end
+
+local window_ms = window_size * 1000
+local reset_ms = math.ceil(window_ms - now % window_ms)
+
+local count = redis.call("INCR", key)
+if count == 1 then
+    redis.call("PEXPIRE", key, reset_ms)
+end
+
+if count <= max_requests then
+    return {1, count, 0, reset_ms}
+end
+
+return {0, count, reset_ms, reset_ms}
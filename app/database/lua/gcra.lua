@@ -0,0 +1,40 @@
+-- GCRA (Generic Cell Rate Algorithm) Rate Limiter
+-- State is a single string: the theoretical arrival time (TAT) of the next
+-- request, in epoch microseconds. A check is one GET and, when allowed, one SET.
+-- KEYS[1] = rate limit key
+-- ARGV[1] = emission_interval_us (1e6 / requests_per_second, rounded to whole microseconds)
+-- ARGV[2] = burst (requests that may arrive at once)
+-- ARGV[3] = now (epoch milliseconds, 0 to use the Redis server clock)
+-- ARGV[4] = cost
+-- Returns {allowed, remaining, retry_after_ms, reset_ms}
+--   remaining: requests that could still be admitted right now
+--   retry_after_ms: until this cost would be admitted (0 if allowed)
+--   reset_ms: until the full burst is available again
+
+local key = KEYS[1]
+
+local emission_interval = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local now = tonumber(ARGV[3]) * 1000
+local cost = tonumber(ARGV[4])
+
+if now == 0 then
+    -- Server clock: one time source for every app replica
+    local time = redis.call("TIME")
+    now = tonumber(time[1]) * 1000000 + tonumber(time[2])
+end
+
+local burst_offset = emission_interval * burst
+local tat = math.max(tonumber(redis.call("GET", key)) or now, now)
+local new_tat = tat + emission_interval * cost
+local allow_at = new_tat - burst_offset
+
+if now < allow_at then
+    return {0, 0, math.ceil((allow_at - now) / 1000), math.ceil((tat - now) / 1000)}
+end
+
+-- The key expires exactly when the bucket would be full again
+local reset_ms = math.ceil((new_tat - now) / 1000)
+redis.call("SET", key, string.format("%d", new_tat), "PX", reset_ms)
+
+return {1, math.floor((now - allow_at) / emission_interval), 0, reset_ms}
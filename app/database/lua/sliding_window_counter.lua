@@ -1,9 +1,17 @@
 -- Sliding Window Counter Rate Limiter
+-- Writes only when a request is admitted; a rejection (even one that rolls
+-- into a new window) leaves the hash alone, since the rollover is recomputed
+-- from the stored window on the next check. The expiry is set once per window,
+-- on its first admitted request: the counts matter until the end of the next
+-- window (never less than ttl_seconds).
 -- KEYS[1] = rate limit key
--- ARGV[1] = window_size (seconds)
+-- ARGV[1] = window_size (seconds, may be fractional)
 -- ARGV[2] = max_requests
--- ARGV[3] = now (epoch seconds)
+-- ARGV[3] = now (epoch milliseconds, 0 to use the Redis server clock)
 -- ARGV[4] = ttl_seconds
+-- Returns {allowed, count, retry_after_ms, reset_ms}
+--   retry_after_ms: until the weighted count drops below max_requests (0 if allowed)
+--   reset_ms: until the current window ends
 
 local key = KEYS[1]
 
@@ -12,15 +20,23 @@ local max_requests = tonumber(ARGV[2])
 local now = tonumber(ARGV[3])
 local ttl_seconds = tonumber(ARGV[4])
 
-local current_window = math.floor(now / window_size)
+if now == 0 then
+    -- Server clock: one time source for every app replica
+    local time = redis.call("TIME")
+    now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+end
+
+local window_ms = window_size * 1000
+local current_window = math.floor(now / window_ms)
 local data = redis.call("HMGET", key, "current_count", "previous_count", "window")
 
 local current_count = tonumber(data[1]) or 0
 local previous_count = tonumber(data[2]) or 0
 local stored_window = tonumber(data[3])
+local new_window = stored_window == nil or current_window ~= stored_window
 
 -- If moving to a new window
-if stored_window == nil or current_window ~= stored_window then
+if new_window then
     -- Current window becomes previous, start fresh current
     if stored_window ~= nil and current_window == stored_window + 1 then
         -- Moving to next consecutive window
@@ -33,16 +49,33 @@ if stored_window == nil or current_window ~= stored_window then
 end
 
 -- Calculate weighted count based on sliding window
-local window_elapsed = (now % window_size) / window_size
+local window_elapsed = (now % window_ms) / window_ms
 local effective_count = current_count + (previous_count * (1 - window_elapsed))
+local window_start = current_window * window_ms
+local next_window_start = window_start + window_ms
+local reset_ms = next_window_start - now
 
 if effective_count < max_requests then
     current_count = current_count + 1
-    redis.call("HSET", key, "current_count", current_count, "previous_count", previous_count, "window", current_window)
-    redis.call("EXPIRE", key, ttl_seconds)
-    return {1, math.floor(effective_count + 1)}
+    if new_window then
+        redis.call("HSET", key, "current_count", current_count, "previous_count", previous_count, "window", current_window)
+        redis.call("PEXPIRE", key, math.max(ttl_seconds * 1000, math.ceil(reset_ms + window_ms)))
+    else
+        redis.call("HINCRBY", key, "current_count", 1)
+    end
+    return {1, math.floor(effective_count + 1), 0, reset_ms}
 else
-    redis.call("HSET", key, "current_count", current_count, "previous_count", previous_count, "window", current_window)
-    redis.call("EXPIRE", key, ttl_seconds)
-    return {0, math.floor(effective_count)}
+    -- Earliest millisecond at which the weighted count drops below the limit
+    local retry_at
+    if current_count < max_requests then
+        -- Only the decaying previous window keeps us over the limit
+        local threshold = window_start + window_ms * (1 - (max_requests - current_count) / previous_count)
+        retry_at = math.min(math.floor(threshold) + 1, next_window_start)
+    else
+        -- Current window is full; it decays once it becomes the previous window
+        local threshold = next_window_start + window_ms * (1 - max_requests / current_count)
+        retry_at = math.floor(threshold) + 1
+    end
+
+    return {0, math.floor(effective_count), retry_at - now, reset_ms}
 end
@@ -0,0 +1,79 @@
+-- Sliding Window Counter Rate Limiter (batch)
+-- Same decision and writes as sliding_window_counter.lua for each key.
+-- KEYS[1..n] = rate limit keys, all in the same hash slot
+-- ARGV[1] = now (epoch milliseconds, 0 to use the Redis server clock)
+-- For KEYS[i], with base = 1 + (i - 1) * 3:
+--   ARGV[base + 1] = window_size (seconds)
+--   ARGV[base + 2] = max_requests
+--   ARGV[base + 3] = ttl_seconds
+-- Returns {allowed_1, count_1, retry_after_ms_1, allowed_2, ...}
+
+local now = tonumber(ARGV[1])
+if now == 0 then
+    -- Server clock: one time source for every app replica
+    local time = redis.call("TIME")
+    now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+end
+local decisions = {}
+
+for i, key in ipairs(KEYS) do
+    local base = 1 + (i - 1) * 3
+    local window_size = tonumber(ARGV[base + 1])
+    local max_requests = tonumber(ARGV[base + 2])
+    local ttl_seconds = tonumber(ARGV[base + 3])
+
+    local window_ms = window_size * 1000
+    local current_window = math.floor(now / window_ms)
+    local data = redis.call("HMGET", key, "current_count", "previous_count", "window")
+
+    local current_count = tonumber(data[1]) or 0
+    local previous_count = tonumber(data[2]) or 0
+    local stored_window = tonumber(data[3])
+    local new_window = stored_window == nil or current_window ~= stored_window
+
+    if new_window then
+        if stored_window ~= nil and current_window == stored_window + 1 then
+            previous_count = current_count
+        elseif stored_window ~= nil and current_window > stored_window + 1 then
+            previous_count = 0
+        end
+        current_count = 0
+    end
+
+    local window_elapsed = (now % window_ms) / window_ms
+    local effective_count = current_count + (previous_count * (1 - window_elapsed))
+
+    local window_start = current_window * window_ms
+    local next_window_start = window_start + window_ms
+
+    local allowed = 0
+    local reported_count = math.floor(effective_count)
+    local retry_after_ms = 0
+    if effective_count < max_requests then
+        current_count = current_count + 1
+        allowed = 1
+        reported_count = math.floor(effective_count + 1)
+        if new_window then
+            redis.call("HSET", key, "current_count", current_count, "previous_count", previous_count, "window", current_window)
+            redis.call("PEXPIRE", key, math.max(ttl_seconds * 1000, math.ceil(next_window_start + window_ms - now)))
+        else
+            redis.call("HINCRBY", key, "current_count", 1)
+        end
+    else
+        local retry_at
+        if current_count < max_requests then
+            local threshold = window_start + window_ms * (1 - (max_requests - current_count) / previous_count)
+            retry_at = math.min(math.floor(threshold) + 1, next_window_start)
+        else
+            local threshold = next_window_start + window_ms * (1 - max_requests / current_count)
+            retry_at = math.floor(threshold) + 1
+        end
+        retry_after_ms = retry_at - now
+    end
+
+    decisions[#decisions + 1] = allowed
+    decisions[#decisions + 1] = reported_count
+    decisions[#decisions + 1] = retry_after_ms
+end
+
+return decisions
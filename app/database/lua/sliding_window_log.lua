@@ -0,0 +1,90 @@
+-- Sliding Window Log Rate Limiter
+-- Keeps admitted requests in a sorted set scored by time (epoch milliseconds)
+-- and admits while fewer than max_requests fall in the trailing window.
+-- bucket_ms = 0: one member per admitted request ("<timestamp>:<n>"), exact.
+-- bucket_ms > 0: one member per bucket of that many milliseconds
+--   ("<bucket start>:<count>"), so the set holds at most
+--   window / bucket_ms + 2 members. A bucket counts until its last millisecond
+--   leaves the window, which can only under-admit, never over-admit.
+-- Rejected requests are not logged.
+-- KEYS[1] = rate limit key
+-- ARGV[1] = window_size (seconds, may be fractional)
+-- ARGV[2] = max_requests
+-- ARGV[3] = now (epoch milliseconds, 0 to use the Redis server clock)
+-- ARGV[4] = bucket_ms
+-- Returns {allowed, count, retry_after_ms, reset_ms}
+--   count: requests in the window, including this one if allowed
+--   retry_after_ms: until enough of the log has left the window (0 if allowed)
+--   reset_ms: until the whole log has left the window
+
+local key = KEYS[1]
+
+local window_size = tonumber(ARGV[1])
+local max_requests = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local bucket_ms = tonumber(ARGV[4])
+
+if now == 0 then
+    -- Server clock: one time source for every app replica
+    local time = redis.call("TIME")
+    now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+end
+
+local window_ms = window_size * 1000
+-- A member scored s (covering [s, s + bucket_ms)) leaves the window once s + bucket_ms + window_ms <= now
+local span_ms = window_ms + math.max(bucket_ms, 0)
+redis.call("ZREMRANGEBYSCORE", key, "-inf", now - span_ms)
+
+if bucket_ms <= 0 then
+    local count = redis.call("ZCARD", key)
+
+    if count < max_requests then
+        -- Members logged in the same millisecond differ by the count before them
+        redis.call("ZADD", key, now, string.format("%d:%d", now, count))
+        redis.call("PEXPIRE", key, math.ceil(span_ms))
+        return {1, count + 1, 0, math.ceil(span_ms)}
+    end
+
+    -- Retry once the oldest (count - max_requests + 1) entries have left the window
+    local oldest = redis.call("ZRANGE", key, count - max_requests, count - max_requests, "WITHSCORES")
+    local newest = redis.call("ZRANGE", key, -1, -1, "WITHSCORES")
+    return {0, count, math.ceil(tonumber(oldest[2]) + span_ms - now), math.ceil(tonumber(newest[2]) + span_ms - now)}
+end
+
+local bucket = now - now % bucket_ms
+local entries = redis.call("ZRANGE", key, 0, -1, "WITHSCORES")
+local count = 0
+local current_member = nil
+local current_count = 0
+
+for i = 1, #entries, 2 do
+    local bucket_count = tonumber(string.match(entries[i], ":(%d+)$"))
+    count = count + bucket_count
+    if tonumber(entries[i + 1]) == bucket then
+        current_member = entries[i]
+        current_count = bucket_count
+    end
+end
+
+if count < max_requests then
+    if current_member then
+        redis.call("ZREM", key, current_member)
+    end
+    redis.call("ZADD", key, bucket, string.format("%d:%d", bucket, current_count + 1))
+    redis.call("PEXPIRE", key, math.ceil(span_ms))
+    return {1, count + 1, 0, math.ceil(bucket + span_ms - now)}
+end
+
+-- Drop buckets oldest first until the count is under the limit
+local retry_at = now
+local remaining = count
+for i = 1, #entries, 2 do
+    remaining = remaining - tonumber(string.match(entries[i], ":(%d+)$"))
+    retry_at = tonumber(entries[i + 1]) + span_ms
+    if remaining < max_requests then
+        break
+    end
+end
+
+local newest = tonumber(entries[#entries])
+return {0, count, math.ceil(retry_at - now), math.ceil(newest + span_ms - now)}
@@ -1,10 +1,17 @@
 -- Token Bucket Rate Limiter
+-- Writes only when a request is admitted: a rejection leaves the stored tokens
+-- and timestamp alone, since refill is computed from them on the next check.
+-- The key expires once the bucket is full again (never before ttl_seconds),
+-- when it is indistinguishable from a missing key.
 -- KEYS[1] = rate limit key
 -- ARGV[1] = bucket_capacity
--- ARGV[2] = refill_rate
--- ARGV[3] = now (epoch seconds)
+-- ARGV[2] = refill_rate (tokens per second, may be fractional)
+-- ARGV[3] = now (epoch milliseconds, 0 to use the Redis server clock)
 -- ARGV[4] = cost
 -- ARGV[5] = ttl_seconds
+-- Returns {allowed, tokens, retry_after_ms, reset_ms}
+--   retry_after_ms: until enough tokens have refilled for this cost (0 if allowed)
+--   reset_ms: until the bucket is full again
 
 local key = KEYS[1]
 
@@ -14,6 +21,11 @@ local now = tonumber(ARGV[3])
 local cost = tonumber(ARGV[4])
 local ttl_seconds = tonumber(ARGV[5])
 
+if now == 0 then
+    -- Server clock: one time source for every app replica
+    local time = redis.call("TIME")
+    now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+end
 
 local data = redis.call("HMGET", key, "tokens", "timestamp")
 local tokens = tonumber(data[1])
@@ -25,21 +37,20 @@ if tokens == nil or last_timestamp == nil then
 end
 
 local elapsed = math.max(0, now - last_timestamp)
-local refill = elapsed * refill_rate
+local refill = elapsed * refill_rate / 1000
 tokens = math.min(bucket_capacity, tokens + refill)
 
 if tokens < cost then
-    redis.call("HSET", key,
-    "tokens", tokens,
-    "timestamp", now)
-    redis.call("EXPIRE", key, ttl_seconds)
-    return {0, tokens}
+    -- Milliseconds until enough tokens have refilled for this cost
+    local retry_after_ms = math.ceil((cost - tokens) * 1000 / refill_rate)
+    local reset_ms = math.ceil((bucket_capacity - tokens) * 1000 / refill_rate)
+    return {0, tokens, retry_after_ms, reset_ms}
 end
 
 tokens = tokens - cost
 
+local reset_ms = math.ceil((bucket_capacity - tokens) * 1000 / refill_rate)
 redis.call("HSET", key, "tokens", tokens, "timestamp", now)
+redis.call("PEXPIRE", key, math.max(ttl_seconds * 1000, reset_ms))
 
-redis.call("EXPIRE", key, ttl_seconds)
-
-return {1, tokens}
\ No newline at end of file
+return {1, tokens, 0, reset_ms}
@@ -0,0 +1,56 @@
+-- Token Bucket Rate Limiter (batch)
+-- Same decision and writes as token_bucket.lua for each key.
+-- KEYS[1..n] = rate limit keys, all in the same hash slot
+-- ARGV[1] = now (epoch milliseconds, 0 to use the Redis server clock)
+-- For KEYS[i], with base = 1 + (i - 1) * 4:
+--   ARGV[base + 1] = bucket_capacity
+--   ARGV[base + 2] = refill_rate
+--   ARGV[base + 3] = cost
+--   ARGV[base + 4] = ttl_seconds
+-- Returns {allowed_1, tokens_1, retry_after_ms_1, allowed_2, ...}
+
+local now = tonumber(ARGV[1])
+if now == 0 then
+    -- Server clock: one time source for every app replica
+    local time = redis.call("TIME")
+    now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+end
+local decisions = {}
+
+for i, key in ipairs(KEYS) do
+    local base = 1 + (i - 1) * 4
+    local bucket_capacity = tonumber(ARGV[base + 1])
+    local refill_rate = tonumber(ARGV[base + 2])
+    local cost = tonumber(ARGV[base + 3])
+    local ttl_seconds = tonumber(ARGV[base + 4])
+
+    local data = redis.call("HMGET", key, "tokens", "timestamp")
+    local tokens = tonumber(data[1])
+    local last_timestamp = tonumber(data[2])
+
+    if tokens == nil or last_timestamp == nil then
+        tokens = bucket_capacity
+        last_timestamp = now
+    end
+
+    local elapsed = math.max(0, now - last_timestamp)
+    local refill = elapsed * refill_rate / 1000
+    tokens = math.min(bucket_capacity, tokens + refill)
+
+    local allowed = 0
+    local retry_after_ms = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+        redis.call("HSET", key, "tokens", tokens, "timestamp", now)
+        redis.call("PEXPIRE", key, math.max(ttl_seconds * 1000, math.ceil((bucket_capacity - tokens) * 1000 / refill_rate)))
+    else
+        retry_after_ms = math.ceil((cost - tokens) * 1000 / refill_rate)
+    end
+
+    decisions[#decisions + 1] = allowed
+    decisions[#decisions + 1] = tokens
+    decisions[#decisions + 1] = retry_after_ms
+end
+
+return decisions
@@ -0,0 +1,67 @@
+-- Token Bucket Rate Limiter (chain)
+-- Admits a request only if every bucket in the chain has enough tokens, and
+-- then takes the cost from all of them; a rejection takes nothing.
+-- KEYS[1..n] = rate limit keys, in tier order, all in the same hash slot
+-- ARGV[1] = now (epoch milliseconds, 0 to use the Redis server clock)
+-- For KEYS[i], with base = 1 + (i - 1) * 4:
+--   ARGV[base + 1] = bucket_capacity
+--   ARGV[base + 2] = refill_rate
+--   ARGV[base + 3] = cost
+--   ARGV[base + 4] = ttl_seconds
+-- Returns {allowed, rejected_tier, retry_after_ms, tokens_1, ..., tokens_n}
+--   rejected_tier is the index of the first bucket short of tokens (0 if allowed)
+--   retry_after_ms is when every bucket will have refilled enough
+
+local now = tonumber(ARGV[1])
+if now == 0 then
+    -- Server clock: one time source for every app replica
+    local time = redis.call("TIME")
+    now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+end
+local tokens = {}
+local rejected_tier = 0
+local retry_after_ms = 0
+
+for i, key in ipairs(KEYS) do
+    local base = 1 + (i - 1) * 4
+    local bucket_capacity = tonumber(ARGV[base + 1])
+    local refill_rate = tonumber(ARGV[base + 2])
+    local cost = tonumber(ARGV[base + 3])
+
+    local data = redis.call("HMGET", key, "tokens", "timestamp")
+    local bucket_tokens = tonumber(data[1])
+    local last_timestamp = tonumber(data[2])
+
+    if bucket_tokens == nil or last_timestamp == nil then
+        bucket_tokens = bucket_capacity
+        last_timestamp = now
+    end
+
+    local elapsed = math.max(0, now - last_timestamp)
+    bucket_tokens = math.min(bucket_capacity, bucket_tokens + elapsed * refill_rate / 1000)
+    tokens[i] = bucket_tokens
+
+    if bucket_tokens < cost then
+        if rejected_tier == 0 then
+            rejected_tier = i
+        end
+        retry_after_ms = math.max(retry_after_ms, math.ceil((cost - bucket_tokens) * 1000 / refill_rate))
+    end
+end
+
+local reply = {rejected_tier == 0 and 1 or 0, rejected_tier, retry_after_ms}
+
+for i, key in ipairs(KEYS) do
+    if rejected_tier == 0 then
+        local base = 1 + (i - 1) * 4
+        local bucket_capacity = tonumber(ARGV[base + 1])
+        local refill_rate = tonumber(ARGV[base + 2])
+        tokens[i] = tokens[i] - tonumber(ARGV[base + 3])
+        redis.call("HSET", key, "tokens", tokens[i], "timestamp", now)
+        redis.call("PEXPIRE", key, math.max(tonumber(ARGV[base + 4]) * 1000,
+            math.ceil((bucket_capacity - tokens[i]) * 1000 / refill_rate)))
+    end
+    reply[#reply + 1] = tokens[i]
+end
+
+return reply
@@ -0,0 +1,50 @@
+-- Token Bucket Lease
+-- Atomically hands unused leased tokens back to a bucket and leases new ones.
+-- Nothing is written when no tokens move (an empty bucket asked for a lease).
+-- KEYS[1] = rate limit key
+-- ARGV[1] = bucket_capacity
+-- ARGV[2] = refill_rate
+-- ARGV[3] = now (epoch milliseconds, 0 to use the Redis server clock)
+-- ARGV[4] = returned (unused tokens from a previous lease, 0 if none)
+-- ARGV[5] = requested (tokens to lease, 0 to only return)
+-- ARGV[6] = ttl_seconds
+-- Returns {granted, tokens_left_in_bucket}
+
+local key = KEYS[1]
+
+local bucket_capacity = tonumber(ARGV[1])
+local refill_rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local returned = tonumber(ARGV[4])
+local requested = tonumber(ARGV[5])
+local ttl_seconds = tonumber(ARGV[6])
+
+if now == 0 then
+    -- Server clock: one time source for every app replica
+    local time = redis.call("TIME")
+    now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+end
+
+local data = redis.call("HMGET", key, "tokens", "timestamp")
+local tokens = tonumber(data[1])
+local last_timestamp = tonumber(data[2])
+
+if tokens == nil or last_timestamp == nil then
+    tokens = bucket_capacity
+    last_timestamp = now
+end
+
+local elapsed = math.max(0, now - last_timestamp)
+local refill = elapsed * refill_rate / 1000
+tokens = math.min(bucket_capacity, tokens + refill + returned)
+
+local granted = math.min(requested, math.floor(tokens))
+tokens = tokens - granted
+
+if granted > 0 or returned > 0 then
+    local reset_ms = math.ceil((bucket_capacity - tokens) * 1000 / refill_rate)
+    redis.call("HSET", key, "tokens", tokens, "timestamp", now)
+    redis.call("PEXPIRE", key, math.max(ttl_seconds * 1000, reset_ms))
+end
+
+return {granted, tostring(tokens)}
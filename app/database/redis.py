@@ -1,85 +1,188 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 import socket
-from typing import Optional
+import time
+from typing import Optional, Sequence
 
 import redis
-import redis.asyncio as redis_asyncio
 from fastapi import HTTPException, status
-from redis.asyncio.cluster import RedisCluster, ClusterNode
 
 from app.config import settings
+from app.core.metrics import redis_pool_exhausted, redis_pools, redis_script_errors
+from app.database.batching import ScriptBatcher
+from app.database.circuit_breaker import OUTAGE_ERRORS, CircuitBreaker, CircuitOpenError
+from app.database.cluster import ClusterSlotMap
 from app.database.lua import load_lua_script
+from app.database.topology import RedisTopology, build_topology
 
 logger = logging.getLogger(__name__)
 
 
 class RedisConnection:
     def __init__(self):
-        self.async_client: Optional[RedisCluster] = None
+        self.topology: Optional[RedisTopology] = None
+        # Runs the scripts on the primaries; a RedisCluster in cluster mode, else a Redis
+        self.async_client = None
+        # Serves read-only status queries, from replicas if configured
+        self.read_client = None
         self.script_shas: dict[str, str] = {}
+        self.slot_map = ClusterSlotMap(
+            diagnostics_sample_rate=settings.cluster_diagnostics_sample_rate)
+        self.batcher: Optional[ScriptBatcher] = None
+        self.breaker: Optional[CircuitBreaker] = None
+        if settings.circuit_breaker_enabled:
+            self.breaker = CircuitBreaker(
+                window_size=settings.circuit_breaker_window_size,
+                minimum_calls=settings.circuit_breaker_minimum_calls,
+                failure_rate_threshold=settings.circuit_breaker_failure_rate,
+                slow_call_seconds=settings.circuit_breaker_slow_call_ms / 1000,
+                slow_call_rate_threshold=settings.circuit_breaker_slow_call_rate,
+                open_seconds=settings.circuit_breaker_open_seconds,
+                half_open_probes=settings.circuit_breaker_half_open_probes,
+            )
 
 
 TOKEN_BUCKET_SCRIPT = load_lua_script("token_bucket.lua")
 SLIDING_WINDOW_COUNTER_SCRIPT = load_lua_script("sliding_window_counter.lua")
+TOKEN_BUCKET_BATCH_SCRIPT = load_lua_script("token_bucket_batch.lua")
+SLIDING_WINDOW_COUNTER_BATCH_SCRIPT = load_lua_script("sliding_window_counter_batch.lua")
+TOKEN_BUCKET_LEASE_SCRIPT = load_lua_script("token_bucket_lease.lua")
+TOKEN_BUCKET_CHAIN_SCRIPT = load_lua_script("token_bucket_chain.lua")
+GCRA_SCRIPT = load_lua_script("gcra.lua")
+FIXED_WINDOW_SCRIPT = load_lua_script("fixed_window.lua")
+SLIDING_WINDOW_LOG_SCRIPT = load_lua_script("sliding_window_log.lua")
+ADAPTIVE_LIMITS_SCRIPT = load_lua_script("adaptive_limits.lua")
+SCRIPTS = {
+    'token_bucket': TOKEN_BUCKET_SCRIPT,
+    'sliding_window_counter': SLIDING_WINDOW_COUNTER_SCRIPT,
+    'token_bucket_batch': TOKEN_BUCKET_BATCH_SCRIPT,
+    'sliding_window_counter_batch': SLIDING_WINDOW_COUNTER_BATCH_SCRIPT,
+    'token_bucket_lease': TOKEN_BUCKET_LEASE_SCRIPT,
+    'token_bucket_chain': TOKEN_BUCKET_CHAIN_SCRIPT,
+    'gcra': GCRA_SCRIPT,
+    'fixed_window': FIXED_WINDOW_SCRIPT,
+    'sliding_window_log': SLIDING_WINDOW_LOG_SCRIPT,
+    'adaptive_limits': ADAPTIVE_LIMITS_SCRIPT,
+}
 redis_connection = RedisConnection()
 
 
+async def load_script(script_name: str) -> str:
+    sha = await redis_connection.async_client.script_load(SCRIPTS[script_name])
+    redis_connection.script_shas[script_name] = sha
+    return sha
+
+
+async def evalsha_with_reload(script_name: str, keys: Sequence[str], *args):
+    client = redis_connection.async_client
+    try:
+        return await client.evalsha(redis_connection.script_shas[script_name], len(keys), *keys, *args)
+    except redis.exceptions.NoScriptError:
+        logger.warning(f"Lua script '{script_name}' not found in Redis, reloading...")
+        redis_script_errors.labels(
+            script_name=script_name, error_type="NoScriptError").inc()
+        sha = await load_script(script_name)
+        return await client.evalsha(sha, len(keys), *keys, *args)
+
+
+def script_clock_ms() -> int:
+    """``now`` for the Lua scripts, in epoch milliseconds; 0 makes them read Redis TIME."""
+    if settings.rate_limiter_use_redis_time:
+        return 0
+    return time.time_ns() // 1_000_000
+
+
+async def _call_script(script_name: str, keys: Sequence[str], *args):
+    try:
+        if redis_connection.batcher is not None:
+            return await redis_connection.batcher.submit(script_name, keys, *args)
+        return await evalsha_with_reload(script_name, keys, *args)
+    except redis.exceptions.MaxConnectionsError:
+        redis_pool_exhausted.inc()
+        raise
+
+
+async def run_script(script_name: str, keys: Sequence[str], *args):
+    breaker = redis_connection.breaker
+    if breaker is None:
+        return await _call_script(script_name, keys, *args)
+
+    ticket = breaker.acquire()
+    if ticket is None:
+        raise CircuitOpenError("Redis circuit breaker is open")
+
+    start = time.perf_counter()
+    try:
+        result = await _call_script(script_name, keys, *args)
+    except asyncio.CancelledError:
+        # The caller gave up; that says nothing about Redis
+        breaker.release(ticket)
+        raise
+    except Exception as e:
+        # Only outages count; a script ResponseError is a reply from a working server
+        breaker.record(ticket, time.perf_counter() - start, isinstance(e, OUTAGE_ERRORS))
+        raise
+    breaker.record(ticket, time.perf_counter() - start, False)
+    return result
+
+
+async def read_key_state(key: str) -> Optional[dict]:
+    """Stored limiter state of a key, read with plain commands (from a replica if configured)."""
+    client = redis_connection.read_client
+    key_type = (await client.type(key)).decode()
+    if key_type == "hash":
+        value = {field.decode(): field_value.decode() for field, field_value in (await client.hgetall(key)).items()}
+    elif key_type == "string":
+        value = await client.get(key)
+        value = value.decode() if value is not None else None
+    elif key_type == "zset":
+        value = {"entries": await client.zcard(key)}
+    else:
+        return None
+
+    return {"type": key_type, "value": value, "ttl_ms": await client.pttl(key)}
+
+
 async def connect_redis():
     try:
-        if not settings.redis_host_node_1:
-            raise ValueError("Redis cluster nodes are not configured")
-
-        startup_nodes = [
-            ClusterNode(settings.redis_host_node_1,
-                        settings.redis_port_node_1),
-            ClusterNode(settings.redis_host_node_2,
-                        settings.redis_port_node_2),
-            ClusterNode(settings.redis_host_node_3,
-                        settings.redis_port_node_3),
-            ClusterNode(settings.redis_host_node_4,
-                        settings.redis_port_node_4),
-            ClusterNode(settings.redis_host_node_5,
-                        settings.redis_port_node_5),
-            ClusterNode(settings.redis_host_node_6,
-                        settings.redis_port_node_6)
-        ]
-
-        redis_connection.async_client = redis_asyncio.RedisCluster(
-            startup_nodes=startup_nodes,
-            password=settings.redis_password or None,
-            max_connections=300,
-            socket_timeout=1.0,
-            socket_connect_timeout=0.5,
-            decode_responses=False,
-            health_check_interval=30,
-        )
+        topology = build_topology()
+        redis_connection.topology = topology
+        redis_connection.async_client = topology.client
+        redis_connection.read_client = topology.read_client
+        redis_pools.bind(topology.pool_stats)
 
         await redis_connection.async_client.ping()
+        redis_connection.slot_map.bind(redis_connection.async_client)
+        nodes = ", ".join(f"{host}:{port}" for host, port in settings.redis_node_addresses)
         logger.info(
-            f"Redis cluster connection successful: {settings.redis_host_node_1}:{settings.redis_port_node_1}, "
-            f"{settings.redis_host_node_2}:{settings.redis_port_node_2}, "
-            f"{settings.redis_host_node_3}:{settings.redis_port_node_3}, "
-            f"{settings.redis_host_node_4}:{settings.redis_port_node_4}, "
-            f"{settings.redis_host_node_5}:{settings.redis_port_node_5}, "
-            f"{settings.redis_host_node_6}:{settings.redis_port_node_6}")
-
-        token_bucket_sha = await redis_connection.async_client.script_load(TOKEN_BUCKET_SCRIPT)
-        redis_connection.script_shas['token_bucket'] = token_bucket_sha
-        logger.info(
-            f"Token bucket Lua script loaded with SHA: {token_bucket_sha}")
-
-        sliding_window_counter_sha = await redis_connection.async_client.script_load(SLIDING_WINDOW_COUNTER_SCRIPT)
-        redis_connection.script_shas['sliding_window_counter'] = sliding_window_counter_sha
-        logger.info(
-            f"Sliding window counter Lua script loaded with SHA: {sliding_window_counter_sha}")
+            f"Redis {topology.mode} connection successful: {nodes} "
+            f"(max {settings.redis_max_connections_per_node} connections per node"
+            f"{', replica reads' if settings.redis_read_from_replicas else ''})")
+
+        for script_name in SCRIPTS:
+            sha = await load_script(script_name)
+            logger.info(f"Lua script '{script_name}' loaded with SHA: {sha}")
+
+        if settings.redis_batching_enabled:
+            redis_connection.batcher = ScriptBatcher(
+                connection=redis_connection,
+                evalsha_with_reload=evalsha_with_reload,
+                window_seconds=settings.redis_batch_window_us / 1_000_000,
+                max_batch_size=settings.redis_batch_max_size,
+                max_queue_depth=settings.redis_batch_max_queue_depth,
+                max_wait_seconds=settings.redis_batch_max_wait_ms / 1000,
+            )
+            logger.info(
+                f"Redis micro-batching enabled: window={settings.redis_batch_window_us}us, "
+                f"max_size={settings.redis_batch_max_size}")
 
         return redis_connection.async_client
 
     except socket.gaierror as e:
         logger.error(
-            f"Redis hostname resolution failed: {settings.redis_host}. Error: {e}")
+            f"Redis hostname resolution failed: {settings.redis_node_addresses}. Error: {e}")
         raise
     except (redis.ConnectionError, redis.RedisError) as e:
         logger.error(f"Redis connection error: {e}")
@@ -91,14 +194,20 @@ async def connect_redis():
 
 async def disconnect_redis():
     try:
-        if redis_connection.async_client:
-            await redis_connection.async_client.aclose()
+        if redis_connection.batcher:
+            await redis_connection.batcher.close()
+            redis_connection.batcher = None
+        if redis_connection.topology:
+            await redis_connection.topology.close()
+            redis_connection.topology = None
+            redis_connection.async_client = None
+            redis_connection.read_client = None
             logger.info("Redis connection closed")
     except Exception as e:
         logger.error(f"Error closing Redis connection: {e}")
 
 
-async def get_redis_client() -> RedisCluster:
+async def get_redis_client():
     if redis_connection.async_client is None:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
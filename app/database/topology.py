@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import redis.asyncio as redis_asyncio
+from redis.asyncio.cluster import ClusterNode, RedisCluster
+from redis.asyncio.connection import BlockingConnectionPool
+from redis.asyncio.sentinel import Sentinel, SentinelConnectionPool
+from redis.cluster import LoadBalancingStrategy
+from redis.exceptions import ConnectionError, MaxConnectionsError
+
+from app.config import settings
+from app.core.metrics import redis_pool_wait_duration
+
+logger = logging.getLogger(__name__)
+
+CLUSTER = "cluster"
+STANDALONE = "standalone"
+SENTINEL = "sentinel"
+REDIS_MODES = (CLUSTER, STANDALONE, SENTINEL)
+
+
+class TimedBlockingConnectionPool(BlockingConnectionPool):
+    """Blocking pool that records how long each call waits for a connection.
+
+    At the cap, calls queue for up to ``timeout`` seconds and then fail with
+    MaxConnectionsError, like the cluster and sentinel pools do straight away.
+    The time recorded includes connecting when the pool opens a new
+    connection, which also shows up as waiting to the caller.
+    """
+
+    async def get_connection(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().get_connection(*args, **kwargs)
+        except ConnectionError as err:
+            # The pool gave up waiting; anything else is a real connection failure
+            if isinstance(err.__cause__, asyncio.TimeoutError):
+                raise MaxConnectionsError("No connection available.") from err
+            raise
+        finally:
+            redis_pool_wait_duration.observe(time.perf_counter() - start)
+
+
+class CappedSentinelConnectionPool(SentinelConnectionPool):
+    """Sentinel pool that fails with MaxConnectionsError at the cap, like a cluster node."""
+
+    def get_available_connection(self):
+        if not self.can_get_connection():
+            raise MaxConnectionsError("Too many connections")
+        return super().get_available_connection()
+
+
+class RedisTopology:
+    """The clients for one configured Redis deployment.
+
+    ``client`` runs the rate limit scripts against the primaries. ``read_client``
+    serves read-only status queries; with ``redis_read_from_replicas`` it reads
+    from replicas, whose state can lag the primaries by the replication delay.
+    """
+
+    __slots__ = ("mode", "client", "read_client", "sentinel", "_pool_stats_failed")
+
+    def __init__(self, mode: str, client, read_client, sentinel: Optional[Sentinel] = None):
+        self.mode = mode
+        self.client = client
+        self.read_client = read_client
+        self.sentinel = sentinel
+        self._pool_stats_failed = False
+
+    def pool_stats(self) -> list[tuple[str, str, int, int, int]]:
+        """(node, role, in use, idle, max connections) for every connection pool.
+
+        redis-py has no public pool counters, so this reads the private
+        connection lists of the pinned redis==7.1.0. If an upgrade renames
+        them the pools are left out of /metrics (with a warning) instead of
+        breaking the scrape.
+        """
+        try:
+            if isinstance(self.client, RedisCluster):
+                stats = []
+                for node in self.client.get_nodes():
+                    idle = len(node._free)
+                    stats.append((node.name, node.server_type or "unknown", len(node._connections) - idle, idle,
+                                  node.max_connections))
+                return stats
+
+            clients = [self.client] if self.read_client is self.client else [self.client, self.read_client]
+            return [_pool_stats(client.connection_pool) for client in clients]
+        except AttributeError as e:
+            if not self._pool_stats_failed:
+                self._pool_stats_failed = True
+                logger.warning(f"Cannot read Redis pool stats from this redis-py version: {e}")
+            return []
+
+    async def close(self) -> None:
+        await self.client.aclose()
+        if self.read_client is not self.client:
+            await self.read_client.aclose()
+        if self.sentinel is not None:
+            for sentinel_client in self.sentinel.sentinels:
+                await sentinel_client.aclose()
+
+
+def _pool_stats(pool) -> tuple[str, str, int, int, int]:
+    if isinstance(pool, SentinelConnectionPool):
+        node = f"{pool.service_name}@sentinel"
+        role = "primary" if pool.is_master else "replica"
+    else:
+        node = f"{pool.connection_kwargs.get('host')}:{pool.connection_kwargs.get('port')}"
+        role = "primary"
+    return node, role, len(pool._in_use_connections), len(pool._available_connections), pool.max_connections
+
+
+def build_topology() -> RedisTopology:
+    mode = settings.redis_mode.lower()
+    if mode not in REDIS_MODES:
+        raise ValueError(f"Unknown redis_mode '{settings.redis_mode}', expected one of {', '.join(REDIS_MODES)}")
+
+    addresses = settings.redis_node_addresses
+    if not addresses:
+        raise ValueError("Redis nodes are not configured (set redis_nodes)")
+
+    connection_kwargs = dict(
+        password=settings.redis_password or None,
+        socket_timeout=settings.redis_socket_timeout_ms / 1000,
+        socket_connect_timeout=settings.redis_socket_connect_timeout_ms / 1000,
+        health_check_interval=settings.redis_health_check_interval_seconds,
+        decode_responses=False,
+    )
+    max_connections = settings.redis_max_connections_per_node
+
+    if mode == CLUSTER:
+        # max_connections applies to each node, including nodes discovered after startup
+        client = redis_asyncio.RedisCluster(
+            startup_nodes=[ClusterNode(host, port) for host, port in addresses],
+            max_connections=max_connections,
+            load_balancing_strategy=(
+                LoadBalancingStrategy.ROUND_ROBIN_REPLICAS if settings.redis_read_from_replicas else None
+            ),
+            **connection_kwargs,
+        )
+        # Scripts always run on primaries (EVALSHA is a write); only read commands use replicas
+        return RedisTopology(mode, client, client)
+
+    if mode == STANDALONE:
+        if len(addresses) > 1:
+            logger.warning(f"redis_mode is standalone, using {addresses[0][0]}:{addresses[0][1]} "
+                           f"and ignoring {len(addresses) - 1} other configured nodes")
+        host, port = addresses[0]
+        pool = TimedBlockingConnectionPool(
+            host=host,
+            port=port,
+            db=settings.redis_db,
+            max_connections=max_connections,
+            timeout=settings.redis_pool_timeout_ms / 1000,
+            **connection_kwargs,
+        )
+        client = redis_asyncio.Redis(connection_pool=pool)
+        return RedisTopology(mode, client, client)
+
+    sentinel = Sentinel(
+        addresses,
+        sentinel_kwargs=dict(
+            socket_timeout=connection_kwargs["socket_timeout"],
+            socket_connect_timeout=connection_kwargs["socket_connect_timeout"],
+        ),
+        db=settings.redis_db,
+        **connection_kwargs,
+    )
+    client = sentinel.master_for(
+        settings.redis_sentinel_master,
+        connection_pool_class=CappedSentinelConnectionPool,
+        max_connections=max_connections,
+    )
+    read_client = client
+    if settings.redis_read_from_replicas:
+        read_client = sentinel.slave_for(
+            settings.redis_sentinel_master,
+            connection_pool_class=CappedSentinelConnectionPool,
+            max_connections=max_connections,
+        )
+    return RedisTopology(mode, client, read_client, sentinel)
@@ -1,33 +1,58 @@
 import logging
+import os
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from prometheus_fastapi_instrumentator import Instrumentator
 
-from app.api.routes import health, token_bucket_route, sliding_window_counter_route
+from app.api.middleware.rate_limit import RateLimitMiddleware
+from app.api.routes import (
+    health, token_bucket_route, sliding_window_counter_route, hybrid_route, gcra_route, fixed_window_route,
+    sliding_window_log_route, status_route
+)
+from app.config import settings
+from app.core.adaptive import adaptive_limits
+from app.core.decision_log import decision_log
+from app.core.factory import close_rate_limiters, get_policy_engine
+from app.core.log_pipeline import configure_logging
+from app.core.metrics import metrics_flusher, multiprocess_metrics_enabled, multiprocess_sync
 from app.database.redis import connect_redis, disconnect_redis
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
 async def application_lifespan(app_: FastAPI):
-    logger.info("Starting application...")
+    logger.info(f"Starting application in worker {os.getpid()}...")
     try:
-        await connect_redis()
-        logger.info("Application startup complete")
+        # Every worker process connects, loads the scripts and builds its policy limiters itself
+        if settings.rate_limiter_backend == "redis":
+            await connect_redis()
+        await get_policy_engine().load()
+        logger.info(f"Application startup complete in worker {os.getpid()}")
     except Exception as e:
         logger.error(f"Failed to start: {e}", exc_info=True)
         logger.warning("Starting in degraded mode")
 
+    # Also loads the policies if that failed above (a file that did not parse, once it changes)
+    get_policy_engine().start_watching()
+    decision_log.start()
+    adaptive_limits.start(get_policy_engine())
+    metrics_flusher.start()
+    if multiprocess_metrics_enabled():
+        multiprocess_sync.start()
+
     yield
 
     logger.info("Shutting down...")
+    await close_rate_limiters()
+    await metrics_flusher.close()
     await disconnect_redis()
+    await decision_log.close()
+    await adaptive_limits.close()
+    if multiprocess_metrics_enabled():
+        await multiprocess_sync.close()
 
 
 app = FastAPI(
@@ -40,6 +65,14 @@ app = FastAPI(
 app.include_router(health.router)
 app.include_router(token_bucket_route.router)
 app.include_router(sliding_window_counter_route.router)
+app.include_router(hybrid_route.router)
+app.include_router(gcra_route.router)
+app.include_router(fixed_window_route.router)
+app.include_router(sliding_window_log_route.router)
+app.include_router(status_route.router)
+
+# Rate limit policies are enforced in raw ASGI middleware, ahead of FastAPI routing
+app.add_middleware(RateLimitMiddleware, engine=get_policy_engine())
 
 # Initialize Prometheus instrumentation AFTER app is created
 Instrumentator().instrument(app).expose(app)
@@ -0,0 +1,33 @@
+import logging
+import os
+import shutil
+
+import uvicorn
+
+from app.config import settings
+from app.core.log_pipeline import configure_logging
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+
+def prepare_multiprocess_metrics(path: str) -> None:
+    # prometheus_client reads the variable at import time, so it must be set
+    # before the workers start; files left by an earlier run would be counted
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+
+
+def main():
+    workers = max(1, settings.server_workers)
+    if workers > 1:
+        prepare_multiprocess_metrics(os.environ.get("PROMETHEUS_MULTIPROC_DIR", settings.metrics_multiprocess_dir))
+
+    logger.info(f"Serving on {settings.server_host}:{settings.server_port} with {workers} worker process(es)")
+    # Workers share the listening socket; each runs the lifespan on its own, with its own Redis pools
+    uvicorn.run("app.main:app", host=settings.server_host, port=settings.server_port, workers=workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import asyncio
+import os
+import tempfile
+
+from app.config import settings
+from app.core.adaptive import adaptive_limits
+from app.core.factory import get_policy_engine
+from app.core.key_builder import build_user_scoped_rate_limit_key
+from tests.benchmarks.harness import RedisStandIn
+
+# Runs the adaptive limit controller against the in-memory Redis stand-in while
+# a simulated upstream is fast, then slow, then fast again. One token bucket
+# policy allows BURST requests per user per interval; each interval every user
+# sends BURST checks and every admitted request reports the upstream latency of
+# the phase. Per interval it prints the policy's multiplier and the share of
+# checks admitted. Needs no Redis.
+USERS = int(os.getenv("BENCH_USERS", "50"))
+BURST = int(os.getenv("BENCH_BURST", "10"))
+INTERVAL_SECONDS = float(os.getenv("BENCH_INTERVAL_SECONDS", "0.2"))
+# (name, intervals, upstream latency in seconds)
+PHASES = [("healthy", 3, 0.01), ("slow upstream", 6, 1.0), ("recovered", 12, 0.01)]
+
+POLICY = """
+rules:
+  - name: backend
+    route: /backend
+    algorithm: token_bucket
+    params: {{tokens_per_second: {rate}, max_tokens: {burst}, expiry_seconds: 10, tokens_per_request: 1}}
+"""
+
+
+async def main():
+    with tempfile.NamedTemporaryFile("w", suffix=".yaml", delete=False) as policy_file:
+        policy_file.write(POLICY.format(rate=BURST / INTERVAL_SECONDS, burst=BURST))
+    settings.rate_limiter_backend = "redis"
+    settings.rate_limit_policy_file = policy_file.name
+    RedisStandIn().install()
+    engine = get_policy_engine()
+    await engine.load()
+    os.unlink(policy_file.name)
+    policy = engine.index.policies[0]
+    adaptive_limits.interval_seconds = INTERVAL_SECONDS
+
+    print(f"Policy: {policy.name} ({policy.algorithm}), Users: {USERS}, Burst per interval: {BURST}")
+    print("-" * 50)
+    for name, intervals, upstream_seconds in PHASES:
+        for _ in range(intervals):
+            admitted = 0
+            for user in range(USERS):
+                key = build_user_scoped_rate_limit_key(f"user-{user}", policy.name)
+                for _ in range(BURST):
+                    if (await policy.limiter.check_request(key)).allowed:
+                        admitted += 1
+                        adaptive_limits.observe(policy.name, upstream_seconds)
+
+            await asyncio.sleep(INTERVAL_SECONDS)
+            multipliers = await adaptive_limits.step(engine)
+            print(f"{name}: multiplier {multipliers.get(policy.name, 1.0):.2f}, "
+                  f"admitted {round(admitted / (USERS * BURST) * 100, 1)}%")
+
+    for policy in engine.index.policies:
+        for limiter in policy.limiters():
+            await limiter.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
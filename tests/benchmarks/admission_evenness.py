@@ -0,0 +1,62 @@
+import os
+import statistics
+
+from app.core.in_memory import InMemoryScriptStore
+
+# Drives the token bucket script with a client retrying every few milliseconds
+# on a simulated clock, and reports how admissions spread within each second
+# when `now` has whole-second precision versus millisecond precision.
+DURATION_SECONDS = int(os.getenv("BENCH_DURATION_SECONDS", "20"))
+RETRY_INTERVAL_MS = int(os.getenv("BENCH_RETRY_INTERVAL_MS", "5"))
+SLOTS_PER_SECOND = 10
+START_MS = 1_700_000_000_000
+
+# (tokens_per_second, max_tokens)
+SCENARIOS = [(5, 5), (0.2, 1), (2.5, 1), (1000, 100)]
+
+
+def admissions(refill_rate: float, bucket_capacity: int, whole_seconds: bool) -> list[int]:
+    store = InMemoryScriptStore()
+    admitted_at = []
+
+    for elapsed_ms in range(0, DURATION_SECONDS * 1000, RETRY_INTERVAL_MS):
+        now = START_MS + elapsed_ms
+        if whole_seconds:
+            now -= now % 1000
+        allowed, _, _, _ = store.run('token_bucket', ['bench'], bucket_capacity, refill_rate, now, 1, 3600)
+        if allowed == 1:
+            admitted_at.append(elapsed_ms)
+
+    # Drop the initial burst of a full bucket; only the refill pace matters here
+    return admitted_at[bucket_capacity:]
+
+
+def report(name: str, admitted_at: list[int]):
+    slots = [0] * SLOTS_PER_SECOND
+    for elapsed_ms in admitted_at:
+        slots[elapsed_ms % 1000 * SLOTS_PER_SECOND // 1000] += 1
+
+    gaps = [b - a for a, b in zip(admitted_at, admitted_at[1:])]
+    busiest_slot_share = max(slots) / len(admitted_at) if admitted_at else 0.0
+
+    print(f"  {name}:")
+    print(f"    Admitted after the initial burst: {len(admitted_at)}")
+    print(f"    Per 100 ms slot within the second: {slots}")
+    print(f"    Busiest slot share: {round(busiest_slot_share * 100, 1)}%")
+    if len(gaps) > 1:
+        print(f"    Gap between admissions: mean {round(statistics.mean(gaps), 1)} ms, "
+              f"stdev {round(statistics.pstdev(gaps), 1)} ms, max {max(gaps)} ms")
+
+
+def main():
+    print(f"Duration: {DURATION_SECONDS}s, Retry interval: {RETRY_INTERVAL_MS} ms")
+
+    for refill_rate, bucket_capacity in SCENARIOS:
+        print("-" * 50)
+        print(f"tokens_per_second={refill_rate}, max_tokens={bucket_capacity}")
+        report("Whole-second clock", admissions(refill_rate, bucket_capacity, whole_seconds=True))
+        report("Millisecond clock", admissions(refill_rate, bucket_capacity, whole_seconds=False))
+
+
+if __name__ == "__main__":
+    main()
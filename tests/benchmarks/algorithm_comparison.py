@@ -0,0 +1,170 @@
+import asyncio
+import bisect
+import os
+import random
+import statistics
+import time
+import uuid
+
+from app.core.fixed_window import FixedWindowRateLimiter
+from app.core.gcra import GcraRateLimiter
+from app.core.in_memory import InMemoryScriptStore
+from app.core.key_builder import build_user_scoped_rate_limit_key
+from app.core.sliding_window_counter import SlidingWindowCounterRateLimiter
+from app.core.sliding_window_log import SlidingWindowLogRateLimiter
+from app.core.token_bucket import TokenBucketRateLimiter
+from app.database.redis import connect_redis, disconnect_redis, redis_connection
+
+# Compares every algorithm at the same nominal limit of MAX_REQUESTS per
+# WINDOW_SECONDS (token bucket and GCRA: a burst of MAX_REQUESTS refilling at
+# MAX_REQUESTS / WINDOW_SECONDS per second).
+#
+# Accuracy runs offline: the in-memory mirror of the Lua scripts replays a
+# bursty trace on a simulated clock, and each algorithm's decisions are checked
+# against an exact sliding window over the requests that algorithm admitted.
+#   over-admits:  admitted with MAX_REQUESTS already admitted in the trailing window
+#   under-admits: rejected with fewer than MAX_REQUESTS admitted in the trailing window
+#   peak:         most admissions in any trailing window
+# The Redis section then reports memory per key (MEMORY USAGE) and per-check
+# latency on the configured cluster; set BENCH_SKIP_REDIS=1 to run offline only.
+WINDOW_SECONDS = int(os.getenv("BENCH_WINDOW_SECONDS", "60"))
+MAX_REQUESTS = int(os.getenv("BENCH_MAX_REQUESTS", "10"))
+TRACE_USERS = int(os.getenv("BENCH_TRACE_USERS", "20"))
+TRACE_SECONDS = int(os.getenv("BENCH_TRACE_SECONDS", "1800"))
+SEED = int(os.getenv("BENCH_SEED", "1"))
+SKIP_REDIS = os.getenv("BENCH_SKIP_REDIS", "0") == "1"
+USERS = int(os.getenv("BENCH_USERS", "10000"))
+CHECKS_PER_USER = int(os.getenv("BENCH_CHECKS_PER_USER", "15"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "200"))
+MEMORY_SAMPLE = int(os.getenv("BENCH_MEMORY_SAMPLE", "500"))
+START_MS = 1_700_000_000_000
+
+WINDOW_MS = WINDOW_SECONDS * 1000
+RATE = MAX_REQUESTS / WINDOW_SECONDS
+# Bucketed log: about 20 members per key however high the limit
+LOG_BUCKET_MS = WINDOW_MS // 20
+
+# name -> (script, args before `now`, args after `now`)
+SCRIPTS = {
+    "Token bucket": ("token_bucket", (MAX_REQUESTS, RATE), (1, 2 * WINDOW_SECONDS)),
+    "GCRA": ("gcra", (max(1, round(1_000_000 / RATE)), MAX_REQUESTS), (1,)),
+    "Fixed window": ("fixed_window", (WINDOW_SECONDS, MAX_REQUESTS), ()),
+    "Sliding window counter": ("sliding_window_counter", (WINDOW_SECONDS, MAX_REQUESTS), (2 * WINDOW_SECONDS,)),
+    "Sliding window log": ("sliding_window_log", (WINDOW_SECONDS, MAX_REQUESTS), (0,)),
+    "Sliding window log (bucketed)": ("sliding_window_log", (WINDOW_SECONDS, MAX_REQUESTS), (LOG_BUCKET_MS,)),
+}
+
+
+def bursty_trace(rng: random.Random) -> list[int]:
+    """Request times (ms offsets) for one user: sparse traffic plus bursts, often across window edges."""
+    times = []
+    t = 0
+    while t < TRACE_SECONDS * 1000:
+        t += int(rng.expovariate(RATE) * 1000)
+        times.append(t)
+        if rng.random() < 0.1:
+            # A burst of up to twice the limit, half of them starting just before a window boundary
+            start = t - t % WINDOW_MS + WINDOW_MS - rng.randint(0, 2000) if rng.random() < 0.5 else t
+            times.extend(start + rng.randint(0, 4000) for _ in range(rng.randint(MAX_REQUESTS, 2 * MAX_REQUESTS)))
+    return sorted(time_ms for time_ms in times if time_ms < TRACE_SECONDS * 1000)
+
+
+def accuracy(name: str, traces: list[list[int]]):
+    script, before, after = SCRIPTS[name]
+    store = InMemoryScriptStore()
+    over = under = admitted_total = peak = requests = 0
+
+    for user, trace in enumerate(traces):
+        admitted = []
+        for offset in trace:
+            now = START_MS + offset
+            allowed = store.run(script, [f"user-{user}"], *before, now, *after)[0] == 1
+            # Admissions still inside the trailing window (t, t + window]
+            in_window = len(admitted) - bisect.bisect_right(admitted, now - WINDOW_MS)
+            requests += 1
+            if allowed:
+                admitted.append(now)
+                admitted_total += 1
+                over += in_window >= MAX_REQUESTS
+                peak = max(peak, in_window + 1)
+            else:
+                under += in_window < MAX_REQUESTS
+
+    print(f"{name}:")
+    print(f"  Admitted: {admitted_total}/{requests}, peak in any window: {peak} (limit {MAX_REQUESTS})")
+    print(f"  Over-admits: {over} ({over / requests:.2%}), under-admits: {under} ({under / requests:.2%})")
+
+
+async def measure(name: str, limiter, run_id: str):
+    keys = [build_user_scoped_rate_limit_key(f"bench-{i}", f"{run_id}:{name}") for i in range(USERS)]
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    latencies = []
+
+    async def one(key: str):
+        async with semaphore:
+            start = time.perf_counter()
+            await limiter.is_request_allowed(key)
+            latencies.append(time.perf_counter() - start)
+
+    for _ in range(CHECKS_PER_USER):
+        await asyncio.gather(*(one(key) for key in keys))
+
+    client = redis_connection.async_client
+    memory = [await client.memory_usage(key) or 0 for key in keys[:MEMORY_SAMPLE]]
+
+    latencies.sort()
+    print(f"{name}:")
+    print(f"  Memory per key: {round(statistics.mean(memory), 1)} bytes (MEMORY USAGE, {len(memory)} keys)")
+    print(f"  Latency p50: {latencies[len(latencies) // 2] * 1000:.3f} ms, "
+          f"p99: {latencies[int(len(latencies) * 0.99)] * 1000:.3f} ms")
+
+    await asyncio.gather(*(client.delete(key) for key in keys))
+
+
+async def main():
+    print(f"Limit: {MAX_REQUESTS} per {WINDOW_SECONDS}s, Trace: {TRACE_USERS} users x {TRACE_SECONDS}s")
+    print("-" * 50)
+    rng = random.Random(SEED)
+    traces = [bursty_trace(rng) for _ in range(TRACE_USERS)]
+    for name in SCRIPTS:
+        accuracy(name, traces)
+
+    if SKIP_REDIS:
+        return
+
+    await connect_redis()
+    run_id = uuid.uuid4().hex[:8]
+    print("-" * 50)
+    print(f"Users: {USERS}, Checks per user: {CHECKS_PER_USER}, Concurrency: {CONCURRENCY}")
+    print("-" * 50)
+    try:
+        client = redis_connection.async_client
+        limiters = {
+            "Token bucket": TokenBucketRateLimiter(
+                tokens_per_second=RATE, max_tokens=MAX_REQUESTS, redis_client=client,
+                expiry_seconds=2 * WINDOW_SECONDS, tokens_per_request=1
+            ),
+            "GCRA": GcraRateLimiter(requests_per_second=RATE, burst=MAX_REQUESTS, redis_client=client),
+            "Fixed window": FixedWindowRateLimiter(
+                window_size_seconds=WINDOW_SECONDS, max_requests=MAX_REQUESTS, redis_client=client
+            ),
+            "Sliding window counter": SlidingWindowCounterRateLimiter(
+                window_size_seconds=WINDOW_SECONDS, max_requests=MAX_REQUESTS, redis_client=client,
+                expiry_seconds=2 * WINDOW_SECONDS
+            ),
+            "Sliding window log": SlidingWindowLogRateLimiter(
+                window_size_seconds=WINDOW_SECONDS, max_requests=MAX_REQUESTS, redis_client=client
+            ),
+            "Sliding window log (bucketed)": SlidingWindowLogRateLimiter(
+                window_size_seconds=WINDOW_SECONDS, max_requests=MAX_REQUESTS, redis_client=client,
+                bucket_ms=LOG_BUCKET_MS
+            ),
+        }
+        for name, limiter in limiters.items():
+            await measure(name, limiter, run_id)
+    finally:
+        await disconnect_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+import asyncio
+import os
+import time
+
+from app.core.key_builder import build_user_scoped_rate_limit_key
+from app.core.token_bucket import TokenBucketRateLimiter
+from tests.benchmarks.harness import RedisStandIn
+
+# A batch endpoint charging ITEMS units per request, three ways: one check per
+# unit (the only option before weighted costs), one consume(key, ITEMS), and
+# consume_many over ITEMS keys of the same user (one per sub-resource, all in
+# the user's hash slot). The in-memory stand-in answers the scripts after a
+# simulated round trip, so no Redis is needed; reports script calls and time.
+BATCHES = int(os.getenv("BENCH_BATCHES", "1000"))
+ITEMS = int(os.getenv("BENCH_ITEMS", "20"))
+REDIS_RTT_US = int(os.getenv("BENCH_REDIS_RTT_US", "200"))
+USERS = int(os.getenv("BENCH_USERS", "100"))
+
+
+def build_limiter() -> TokenBucketRateLimiter:
+    # Large enough that every charge is admitted; the point is the round trips
+    return TokenBucketRateLimiter(tokens_per_second=1_000_000, max_tokens=1_000_000, redis_client=None,
+                                  expiry_seconds=10, tokens_per_request=1)
+
+
+async def per_unit(limiter: TokenBucketRateLimiter, batch: int) -> int:
+    key = build_user_scoped_rate_limit_key(f"user-{batch % USERS}", "batch")
+    decisions = [await limiter.check_request(key) for _ in range(ITEMS)]
+    return sum(decision.allowed for decision in decisions)
+
+
+async def weighted(limiter: TokenBucketRateLimiter, batch: int) -> int:
+    key = build_user_scoped_rate_limit_key(f"user-{batch % USERS}", "batch")
+    return ITEMS if (await limiter.consume(key, ITEMS)).allowed else 0
+
+
+async def many_keys(limiter: TokenBucketRateLimiter, batch: int) -> int:
+    user_id = f"user-{batch % USERS}"
+    decisions = await limiter.consume_many([(build_user_scoped_rate_limit_key(user_id, f"item-{i}"), 1)
+                                            for i in range(ITEMS)])
+    return sum(decision.allowed for decision in decisions)
+
+
+async def run(name: str, charge) -> None:
+    stand_in = RedisStandIn(round_trip_seconds=REDIS_RTT_US / 1_000_000).install()
+    limiter = build_limiter()
+
+    start = time.perf_counter()
+    admitted = 0
+    for batch in range(BATCHES):
+        admitted += await charge(limiter, batch)
+    elapsed = time.perf_counter() - start
+    await limiter.close()
+
+    print(f"{name}:")
+    print(f"  Units admitted: {admitted} of {BATCHES * ITEMS}")
+    print(f"  Script calls: {stand_in.calls} ({round(stand_in.calls / BATCHES, 2)} per batch)")
+    print(f"  Per batch: {round(elapsed / BATCHES * 1_000_000)} us")
+
+
+async def main():
+    print(f"Batches: {BATCHES}, Units per batch: {ITEMS}, Redis round trip: {REDIS_RTT_US} us")
+    print("-" * 50)
+    await run("One check per unit", per_unit)
+    await run("consume(key, units)", weighted)
+    await run("consume_many over per-item keys", many_keys)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import os
+import time
+
+from app.config import settings
+from app.core.factory import build_rate_limiter
+from app.core.key_builder import build_user_scoped_rate_limit_key
+from app.database.circuit_breaker import CircuitBreaker
+from app.database.redis import redis_connection
+from tests.benchmarks.harness import RedisStandIn
+
+# Runs token bucket checks against a flaky stand-in for the Redis cluster that
+# is healthy, then unreachable (each call hangs for the socket timeout and
+# fails), then healthy again, with and without the circuit breaker. Per phase it
+# reports check latency, how many checks were admitted against the per-user
+# limit, and the breaker state at the end of the phase. Needs no Redis.
+USERS = int(os.getenv("BENCH_USERS", "20"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "100"))
+TIMEOUT_SECONDS = float(os.getenv("BENCH_TIMEOUT_SECONDS", "1.0"))
+# (name, seconds, failure mode)
+PHASES = [("healthy", 3, None), ("outage", 8, "timeout"), ("refused", 3, "refused"), ("recovered", 8, None)]
+TOKENS_PER_SECOND = 10
+MAX_TOKENS = 10
+
+
+def new_breaker() -> CircuitBreaker:
+    return CircuitBreaker(
+        window_size=settings.circuit_breaker_window_size,
+        minimum_calls=settings.circuit_breaker_minimum_calls,
+        failure_rate_threshold=settings.circuit_breaker_failure_rate,
+        slow_call_seconds=settings.circuit_breaker_slow_call_ms / 1000,
+        slow_call_rate_threshold=settings.circuit_breaker_slow_call_rate,
+        open_seconds=settings.circuit_breaker_open_seconds,
+        half_open_probes=settings.circuit_breaker_half_open_probes,
+    )
+
+
+async def run_phase(limiter, keys: list[str], seconds: float) -> tuple[list[float], int]:
+    latencies = []
+    admitted = 0
+    deadline = time.perf_counter() + seconds
+
+    async def client(worker: int):
+        nonlocal admitted
+        i = worker
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            allowed = await limiter.is_request_allowed(keys[i % len(keys)])
+            latencies.append(time.perf_counter() - start)
+            admitted += allowed
+            i += CONCURRENCY
+            # Clients pace themselves a little, like real traffic
+            await asyncio.sleep(0.005)
+
+    await asyncio.gather(*(client(worker) for worker in range(CONCURRENCY)))
+    return latencies, admitted
+
+
+async def run(name: str, with_breaker: bool):
+    # Healthy calls take a 0.5 ms round trip
+    flaky = RedisStandIn(round_trip_seconds=0.0005, timeout_seconds=TIMEOUT_SECONDS).install()
+    redis_connection.breaker = new_breaker() if with_breaker else None
+
+    limiter = build_rate_limiter("token_bucket", dict(
+        tokens_per_second=TOKENS_PER_SECOND, max_tokens=MAX_TOKENS, expiry_seconds=10, tokens_per_request=1
+    ))
+    if not with_breaker:
+        limiter.fallback = None
+    keys = [build_user_scoped_rate_limit_key(f"bench-{i}", name) for i in range(USERS)]
+
+    print(f"{name}:")
+    for phase, seconds, failure in PHASES:
+        flaky.failure = failure
+        latencies, admitted = await run_phase(limiter, keys, seconds)
+        latencies.sort()
+        budget = USERS * (MAX_TOKENS + TOKENS_PER_SECOND * seconds)
+        state = redis_connection.breaker.state if redis_connection.breaker is not None else "-"
+        print(f"  {phase:<10} checks: {len(latencies):>6}, admitted: {admitted:>6} "
+              f"(shared limit {round(budget)}), "
+              f"p50: {latencies[len(latencies) // 2] * 1000:7.2f} ms, "
+              f"p99: {latencies[int(len(latencies) * 0.99)] * 1000:7.2f} ms, breaker: {state}")
+
+    await limiter.close()
+
+
+async def main():
+    print(f"Users: {USERS}, Concurrency: {CONCURRENCY}, Limit: {MAX_TOKENS} burst + {TOKENS_PER_SECOND}/s per user, "
+          f"Fallback workers: {settings.circuit_breaker_fallback_worker_count}")
+    print("-" * 50)
+    settings.rate_limiter_backend = "redis"
+    settings.rejection_cache_enabled = False
+    # Without a breaker every failed check logs an error
+    logging.getLogger("app").setLevel(logging.CRITICAL)
+    await run("Fail open (no breaker)", with_breaker=False)
+    await run("Circuit breaker + local fallback", with_breaker=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import random
+import sys
+import uuid
+
+from app.core.in_memory import InMemoryScriptStore
+from app.database.redis import SCRIPTS, connect_redis, disconnect_redis, run_script
+
+# Replays random request traces against the Lua scripts in Redis and the
+# in-memory mirror, and reports every reply on which the two backends disagree.
+TRACES = int(os.getenv("BENCH_TRACES", "50"))
+STEPS_PER_TRACE = int(os.getenv("BENCH_STEPS_PER_TRACE", "400"))
+SEED = int(os.getenv("BENCH_SEED", "0"))
+# Refill rates (tokens/second) include fractional ones to exercise sub-second refills
+REFILL_RATES = (0.2, 1, 2.5, 3, 1000)
+FIXED_WINDOW_SECONDS = 7 * 24 * 3600
+# (window_size, max_requests, bucket_ms) per trace key
+SLIDING_WINDOW_LOG_PARAMS = [(0.5, 3, 0), (10, 8, 0), (60, 10, 1000)]
+
+
+def random_call(rng: random.Random, keys: list[str], now: int):
+    # now is in epoch milliseconds, as the scripts expect
+    script_name = rng.choice(list(SCRIPTS))
+
+    if script_name == 'token_bucket':
+        return script_name, [rng.choice(keys)], [rng.randint(1, 10), rng.choice(REFILL_RATES), now, rng.randint(1, 3), 3600]
+    if script_name == 'sliding_window_counter':
+        return script_name, [rng.choice(keys) + ":sw"], [rng.choice([0.5, 5, 10, 60]), rng.randint(1, 10), now, 3600]
+    if script_name == 'token_bucket_batch':
+        batch_keys = rng.sample(keys, rng.randint(1, len(keys)))
+        args = [now]
+        for _ in batch_keys:
+            args.extend((10, rng.choice(REFILL_RATES), rng.randint(1, 3), 3600))
+        return script_name, batch_keys, args
+    if script_name == 'sliding_window_counter_batch':
+        batch_keys = [key + ":sw" for key in rng.sample(keys, rng.randint(1, len(keys)))]
+        args = [now]
+        for _ in batch_keys:
+            args.extend((10, rng.randint(1, 10), 3600))
+        return script_name, batch_keys, args
+    if script_name == 'fixed_window':
+        # Redis expires keys on its own clock, so the window must outlast a trace's simulated time
+        return script_name, [rng.choice(keys) + ":fw"], [FIXED_WINDOW_SECONDS, rng.randint(1, 10), now]
+    if script_name == 'sliding_window_log':
+        # Stable parameters per key, as in production, keep its PEXPIRE a pure cleanup
+        index = rng.randrange(len(keys))
+        return script_name, [keys[index] + ":swl"], [*SLIDING_WINDOW_LOG_PARAMS[index][:2], now,
+                                                     SLIDING_WINDOW_LOG_PARAMS[index][2]]
+    if script_name == 'gcra':
+        return script_name, [rng.choice(keys) + ":gcra"], [round(1e6 / rng.choice(REFILL_RATES)), rng.randint(1, 10), now,
+                                                          rng.randint(1, 3)]
+    if script_name == 'token_bucket_chain':
+        chain_keys = rng.sample(keys, rng.randint(1, len(keys)))
+        args = [now]
+        for _ in chain_keys:
+            args.extend((rng.randint(1, 10), rng.choice(REFILL_RATES), rng.randint(1, 3), 3600))
+        return script_name, chain_keys, args
+    return script_name, [rng.choice(keys)], [10, rng.choice(REFILL_RATES), now, rng.randint(0, 2), rng.randint(0, 3), 3600]
+
+
+async def replay(rng: random.Random) -> int:
+    # One hash tag per trace keeps multi-key batch calls in a single slot
+    tag = uuid.uuid4().hex
+    keys = [f"rate_limit:{{user:{tag}}}:{scope}" for scope in ("user", "tenant", "endpoint")]
+    store = InMemoryScriptStore()
+    now = 1_700_000_000_000
+    mismatches = 0
+
+    for _ in range(STEPS_PER_TRACE):
+        now += rng.choice((0, 0, 0, 1, 37, 250, 1000, 2000, 5000, 30000))
+        script_name, call_keys, args = random_call(rng, keys, now)
+        redis_reply = await run_script(script_name, call_keys, *args)
+        memory_reply = store.run(script_name, call_keys, *args)
+
+        if list(redis_reply) != memory_reply:
+            mismatches += 1
+            print(f"Mismatch in {script_name} keys={call_keys} args={args}: "
+                  f"redis={redis_reply} memory={memory_reply}")
+
+    return mismatches
+
+
+async def main():
+    await connect_redis()
+    rng = random.Random(SEED)
+    try:
+        mismatches = 0
+        for _ in range(TRACES):
+            mismatches += await replay(rng)
+    finally:
+        await disconnect_redis()
+
+    print(f"Traces: {TRACES}, Steps per trace: {STEPS_PER_TRACE}, Seed: {SEED}")
+    print(f"Mismatches: {mismatches}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
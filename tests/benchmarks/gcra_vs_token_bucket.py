@@ -0,0 +1,81 @@
+import asyncio
+import os
+import statistics
+import time
+import uuid
+
+from redis.asyncio.cluster import RedisCluster
+
+from app.core.gcra import GcraRateLimiter
+from app.core.key_builder import build_user_scoped_rate_limit_key
+from app.core.token_bucket import TokenBucketRateLimiter
+from app.database.redis import connect_redis, disconnect_redis, redis_connection
+
+# Compares GCRA (one string per key, GET + SET) with the token bucket (hash per
+# key, HMGET + HSET + PEXPIRE) on the configured cluster: Redis memory per key,
+# checks per second and Redis commands per check. Both limiters allow 5 requests
+# of burst refilling at 1 request/s, and every user is checked several times.
+USERS = int(os.getenv("BENCH_USERS", "25000"))
+CHECKS_PER_USER = int(os.getenv("BENCH_CHECKS_PER_USER", "4"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "200"))
+MEMORY_SAMPLE = int(os.getenv("BENCH_MEMORY_SAMPLE", "500"))
+
+
+async def commands_processed() -> int:
+    info = await redis_connection.async_client.info("stats", target_nodes=RedisCluster.PRIMARIES)
+    return sum(node_info["total_commands_processed"] for node_info in info.values())
+
+
+async def run(name: str, limiter, run_id: str):
+    keys = [build_user_scoped_rate_limit_key(f"bench-{i}", f"{run_id}:{name}") for i in range(USERS)]
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    latencies = []
+
+    async def one(key: str):
+        async with semaphore:
+            start = time.perf_counter()
+            await limiter.is_request_allowed(key)
+            latencies.append(time.perf_counter() - start)
+
+    total_checks = USERS * CHECKS_PER_USER
+    commands_before = await commands_processed()
+    start = time.perf_counter()
+    for _ in range(CHECKS_PER_USER):
+        await asyncio.gather(*(one(key) for key in keys))
+    elapsed = time.perf_counter() - start
+    commands_after = await commands_processed()
+
+    client = redis_connection.async_client
+    sample = keys[:MEMORY_SAMPLE]
+    memory = [await client.memory_usage(key) or 0 for key in sample]
+
+    latencies.sort()
+    print(f"{name}:")
+    print(f"  Checks/s: {round(total_checks / elapsed, 2)}")
+    # INFO calls themselves account for a handful of commands
+    print(f"  Redis commands per check: {round((commands_after - commands_before) / total_checks, 2)}")
+    print(f"  Memory per key: {round(statistics.mean(memory), 1)} bytes (MEMORY USAGE, {len(sample)} keys)")
+    print(f"  Estimated memory for {USERS} keys: {round(statistics.mean(memory) * USERS / 1024 / 1024, 2)} MiB")
+    print(f"  Latency p50: {latencies[len(latencies) // 2] * 1000:.3f} ms, "
+          f"p99: {latencies[int(len(latencies) * 0.99)] * 1000:.3f} ms")
+
+    await asyncio.gather(*(client.delete(key) for key in keys))
+
+
+async def main():
+    await connect_redis()
+    run_id = uuid.uuid4().hex[:8]
+    print(f"Users: {USERS}, Checks per user: {CHECKS_PER_USER}, Concurrency: {CONCURRENCY}")
+    print("-" * 50)
+    try:
+        client = redis_connection.async_client
+        await run("Token bucket", TokenBucketRateLimiter(
+            tokens_per_second=1, max_tokens=5, redis_client=client, expiry_seconds=10, tokens_per_request=1
+        ), run_id)
+        await run("GCRA", GcraRateLimiter(requests_per_second=1, burst=5, redis_client=client), run_id)
+    finally:
+        await disconnect_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
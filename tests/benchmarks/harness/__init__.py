@@ -0,0 +1,8 @@
+"""Building blocks for the open-loop benchmarks: arrival schedules, key
+distributions, HDR-style latency histograms and an in-process Redis stand-in."""
+from tests.benchmarks.harness.distributions import build_distribution
+from tests.benchmarks.harness.histogram import LatencyHistogram
+from tests.benchmarks.harness.open_loop import OpenLoopResult, run_open_loop
+from tests.benchmarks.harness.stand_in import RedisStandIn
+
+__all__ = ["build_distribution", "LatencyHistogram", "OpenLoopResult", "run_open_loop", "RedisStandIn"]
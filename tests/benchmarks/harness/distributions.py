@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import bisect
+import itertools
+import random
+from typing import Callable
+
+# Picks the user for the next request
+UserPicker = Callable[[], int]
+
+
+def uniform(rng: random.Random, users: int) -> UserPicker:
+    return lambda: rng.randrange(users)
+
+
+def zipf(rng: random.Random, users: int, exponent: float = 1.1) -> UserPicker:
+    """User k (0-based) is picked with probability proportional to 1 / (k + 1) ** exponent."""
+    cumulative = list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, users + 1)))
+    total = cumulative[-1]
+    return lambda: min(bisect.bisect_left(cumulative, rng.random() * total), users - 1)
+
+
+def hot_key(rng: random.Random, users: int, hot_users: int = 1, hot_fraction: float = 0.9) -> UserPicker:
+    """``hot_fraction`` of requests go to the first ``hot_users`` users, the rest spread uniformly."""
+    return lambda: rng.randrange(hot_users) if rng.random() < hot_fraction else rng.randrange(users)
+
+
+DISTRIBUTIONS = {"uniform": uniform, "zipf": zipf, "hot_key": hot_key}
+
+
+def build_distribution(name: str, seed: int, users: int) -> UserPicker:
+    if name not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution '{name}', expected one of {', '.join(DISTRIBUTIONS)}")
+    return DISTRIBUTIONS[name](random.Random(seed), users)
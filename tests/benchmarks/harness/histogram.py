@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+# Values below 2^SUB_BUCKET_BITS are counted exactly; above that every power of
+# two is split into 2^(SUB_BUCKET_BITS - 1) equal sub-buckets, so a recorded
+# value is off by at most 1/1024 of itself (three significant digits), the
+# layout of an HdrHistogram.
+SUB_BUCKET_BITS = 11
+_SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+_HALF = _SUB_BUCKETS >> 1
+
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+
+def _index(value: int) -> int:
+    if value < _SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return _SUB_BUCKETS + (shift - 1) * _HALF + (value >> shift) - _HALF
+
+
+def _highest_equivalent(index: int) -> int:
+    if index < _SUB_BUCKETS:
+        return index
+    shift, offset = divmod(index - _SUB_BUCKETS, _HALF)
+    shift += 1
+    return ((offset + _HALF + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """Latencies in whole microseconds, with constant relative precision and sparse storage."""
+
+    __slots__ = ("_counts", "count", "total", "max")
+
+    def __init__(self):
+        self._counts: dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, seconds: float) -> None:
+        value = max(0, round(seconds * 1_000_000))
+        index = _index(value)
+        self._counts[index] = self._counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: LatencyHistogram) -> None:
+        for index, count in other._counts.items():
+            self._counts[index] = self._counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percentile: float) -> int:
+        """Smallest recorded value (at histogram precision) that ``percentile`` % of values do not exceed."""
+        if not self.count:
+            return 0
+        target = max(1, -(-self.count * percentile // 100))
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= target:
+                return min(_highest_equivalent(index), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        summary = {f"p{percentile:g}": self.percentile(percentile) for percentile in PERCENTILES}
+        summary["max"] = self.max
+        summary["mean"] = round(self.total / self.count, 1) if self.count else 0.0
+        summary["count"] = self.count
+        return summary
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from tests.benchmarks.harness.histogram import LatencyHistogram
+
+# Sends one request for the given user and returns its HTTP status
+Sender = Callable[[int], Awaitable[int]]
+
+
+class OpenLoopResult:
+    """Outcome of one constant-arrival-rate run.
+
+    ``response_time`` is measured from when each request was scheduled to start,
+    so time a request spent waiting behind slow ones counts against it (no
+    coordinated omission). ``service_time`` starts when the request was actually
+    sent, which is all a closed-loop test sees.
+    """
+
+    __slots__ = ("rate", "duration_seconds", "scheduled", "completed", "dropped", "statuses", "errors",
+                 "elapsed_seconds", "response_time", "service_time")
+
+    def __init__(self, rate: float, duration_seconds: float):
+        self.rate = rate
+        self.duration_seconds = duration_seconds
+        self.scheduled = 0
+        self.completed = 0
+        self.dropped = 0
+        self.statuses: dict[int, int] = {}
+        self.errors = 0
+        self.elapsed_seconds = 0.0
+        self.response_time = LatencyHistogram()
+        self.service_time = LatencyHistogram()
+
+    def summary(self) -> dict:
+        return {
+            "target_rate": self.rate,
+            "achieved_rate": round(self.completed / self.elapsed_seconds, 1) if self.elapsed_seconds else 0.0,
+            "scheduled": self.scheduled,
+            "completed": self.completed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+            "response_time_us": self.response_time.summary(),
+            "service_time_us": self.service_time.summary(),
+        }
+
+
+async def run_open_loop(send: Sender, pick_user: Callable[[], int], rate: float, duration_seconds: float,
+                        max_in_flight: int = 10000) -> OpenLoopResult:
+    """Start requests at a fixed ``rate`` for ``duration_seconds`` whether or not earlier ones finished.
+
+    Request i is due at ``start + i / rate``. The dispatcher wakes up, starts
+    every request that is due, and sleeps until the next one. Requests that
+    would exceed ``max_in_flight`` are dropped and counted, so an overloaded
+    target cannot exhaust memory.
+    """
+    result = OpenLoopResult(rate, duration_seconds)
+    interval = 1.0 / rate
+    total = int(rate * duration_seconds)
+    in_flight: set[asyncio.Task] = set()
+
+    async def one(user: int, scheduled_at: float):
+        sent_at = time.perf_counter()
+        try:
+            status = await send(user)
+        except Exception:
+            result.errors += 1
+            return
+        finished_at = time.perf_counter()
+        result.completed += 1
+        result.statuses[status] = result.statuses.get(status, 0) + 1
+        result.response_time.record(finished_at - scheduled_at)
+        result.service_time.record(finished_at - sent_at)
+
+    start = time.perf_counter()
+    i = 0
+    while i < total:
+        now = time.perf_counter()
+        while i < total and start + i * interval <= now:
+            result.scheduled += 1
+            if len(in_flight) >= max_in_flight:
+                result.dropped += 1
+            else:
+                task = asyncio.create_task(one(pick_user(), start + i * interval))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            i += 1
+        if i < total:
+            await asyncio.sleep(max(0.0, start + i * interval - time.perf_counter()))
+
+    if in_flight:
+        await asyncio.gather(*in_flight)
+    result.elapsed_seconds = time.perf_counter() - start
+    return result
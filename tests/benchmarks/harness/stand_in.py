@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Optional
+
+import redis
+
+from app.core.in_memory import InMemoryScriptStore
+from app.database.redis import SCRIPTS, redis_connection
+
+
+class RedisStandIn:
+    """Answers EVALSHA from the in-memory mirror of the Lua scripts, like one Redis node.
+
+    ``round_trip_seconds`` adds a simulated network round trip to every call.
+    ``failure`` makes calls fail like a dead node: "timeout" hangs for
+    ``timeout_seconds`` and raises TimeoutError, "refused" raises ConnectionError.
+    Script names double as SHAs; use ``install()`` to put it behind run_script.
+    Pipelines also take the plain INCRBY, EXPIRE and GET commands, kept in
+    ``values`` and ``expiries``; ``pipelines`` holds every executed pipeline.
+    """
+
+    def __init__(self, round_trip_seconds: float = 0.0, timeout_seconds: float = 1.0):
+        self.store = InMemoryScriptStore()
+        self.round_trip_seconds = round_trip_seconds
+        self.timeout_seconds = timeout_seconds
+        self.failure: Optional[str] = None
+        self.calls = 0
+        self.values: dict[str, int] = {}
+        self.expiries: dict[str, int] = {}
+        self.pipelines: list[StandInPipeline] = []
+
+    async def _round_trip(self):
+        self.calls += 1
+        if self.failure == "timeout":
+            await asyncio.sleep(self.timeout_seconds)
+            raise redis.exceptions.TimeoutError("Timeout reading from socket")
+        if self.failure == "refused":
+            raise redis.exceptions.ConnectionError("Connection refused")
+        if self.round_trip_seconds:
+            await asyncio.sleep(self.round_trip_seconds)
+
+    async def evalsha(self, sha: str, numkeys: int, *keys_and_args):
+        await self._round_trip()
+        return self.store.run(sha, keys_and_args[:numkeys], *keys_and_args[numkeys:])
+
+    def pipeline(self, transaction: bool = True) -> StandInPipeline:
+        return StandInPipeline(self, transaction)
+
+    def run_command(self, command: str, *args):
+        if command == "evalsha":
+            sha, numkeys, *keys_and_args = args
+            return self.store.run(sha, keys_and_args[:numkeys], *keys_and_args[numkeys:])
+        if command == "incrby":
+            key, amount = args
+            self.values[key] = self.values.get(key, 0) + amount
+            return self.values[key]
+        if command == "expire":
+            key, seconds = args
+            self.expiries[key] = seconds
+            return int(key in self.values)
+        if command == "get":
+            value = self.values.get(args[0])
+            return None if value is None else str(value).encode()
+        raise NotImplementedError(command)
+
+    def install(self) -> RedisStandIn:
+        redis_connection.async_client = self
+        redis_connection.read_client = self
+        redis_connection.script_shas = {script_name: script_name for script_name in SCRIPTS}
+        return self
+
+
+class StandInPipeline:
+    """Queued commands sent to the stand-in in one round trip."""
+
+    def __init__(self, stand_in: RedisStandIn, transaction: bool):
+        self.stand_in = stand_in
+        self.transaction = transaction
+        self.commands: list[tuple] = []
+
+    def __getattr__(self, command: str):
+        if command not in ("evalsha", "incrby", "expire", "get"):
+            raise AttributeError(command)
+        return lambda *args: self.commands.append((command, *args))
+
+    async def execute(self, raise_on_error: bool = True) -> list:
+        await self.stand_in._round_trip()
+        self.stand_in.pipelines.append(self)
+        results = []
+        for command, *args in self.commands:
+            try:
+                results.append(self.stand_in.run_command(command, *args))
+            except Exception as e:
+                if raise_on_error:
+                    raise
+                results.append(e)
+        return results
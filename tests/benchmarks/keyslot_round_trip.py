@@ -0,0 +1,74 @@
+import asyncio
+import os
+import statistics
+import time
+
+from redis.asyncio.cluster import RedisCluster
+
+from app.core.key_builder import build_user_rate_limit_key
+from app.database.cluster import key_hash_slot
+from app.database.redis import connect_redis, disconnect_redis, redis_connection, script_clock_ms
+
+# Compares the old check path (CLUSTER KEYSLOT + EVALSHA) with the local
+# CRC16 slot calculation (EVALSHA only) against the configured cluster.
+TOTAL_CHECKS = int(os.getenv("BENCH_TOTAL_CHECKS", "20000"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "200"))
+USERS = int(os.getenv("BENCH_USERS", "1000"))
+
+
+async def commands_processed() -> int:
+    info = await redis_connection.async_client.info("stats", target_nodes=RedisCluster.PRIMARIES)
+    return sum(node_info["total_commands_processed"] for node_info in info.values())
+
+
+async def check_with_remote_keyslot(key: str):
+    client = redis_connection.async_client
+    await client.cluster_keyslot(key)
+    await client.evalsha(redis_connection.script_shas['token_bucket'], 1, key, 5, 1, script_clock_ms(), 1, 10)
+
+
+async def check_with_local_keyslot(key: str):
+    client = redis_connection.async_client
+    key_hash_slot(key)
+    await client.evalsha(redis_connection.script_shas['token_bucket'], 1, key, 5, 1, script_clock_ms(), 1, 10)
+
+
+async def run(name: str, check):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    latencies = []
+
+    async def one(i: int):
+        key = build_user_rate_limit_key(f"bench-{i % USERS}")
+        async with semaphore:
+            start = time.perf_counter()
+            await check(key)
+            latencies.append(time.perf_counter() - start)
+
+    commands_before = await commands_processed()
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(TOTAL_CHECKS)))
+    elapsed = time.perf_counter() - start
+    commands_after = await commands_processed()
+
+    latencies.sort()
+    print(f"{name}:")
+    print(f"  Checks/s: {round(TOTAL_CHECKS / elapsed, 2)}")
+    print(f"  Redis ops/s: {round((commands_after - commands_before) / elapsed, 2)}")
+    print(f"  Latency mean: {statistics.mean(latencies) * 1000:.3f} ms")
+    print(f"  Latency p50: {latencies[len(latencies) // 2] * 1000:.3f} ms")
+    print(f"  Latency p99: {latencies[int(len(latencies) * 0.99)] * 1000:.3f} ms")
+
+
+async def main():
+    await connect_redis()
+    print(f"Total checks: {TOTAL_CHECKS}, Concurrency: {CONCURRENCY}, Users: {USERS}")
+    print("-" * 50)
+    try:
+        await run("Before (CLUSTER KEYSLOT + EVALSHA)", check_with_remote_keyslot)
+        await run("After (local CRC16 + EVALSHA)", check_with_local_keyslot)
+    finally:
+        await disconnect_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
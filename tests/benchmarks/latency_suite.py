@@ -0,0 +1,151 @@
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import httpx
+
+from app.config import settings
+from app.core.factory import get_policy_engine
+from app.core.policies import PolicyIndex, load_rules
+from tests.benchmarks.harness import RedisStandIn, build_distribution, run_open_loop
+
+# Open-loop latency suite: for every algorithm x user distribution x arrival
+# rate, requests start on a fixed schedule against the real app (middleware,
+# policies, routes) in process over httpx's ASGI transport, with the Redis
+# scripts answered by the in-memory stand-in. Needs no Redis or docker-compose.
+#
+# Response times are measured from each request's scheduled start, so a stall
+# shows up in every request queued behind it (p99/p99.9), not as a lower average.
+# Results are written as JSON to BENCH_OUTPUT. With BENCH_BASELINE set to an
+# earlier output, scenarios whose p99 response time grew or whose achieved rate
+# fell by more than BENCH_TOLERANCE are listed and the run exits 1.
+ALGORITHMS = os.getenv("BENCH_ALGORITHMS",
+                       "token_bucket,sliding_window_counter,gcra,fixed_window,sliding_window_log").split(",")
+DISTRIBUTIONS = os.getenv("BENCH_DISTRIBUTIONS", "uniform,zipf,hot_key").split(",")
+RATES = [float(rate) for rate in os.getenv("BENCH_RATES", "500,1000").split(",")]
+DURATION_SECONDS = float(os.getenv("BENCH_DURATION_SECONDS", "5"))
+USERS = int(os.getenv("BENCH_USERS", "10000"))
+SEED = int(os.getenv("BENCH_SEED", "1"))
+REDIS_RTT_US = int(os.getenv("BENCH_REDIS_RTT_US", "0"))
+OUTPUT = os.getenv("BENCH_OUTPUT", "latency_suite.json")
+BASELINE = os.getenv("BENCH_BASELINE")
+TOLERANCE = float(os.getenv("BENCH_TOLERANCE", "0.25"))
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def reset_policies(rules: list[dict]) -> dict[str, str]:
+    """Fresh limiters (and rejection caches) for every scenario; returns algorithm -> route."""
+    engine = get_policy_engine()
+    for policy in engine.index.policies:
+        for limiter in policy.limiters():
+            await limiter.close()
+    engine.index = PolicyIndex(engine.tenant_header)
+    engine.index, _ = engine.compile(rules)
+    return {rule["algorithm"]: rule["route"] for rule in rules}
+
+
+async def run_scenario(app, rules: list[dict], algorithm: str, distribution: str, rate: float) -> dict:
+    RedisStandIn(round_trip_seconds=REDIS_RTT_US / 1_000_000).install()
+    route = (await reset_policies(rules))[algorithm]
+    pick_user = build_distribution(distribution, SEED, USERS)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def send(user: int) -> int:
+            return (await client.get(route, headers={"user_id": f"user-{user}"})).status_code
+
+        result = await run_open_loop(send, pick_user, rate, DURATION_SECONDS)
+
+    return {"scenario": f"{algorithm}/{distribution}/{rate:g}", "algorithm": algorithm,
+            "distribution": distribution, **result.summary()}
+
+
+def compare(results: list[dict], baseline_path: str) -> list[str]:
+    with open(baseline_path) as baseline_file:
+        baseline = {result["scenario"]: result for result in json.load(baseline_file)["results"]}
+
+    regressions = []
+    for result in results:
+        before = baseline.get(result["scenario"])
+        if before is None:
+            continue
+        p99, p99_before = result["response_time_us"]["p99"], before["response_time_us"]["p99"]
+        if p99 > p99_before * (1 + TOLERANCE):
+            regressions.append(f"{result['scenario']}: p99 response time {p99_before} -> {p99} us")
+        if result["achieved_rate"] < before["achieved_rate"] * (1 - TOLERANCE):
+            regressions.append(f"{result['scenario']}: achieved rate {before['achieved_rate']} -> "
+                               f"{result['achieved_rate']} req/s")
+    return regressions
+
+
+async def main() -> int:
+    settings.rate_limiter_backend = "redis"
+    from app.main import app
+
+    # httpx logs every request at INFO; keep the logging cost out of the numbers
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # The hybrid limiter syncs with pipelines the stand-in does not answer
+    rules = [rule for rule in load_rules(settings.rate_limit_policy_file)
+             if rule["algorithm"] in ALGORITHMS and rule["algorithm"] != "hybrid"]
+
+    print(f"Duration: {DURATION_SECONDS}s, Users: {USERS}, Seed: {SEED}, Redis round trip: {REDIS_RTT_US} us")
+    print("-" * 50)
+    results = []
+    for algorithm in ALGORITHMS:
+        for distribution in DISTRIBUTIONS:
+            for rate in RATES:
+                result = await run_scenario(app, rules, algorithm, distribution, rate)
+                results.append(result)
+                response, service = result["response_time_us"], result["service_time_us"]
+                print(f"{result['scenario']}: {result['achieved_rate']} req/s, statuses {result['statuses']}, "
+                      f"dropped {result['dropped']}, errors {result['errors']}")
+                print(f"  response p50/p99/p99.9: {response['p50']}/{response['p99']}/{response['p99.9']} us, "
+                      f"service p50/p99: {service['p50']}/{service['p99']} us")
+
+    for policy in get_policy_engine().index.policies:
+        for limiter in policy.limiters():
+            await limiter.close()
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "duration_seconds": DURATION_SECONDS,
+            "users": USERS,
+            "seed": SEED,
+            "redis_rtt_us": REDIS_RTT_US,
+        },
+        "results": results,
+    }
+    with open(OUTPUT, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print("-" * 50)
+    print(f"Results written to {OUTPUT}")
+
+    if BASELINE:
+        regressions = compare(results, BASELINE)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions against {BASELINE} (tolerance {TOLERANCE:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+import httpx
+
+from app.config import settings
+from app.core import log_pipeline
+from app.core.factory import get_policy_engine
+from tests.benchmarks.harness import RedisStandIn, build_distribution
+
+# Drives /token-bucket through the real app (middleware, policy, limiter) in
+# process, with the Redis scripts answered by the in-memory stand-in, and
+# reports req/s under different logging setups. Records go to a temporary file,
+# so every written line pays for formatting and a real write.
+#
+# At DEBUG every check logs its decision, which is the worst case for the hot
+# path. "synchronous" is the old basicConfig setup: each record is formatted and
+# written on the event loop. "pipeline" only filters and enqueues on the event
+# loop; a listener thread formats and writes, and each call site is held to
+# LOG_MAX_PER_SECOND_PER_MESSAGE. The INFO and WARNING runs show what is left
+# once per-request records are below the level.
+TOTAL_REQUESTS = int(os.getenv("BENCH_TOTAL_REQUESTS", "20000"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "64"))
+USERS = int(os.getenv("BENCH_USERS", "1000"))
+SEED = int(os.getenv("BENCH_SEED", "1"))
+
+MODES = [
+    # name, log_level, log_async, log_format, log_sample_rate, log_max_per_second_per_message
+    ("synchronous text, DEBUG", "DEBUG", False, "text", 1.0, 0.0),
+    ("pipeline json, DEBUG", "DEBUG", True, "json", 1.0, 10.0),
+    ("pipeline json, DEBUG sampled 1%", "DEBUG", True, "json", 0.01, 10.0),
+    ("pipeline json, INFO", "INFO", True, "json", 1.0, 10.0),
+    ("logging at WARNING", "WARNING", True, "json", 1.0, 10.0),
+]
+
+
+async def run(app, mode: tuple) -> None:
+    name, level, asynchronous, log_format, sample_rate, max_per_second = mode
+    settings.log_level, settings.log_async, settings.log_format = level, asynchronous, log_format
+    settings.log_sample_rate, settings.log_max_per_second_per_message = sample_rate, max_per_second
+
+    with tempfile.TemporaryFile("w+") as log_file:
+        log_pipeline.configure_logging(log_file)
+        # The client's own per-request records are not the server's cost
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+
+        RedisStandIn().install()
+        for policy in get_policy_engine().index.policies:
+            for limiter in policy.limiters():
+                await limiter.close()
+        await get_policy_engine().load()
+        pick_user = build_distribution("zipf", SEED, USERS)
+
+        remaining = TOTAL_REQUESTS
+        statuses: dict[int, int] = {}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def client_loop():
+                nonlocal remaining
+                while remaining > 0:
+                    remaining -= 1
+                    response = await client.get("/token-bucket", headers={"user_id": f"user-{pick_user()}"})
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(client_loop() for _ in range(CONCURRENCY)))
+            elapsed = time.perf_counter() - start
+
+        # Waits for the listener to write everything it was handed
+        log_pipeline.stop_logging()
+        log_file.seek(0)
+        lines = sum(1 for _ in log_file)
+
+    print(f"{name}: {round(TOTAL_REQUESTS / elapsed, 1)} req/s, statuses {dict(sorted(statuses.items()))}, "
+          f"{lines} log lines written")
+
+
+async def main():
+    settings.rate_limiter_backend = "redis"
+    from app.main import app
+
+    print(f"Requests: {TOTAL_REQUESTS}, Concurrency: {CONCURRENCY}, Users: {USERS} (zipf)")
+    print("-" * 50)
+    for mode in MODES:
+        await run(app, mode)
+
+    for policy in get_policy_engine().index.policies:
+        for limiter in policy.limiters():
+            await limiter.close()
+    log_pipeline.configure_logging()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import time
+
+from app.core.in_memory import InMemoryTokenBucketRateLimiter
+from app.core.metrics import (
+    LimiterMetrics, MetricsContext, rate_limit_allowed, rate_limit_rejected,
+    rate_limit_requests_total, redis_operations_total, token_bucket_tokens_remaining
+)
+
+# Times the same in-memory token bucket check with different instrumentation,
+# so the difference to the uninstrumented run is the cost of metrics alone.
+TOTAL_CHECKS = int(os.getenv("BENCH_TOTAL_CHECKS", "200000"))
+KEY_COUNT = int(os.getenv("BENCH_KEY_COUNT", "1000"))
+FLUSH_INTERVAL_MS = int(os.getenv("BENCH_FLUSH_INTERVAL_MS", "100"))
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
+class NoMetrics(LimiterMetrics):
+    def check(self):
+        return _NullTimer()
+
+    def record_decision(self, key, allowed, remaining=None):
+        pass
+
+    def redis_success(self):
+        pass
+
+    def redis_error(self):
+        pass
+
+
+class LabelLookupMetrics(LimiterMetrics):
+    """Per-call .labels() lookups and time.time() timing, as before the facade."""
+
+    def check(self):
+        return MetricsContext(algorithm=self.algorithm)
+
+    def record_decision(self, key, allowed, remaining=None):
+        result = "allowed" if allowed else "rejected"
+        counter = rate_limit_allowed if allowed else rate_limit_rejected
+        counter.labels(algorithm=self.algorithm, endpoint=self.endpoint).inc()
+        rate_limit_requests_total.labels(algorithm=self.algorithm, result=result, endpoint=self.endpoint).inc()
+        if remaining is not None:
+            token_bucket_tokens_remaining.observe(remaining)
+
+    def redis_success(self):
+        redis_operations_total.labels(operation="evalsha", status="success").inc()
+
+
+async def run(name: str, metrics: LimiterMetrics, keys: list[str]) -> float:
+    limiter = InMemoryTokenBucketRateLimiter(tokens_per_second=1000, max_tokens=1000,
+                                             expiry_seconds=10, tokens_per_request=1)
+    limiter.metrics = metrics
+
+    start = time.perf_counter_ns()
+    for i in range(TOTAL_CHECKS):
+        await limiter.is_request_allowed(keys[i % KEY_COUNT])
+    per_check_ns = (time.perf_counter_ns() - start) / TOTAL_CHECKS
+    metrics.flush()
+
+    print(f"{name}: {round(per_check_ns)} ns/check")
+    return per_check_ns
+
+
+async def main():
+    keys = [f"rate_limit:{{user:{i}}}" for i in range(KEY_COUNT)]
+    metric_args = dict(algorithm="token_bucket", endpoint="token_bucket", remaining=token_bucket_tokens_remaining)
+
+    print(f"Total checks: {TOTAL_CHECKS}, Keys: {KEY_COUNT}")
+    print("-" * 50)
+    baseline = await run("Uninstrumented", NoMetrics(**metric_args, flush_interval_ms=0), keys)
+    variants = [
+        ("Per-call label lookups", LabelLookupMetrics(**metric_args, flush_interval_ms=0)),
+        ("Pre-bound children", LimiterMetrics(**metric_args, flush_interval_ms=0)),
+        (f"Buffered ({FLUSH_INTERVAL_MS} ms flush)", LimiterMetrics(**metric_args, flush_interval_ms=FLUSH_INTERVAL_MS)),
+    ]
+    for name, metrics in variants:
+        per_check_ns = await run(name, metrics, keys)
+        print(f"  Instrumentation overhead: {round(per_check_ns - baseline)} ns/check "
+              f"({round((per_check_ns - baseline) / per_check_ns * 100, 1)}% of the check)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
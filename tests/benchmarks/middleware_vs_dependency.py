@@ -0,0 +1,95 @@
+import asyncio
+import os
+import statistics
+import time
+
+# Both paths share the in-memory limiters so the numbers exclude Redis entirely
+os.environ.setdefault("RATE_LIMITER_BACKEND", "memory")
+
+import httpx  # noqa: E402
+from fastapi import Depends, FastAPI, HTTPException, Request, Response, status  # noqa: E402
+
+from app.api.middleware.rate_limit import RateLimitMiddleware  # noqa: E402
+from app.core.base import RateLimiterStrategy  # noqa: E402
+from app.core.factory import build_rate_limiter  # noqa: E402
+from app.core.key_builder import build_user_rate_limit_key  # noqa: E402
+from app.core.policies import PolicyEngine  # noqa: E402
+
+# Compares the Depends()/HTTPException path with the raw ASGI middleware on the
+# same token bucket route, in process over httpx's ASGI transport.
+TOTAL_REQUESTS = int(os.getenv("BENCH_TOTAL_REQUESTS", "5000"))
+TOKEN_BUCKET_PARAMS = {"tokens_per_second": 1, "max_tokens": 5, "expiry_seconds": 10, "tokens_per_request": 1}
+
+
+async def endpoint():
+    # Returned as data so FastAPI merges the headers the dependency set
+    return {"message": "Request successful"}
+
+
+def dependency_app(limiter: RateLimiterStrategy) -> FastAPI:
+    async def enforce_rate_limit(request: Request, response: Response):
+        """The Depends()/HTTPException way of enforcing the limit, sending the same headers as the middleware."""
+        user_id = request.headers.get("user_id")
+        if not user_id:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="user_id header is required")
+
+        decision = await limiter.check_request(build_user_rate_limit_key(user_id))
+        if not decision.allowed:
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                                detail="Rate limit exceeded. Please try again later.",
+                                headers=dict(decision.headers()))
+        response.headers.update(dict(decision.headers()))
+
+    app = FastAPI()
+    app.add_api_route("/token-bucket", endpoint, dependencies=[Depends(enforce_rate_limit)])
+    return app
+
+
+def middleware_app(limiter: RateLimiterStrategy) -> FastAPI:
+    app = FastAPI()
+    app.add_api_route("/token-bucket", endpoint)
+    engine = PolicyEngine(path="", build_limiter=lambda algorithm, params: limiter)
+    engine.index, _ = engine.compile([
+        {"name": "token-bucket", "route": "/token-bucket", "algorithm": "token_bucket", "retry_after_seconds": 1},
+    ])
+    app.add_middleware(RateLimitMiddleware, engine=engine)
+    return app
+
+
+async def run(name: str, app: FastAPI):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Allowed path: every request comes from a fresh user
+        start = time.perf_counter()
+        for i in range(TOTAL_REQUESTS):
+            response = await client.get("/token-bucket", headers={"user_id": f"{name}-{i}"})
+            assert response.status_code == 200
+        allowed_rps = TOTAL_REQUESTS / (time.perf_counter() - start)
+
+        # Rejected path: one user far past its burst
+        latencies = []
+        for _ in range(TOTAL_REQUESTS):
+            start = time.perf_counter()
+            response = await client.get("/token-bucket", headers={"user_id": f"{name}-hot"})
+            if response.status_code == 429:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    latencies.sort()
+    print(f"{name}:")
+    print(f"  Allowed requests/sec: {round(allowed_rps, 2)}")
+    print(f"  Rejected requests/sec: {round(len(latencies) / (sum(latencies) / 1000), 2)}")
+    print(f"  Rejection latency p50: {round(statistics.median(latencies), 3)} ms, "
+          f"p99: {round(latencies[int(len(latencies) * 0.99)], 3)} ms")
+
+
+async def main():
+    print(f"Total requests per phase: {TOTAL_REQUESTS}")
+    print("-" * 50)
+    # One limiter for both paths; each run uses its own user ids
+    limiter = build_rate_limiter("token_bucket", TOKEN_BUCKET_PARAMS)
+    await run("Dependency", dependency_app(limiter))
+    await run("ASGI middleware", middleware_app(limiter))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import time
+import uuid
+
+from redis.asyncio.cluster import RedisCluster
+
+from app.core.key_builder import build_user_scoped_rate_limit_key
+from app.core.sliding_window_counter import SlidingWindowCounterRateLimiter
+from app.core.token_bucket import TokenBucketRateLimiter
+from app.database.redis import connect_redis, disconnect_redis, redis_connection
+
+# Rejection-heavy load, as in tests/load_test_same_user.py: a few users hammer
+# their own key far beyond the limit, so nearly every check is rejected.
+# Reports Redis CPU time (used_cpu_sys + used_cpu_user) and bytes written to
+# the replication stream (master_repl_offset, which is also what the AOF
+# receives) per check, summed over the primaries. Rejected checks write nothing,
+# so replication bytes per check should track the admitted fraction.
+USERS = int(os.getenv("BENCH_USERS", "10"))
+CHECKS_PER_USER = int(os.getenv("BENCH_CHECKS_PER_USER", "2000"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "200"))
+
+
+async def primary_counters() -> tuple[float, int]:
+    client = redis_connection.async_client
+    cpu = await client.info("cpu", target_nodes=RedisCluster.PRIMARIES)
+    replication = await client.info("replication", target_nodes=RedisCluster.PRIMARIES)
+    cpu_seconds = sum(node["used_cpu_sys"] + node["used_cpu_user"] for node in cpu.values())
+    repl_bytes = sum(node["master_repl_offset"] for node in replication.values())
+    return cpu_seconds, repl_bytes
+
+
+async def run(name: str, limiter, run_id: str):
+    keys = [build_user_scoped_rate_limit_key(f"bench-{i}", f"{run_id}:{name}") for i in range(USERS)]
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    admitted = 0
+
+    async def one(key: str):
+        nonlocal admitted
+        async with semaphore:
+            allowed = await limiter.is_request_allowed(key)
+            admitted += allowed
+
+    total_checks = USERS * CHECKS_PER_USER
+    cpu_before, repl_before = await primary_counters()
+    start = time.perf_counter()
+    await asyncio.gather(*(one(key) for key in keys for _ in range(CHECKS_PER_USER)))
+    elapsed = time.perf_counter() - start
+    cpu_after, repl_after = await primary_counters()
+
+    print(f"{name}:")
+    print(f"  Checks: {total_checks}, admitted: {admitted} ({admitted / total_checks:.2%}), "
+          f"checks/s: {round(total_checks / elapsed, 2)}")
+    print(f"  Redis CPU per check: {(cpu_after - cpu_before) / total_checks * 1e6:.2f} µs")
+    print(f"  Replication bytes per check: {(repl_after - repl_before) / total_checks:.2f} "
+          f"(per admitted: {(repl_after - repl_before) / max(admitted, 1):.2f})")
+
+    await asyncio.gather(*(redis_connection.async_client.delete(key) for key in keys))
+
+
+async def main():
+    await connect_redis()
+    run_id = uuid.uuid4().hex[:8]
+    print(f"Users: {USERS}, Checks per user: {CHECKS_PER_USER}, Concurrency: {CONCURRENCY}")
+    print("-" * 50)
+    try:
+        client = redis_connection.async_client
+        await run("Token bucket", TokenBucketRateLimiter(
+            tokens_per_second=1, max_tokens=5, redis_client=client, expiry_seconds=10, tokens_per_request=1
+        ), run_id)
+        await run("Sliding window counter", SlidingWindowCounterRateLimiter(
+            window_size_seconds=60, max_requests=10, redis_client=client, expiry_seconds=60
+        ), run_id)
+    finally:
+        await disconnect_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
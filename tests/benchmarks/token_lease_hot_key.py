@@ -0,0 +1,60 @@
+import asyncio
+import os
+import time
+
+from app.core.key_builder import build_user_rate_limit_key
+from app.core.metrics import redis_operations_total
+from app.core.token_bucket import TokenBucketRateLimiter
+from app.core.token_lease import TokenLeaseRateLimiter
+from app.database.redis import connect_redis, disconnect_redis, redis_connection
+
+# Mirrors the load_test_same_user.py hot-key scenario directly against the
+# limiters and reports how many Redis script calls each mode needed.
+TOTAL_CHECKS = int(os.getenv("BENCH_TOTAL_CHECKS", "20000"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "200"))
+USER_ID = "user-123"
+
+
+def redis_calls() -> float:
+    return redis_operations_total.labels(operation="evalsha", status="success")._value.get()
+
+
+async def run(name: str, limiter, key: str):
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one():
+        async with semaphore:
+            return await limiter.is_request_allowed(key)
+
+    calls_before = redis_calls()
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(TOTAL_CHECKS)))
+    elapsed = time.perf_counter() - start
+    calls = redis_calls() - calls_before
+
+    print(f"{name}:")
+    print(f"  Allowed: {results.count(True)}, Rejected: {results.count(False)}")
+    print(f"  Elapsed: {round(elapsed, 2)} seconds")
+    print(f"  Redis script calls: {int(calls)} ({round(calls / elapsed, 2)}/s)")
+
+
+async def main():
+    await connect_redis()
+    limiter_args = dict(redis_client=redis_connection.async_client, tokens_per_second=100,
+                        max_tokens=500, expiry_seconds=10, tokens_per_request=1)
+
+    print(f"Total checks: {TOTAL_CHECKS}, Concurrency: {CONCURRENCY}, User: {USER_ID}")
+    print("-" * 50)
+    lease_limiter = TokenLeaseRateLimiter(**limiter_args, lease_fraction=0.1, lease_ttl_seconds=1.0)
+    try:
+        await run("Token bucket", TokenBucketRateLimiter(**limiter_args),
+                  build_user_rate_limit_key(f"{USER_ID}-direct"))
+        await run("Token bucket with leases", lease_limiter,
+                  build_user_rate_limit_key(f"{USER_ID}-lease"))
+    finally:
+        await lease_limiter.close()
+        await disconnect_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,121 @@
+import asyncio
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+
+# Starts `python -m app.serve` with each worker count in turn and drives
+# /token-bucket from several client processes (so the load generator is not the
+# bottleneck), each user id fresh enough that checks are mostly allowed.
+# Reports req/s and latency per worker count, and how many checks /metrics
+# counted against how many requests were served, which shows whether the
+# Prometheus multiprocess aggregation sees every worker.
+#
+# RATE_LIMITER_BACKEND is passed through (default memory, so no Redis is
+# needed). Throughput only scales up to the cores available to the server and
+# the client processes together.
+WORKER_COUNTS = [int(count) for count in os.getenv("BENCH_WORKERS", "1,2,4").split(",")]
+CLIENT_PROCESSES = int(os.getenv("BENCH_CLIENT_PROCESSES", "4"))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", "32"))
+DURATION_SECONDS = float(os.getenv("BENCH_DURATION_SECONDS", "10"))
+PORT = int(os.getenv("BENCH_PORT", "8765"))
+ENDPOINT = os.getenv("BENCH_ENDPOINT", "/token-bucket")
+USERS = int(os.getenv("BENCH_USERS", "100000"))
+BASE_URL = f"http://127.0.0.1:{PORT}"
+
+
+async def drive(seed: int) -> tuple[int, int, list[float]]:
+    rng = random.Random(seed)
+    served = rejected = 0
+    latencies = []
+    deadline = time.perf_counter() + DURATION_SECONDS
+
+    async def client_loop(client: httpx.AsyncClient):
+        nonlocal served, rejected
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.get(ENDPOINT, headers={"user_id": f"user-{rng.randrange(USERS)}"})
+            latencies.append(time.perf_counter() - start)
+            served += 1
+            rejected += response.status_code == 429
+
+    limits = httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY)
+    async with httpx.AsyncClient(base_url=BASE_URL, limits=limits, timeout=10.0) as client:
+        await asyncio.gather(*(client_loop(client) for _ in range(CONCURRENCY)))
+    return served, rejected, latencies
+
+
+def client_process(seed: int) -> tuple[int, int, list[float]]:
+    return asyncio.run(drive(seed))
+
+
+def wait_until_ready(server: subprocess.Popen, timeout_seconds: float = 30.0) -> None:
+    deadline = time.perf_counter() + timeout_seconds
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            if httpx.get(f"{BASE_URL}/health", timeout=1.0).status_code == 200:
+                # Give the remaining workers time to finish their own startup
+                time.sleep(2)
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become ready")
+
+
+def counted_checks() -> int:
+    total = 0.0
+    for line in httpx.get(f"{BASE_URL}/metrics", timeout=5.0).text.splitlines():
+        if line.startswith("rate_limiter_requests_total{"):
+            total += float(line.rsplit(" ", 1)[1])
+    return round(total)
+
+
+def run(workers: int) -> None:
+    env = {
+        **os.environ,
+        "SERVER_WORKERS": str(workers),
+        "SERVER_HOST": "127.0.0.1",
+        "SERVER_PORT": str(PORT),
+        "RATE_LIMITER_BACKEND": os.getenv("RATE_LIMITER_BACKEND", "memory"),
+    }
+    server = subprocess.Popen([sys.executable, "-m", "app.serve"], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(server)
+        before = counted_checks()
+        start = time.perf_counter()
+        with multiprocessing.Pool(CLIENT_PROCESSES) as pool:
+            results = pool.map(client_process, range(CLIENT_PROCESSES))
+        elapsed = time.perf_counter() - start
+        counted = counted_checks() - before
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    served = sum(result[0] for result in results)
+    rejected = sum(result[1] for result in results)
+    latencies = sorted(latency for result in results for latency in result[2])
+    print(f"Workers: {workers}")
+    print(f"  Requests: {served}, rejected: {rejected}, req/s: {round(served / elapsed, 2)}")
+    print(f"  Latency p50: {latencies[len(latencies) // 2] * 1000:.2f} ms, "
+          f"p99: {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+    print(f"  Checks counted by /metrics: {counted} of {served}")
+
+
+def main():
+    print(f"Endpoint: {ENDPOINT}, Client processes: {CLIENT_PROCESSES}, Concurrency per process: {CONCURRENCY}, "
+          f"Duration: {DURATION_SECONDS}s, CPUs: {os.cpu_count()}")
+    print("-" * 50)
+    for workers in WORKER_COUNTS:
+        run(workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import os
+
+# Settings require a Redis password; unit tests never reach a real Redis
+os.environ.setdefault("REDIS_PASSWORD", "")
+
+import pytest  # noqa: E402
+
+from app.database.redis import redis_connection  # noqa: E402
+from tests.benchmarks.harness import RedisStandIn  # noqa: E402
+
+
+@pytest.fixture
+def stand_in():
+    """In-memory Redis stand-in behind run_script, without a circuit breaker; restored afterwards."""
+    saved = (redis_connection.async_client, redis_connection.read_client, redis_connection.script_shas,
+             redis_connection.batcher, redis_connection.breaker)
+    redis_connection.batcher = None
+    redis_connection.breaker = None
+    yield RedisStandIn().install()
+    (redis_connection.async_client, redis_connection.read_client, redis_connection.script_shas,
+     redis_connection.batcher, redis_connection.breaker) = saved
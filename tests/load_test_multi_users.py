@@ -17,7 +17,8 @@ ALGORITHM = sys.argv[1] if len(sys.argv) > 1 else os.getenv(
 ENDPOINTS = {
     "token-bucket": "/token-bucket",
     "sliding-window": "/sliding-window-counter",
-    "sliding-window-counter": "/sliding-window-counter"
+    "sliding-window-counter": "/sliding-window-counter",
+    "hybrid": "/hybrid"
 }
 
 BASE_URL = os.getenv("BASE_URL", "http://0.0.0.0:80")
@@ -0,0 +1,86 @@
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Get algorithm from command line argument or environment variable
+ALGORITHM = sys.argv[1] if len(sys.argv) > 1 else os.getenv(
+    "RATE_LIMIT_ALGORITHM", "token-bucket")
+
+# Map algorithm names to endpoints
+ENDPOINTS = {
+    "token-bucket": "/token-bucket",
+    "sliding-window": "/sliding-window-counter",
+    "sliding-window-counter": "/sliding-window-counter",
+    "hybrid": "/hybrid"
+}
+
+BASE_URL = os.getenv("BASE_URL", "http://0.0.0.0:80")
+ENDPOINT = ENDPOINTS.get(ALGORITHM, "/token-bucket")
+URL = f"{BASE_URL}{ENDPOINT}"
+
+# Every user has to get this many requests through, retrying on 429
+USERS = 20
+SUCCESSES_PER_USER = 15
+NAIVE_RETRY_DELAY_SECONDS = 0.1
+
+
+async def naive_user(session, user_id):
+    """Retries after a fixed short delay, ignoring Retry-After."""
+    statuses = Counter()
+    while statuses[200] < SUCCESSES_PER_USER:
+        async with session.get(URL, headers={"user_id": user_id}) as resp:
+            statuses[resp.status] += 1
+            if resp.status != 200:
+                await asyncio.sleep(NAIVE_RETRY_DELAY_SECONDS)
+    return statuses
+
+
+async def polite_user(session, user_id):
+    """Waits exactly as long as the Retry-After header asks before retrying."""
+    statuses = Counter()
+    while statuses[200] < SUCCESSES_PER_USER:
+        async with session.get(URL, headers={"user_id": user_id}) as resp:
+            statuses[resp.status] += 1
+            if resp.status != 200:
+                await asyncio.sleep(float(resp.headers.get("Retry-After", NAIVE_RETRY_DELAY_SECONDS)))
+    return statuses
+
+
+async def run(name, client):
+    run_id = f"{name}-{int(time.time())}"
+    connector = aiohttp.TCPConnector(limit=USERS)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.time()
+
+        tasks = [client(session, f"{run_id}-{i}") for i in range(USERS)]
+        results = await asyncio.gather(*tasks)
+
+        elapsed = time.time() - start
+
+    counts = sum(results, Counter())
+    print(f"\n{name} client:")
+    print("  Results:", dict(counts))
+    print(f"  Wasted 429s per success: {round(counts[429] / counts[200], 2)}")
+    print("  Elapsed:", round(elapsed, 2), "seconds")
+
+
+async def main():
+    print(f"Testing endpoint: {URL}")
+    print(f"Algorithm: {ALGORITHM}")
+    print(f"Users: {USERS}, Successes per user: {SUCCESSES_PER_USER}, "
+          f"Naive retry delay: {NAIVE_RETRY_DELAY_SECONDS}s")
+    print("-" * 50)
+
+    await run("Naive", naive_user)
+    await run("Retry-After", polite_user)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
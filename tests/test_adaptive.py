@@ -0,0 +1,118 @@
+import pytest
+
+from app.config import settings
+from app.core import adaptive
+from app.core.adaptive import AdaptiveLimitController
+from app.core.in_memory import InMemoryScriptStore, InMemoryTokenBucketRateLimiter
+from app.core.policies import PolicyEngine
+from app.database.redis import redis_connection
+
+POLICY = "adaptive-test"
+
+
+class FakeScriptClock:
+    def __init__(self):
+        self.now_ms = 1_000_000_000
+
+    def __call__(self) -> int:
+        return self.now_ms
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeScriptClock()
+    monkeypatch.setattr(adaptive, "script_clock_ms", fake)
+    return fake
+
+
+@pytest.fixture
+def memory_backend(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limiter_backend", "memory")
+    monkeypatch.setattr(redis_connection, "breaker", None)
+
+
+def make_controller() -> AdaptiveLimitController:
+    # Check latency never counts as slow here; overload comes from observed upstream latency
+    return AdaptiveLimitController(enabled=True, interval_seconds=1, upstream_latency_target_seconds=0.1,
+                                   check_latency_target_seconds=60, slow_share=0.5, min_samples=2,
+                                   decrease_factor=0.5, increase_step=0.25, min_multiplier=0.2)
+
+
+def make_limiter() -> InMemoryTokenBucketRateLimiter:
+    limiter = InMemoryTokenBucketRateLimiter(tokens_per_second=10, max_tokens=10, expiry_seconds=60,
+                                             tokens_per_request=1)
+    limiter.fallback = InMemoryTokenBucketRateLimiter(tokens_per_second=5, max_tokens=4, expiry_seconds=60,
+                                                      tokens_per_request=1)
+    return limiter
+
+
+def make_engine(limiter: InMemoryTokenBucketRateLimiter) -> PolicyEngine:
+    engine = PolicyEngine(path="", build_limiter=lambda algorithm, params: limiter)
+    engine.index, _ = engine.compile([{"name": POLICY, "route": "/adaptive", "algorithm": "token_bucket"}])
+    return engine
+
+
+def overload(controller: AdaptiveLimitController) -> None:
+    for _ in range(2):
+        controller.observe(POLICY, 1.0)
+
+
+async def step(controller: AdaptiveLimitController, engine: PolicyEngine, clock: FakeScriptClock,
+               overloaded: bool) -> float:
+    if overloaded:
+        overload(controller)
+    clock.now_ms += 1000
+    return (await controller.step(engine))[POLICY]
+
+
+@pytest.mark.asyncio
+async def test_overload_cuts_the_multiplier_and_recovery_adds_to_it_up_to_one(memory_backend, clock):
+    controller, engine = make_controller(), make_engine(make_limiter())
+
+    multipliers = [await step(controller, engine, clock, overloaded) for overloaded in (True, True, True, False,
+                                                                                          False, False, False)]
+
+    # Halved down to min_multiplier, then back up in steps of 0.25, never past 1
+    assert multipliers == pytest.approx([0.5, 0.25, 0.2, 0.45, 0.7, 0.95, 1.0])
+
+
+@pytest.mark.asyncio
+async def test_script_steps_once_per_interval_for_all_workers(memory_backend, clock):
+    first, second = make_controller(), make_controller()
+    first._store = second._store = InMemoryScriptStore()
+    engine = make_engine(make_limiter())
+
+    assert await step(first, engine, clock, overloaded=True) == 0.5
+    clock.now_ms -= 500
+    # Within the interval: no step, but the report is kept for the next one
+    assert await step(second, engine, clock, overloaded=True) == 0.5
+    clock.now_ms -= 500
+    assert await step(first, engine, clock, overloaded=False) == 0.25
+
+
+@pytest.mark.asyncio
+async def test_limits_are_scaled_and_never_raised_above_the_configured_ones(memory_backend, clock):
+    limiter = make_limiter()
+    controller, engine = make_controller(), make_engine(limiter)
+
+    await step(controller, engine, clock, overloaded=True)
+    assert (limiter.max_tokens, limiter.tokens_per_second) == (5, 5)
+    # The fallback follows, from its own configured limits
+    assert (limiter.fallback.max_tokens, limiter.fallback.tokens_per_second) == (2, 2.5)
+
+    for _ in range(4):
+        await step(controller, engine, clock, overloaded=False)
+    assert (limiter.max_tokens, limiter.tokens_per_second) == (10, 10)
+    assert (limiter.fallback.max_tokens, limiter.fallback.tokens_per_second) == (4, 5)
+
+
+@pytest.mark.asyncio
+async def test_worker_steps_locally_while_redis_is_unreachable(stand_in, clock):
+    stand_in.failure = "refused"
+    limiter = make_limiter()
+    controller, engine = make_controller(), make_engine(limiter)
+
+    assert await step(controller, engine, clock, overloaded=True) == 0.5
+    assert await step(controller, engine, clock, overloaded=False) == 0.75
+    assert stand_in.calls == 2
+    assert limiter.limit_multiplier == 0.75
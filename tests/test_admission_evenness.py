@@ -0,0 +1,25 @@
+from collections import Counter
+
+import pytest
+
+from tests.benchmarks.admission_evenness import DURATION_SECONDS, admissions
+
+BIN_MS = 100
+
+
+def busiest_bin(admitted_at: list[int]) -> int:
+    return max(Counter(elapsed_ms // BIN_MS for elapsed_ms in admitted_at).values())
+
+
+@pytest.mark.parametrize("max_tokens", [1, 10])
+def test_millisecond_clock_spreads_a_ten_per_second_limit_evenly(max_tokens):
+    admitted_at = admissions(10, max_tokens, whole_seconds=False)
+
+    # One token refills every 100 ms, so once the burst is spent no 100 ms bin holds two admissions
+    assert busiest_bin(admitted_at) == 1
+    assert len(admitted_at) >= 10 * DURATION_SECONDS - 1
+
+
+def test_whole_second_clock_admits_a_seconds_refill_at_once():
+    # The regression the millisecond clock fixes: the whole refill lands in the first bin of each second
+    assert busiest_bin(admissions(10, 10, whole_seconds=True)) == 10
@@ -0,0 +1,182 @@
+import asyncio
+
+import pytest
+import redis
+
+from app.core.in_memory import InMemoryTokenBucketRateLimiter
+from app.core.token_bucket import TokenBucketRateLimiter
+from app.database.batching import BatchQueueFullError, BatchTimeoutError, ScriptBatcher
+from app.database.redis import redis_connection
+
+
+class FakeSlotMap:
+    """Keys on node "a" or "b" by their first character."""
+
+    def __init__(self):
+        self.errors: list[Exception] = []
+
+    def node_for_key(self, key: str) -> str:
+        return key[0]
+
+    def observe_error(self, error: Exception) -> None:
+        self.errors.append(error)
+
+
+class FakePipeline:
+    def __init__(self, client, transaction: bool):
+        self.client = client
+        self.transaction = transaction
+        self.commands: list[tuple] = []
+
+    def evalsha(self, sha: str, numkeys: int, *keys_and_args):
+        self.commands.append((sha, keys_and_args[0]))
+
+    async def execute(self, raise_on_error: bool = True) -> list:
+        self.client.pipelines.append(self)
+        await self.client.released.wait()
+        if self.client.failure is not None:
+            raise self.client.failure
+        return [redis.exceptions.NoScriptError("NOSCRIPT") if sha in self.client.missing
+                else redis.exceptions.ResponseError("WRONGTYPE") if key.endswith("wrongtype")
+                else [sha, key] for sha, key in self.commands]
+
+
+class FakeClient:
+    """Replies to each EVALSHA with ``[sha, first key]``; ``released`` holds replies until set."""
+
+    def __init__(self):
+        self.pipelines: list[FakePipeline] = []
+        self.released = asyncio.Event()
+        self.released.set()
+        self.failure: Exception | None = None
+        self.missing: set[str] = set()
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self, transaction)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.async_client = FakeClient()
+        self.script_shas = {"token_bucket": "sha-token-bucket"}
+        self.slot_map = FakeSlotMap()
+        self.reloads: list[tuple] = []
+
+    async def evalsha_with_reload(self, script_name, keys, *args):
+        self.reloads.append((script_name, *keys, *args))
+        return ["reloaded", keys[0]]
+
+
+def make_batcher(connection: FakeConnection, window_seconds: float = 0.01, max_batch_size: int = 100,
+                 max_queue_depth: int = 100, max_wait_seconds: float = 1.0) -> ScriptBatcher:
+    return ScriptBatcher(connection, connection.evalsha_with_reload, window_seconds=window_seconds,
+                         max_batch_size=max_batch_size, max_queue_depth=max_queue_depth,
+                         max_wait_seconds=max_wait_seconds)
+
+
+@pytest.mark.asyncio
+async def test_calls_within_the_window_share_one_pipeline_per_node():
+    connection = FakeConnection()
+    batcher = make_batcher(connection)
+
+    results = await asyncio.gather(*(batcher.submit("token_bucket", [key], 1) for key in ("a1", "a2", "b1")))
+
+    assert results == [["sha-token-bucket", key] for key in ("a1", "a2", "b1")]
+    assert sorted(pipeline.commands for pipeline in connection.async_client.pipelines) == [
+        [("sha-token-bucket", "a1"), ("sha-token-bucket", "a2")], [("sha-token-bucket", "b1")]]
+    assert all(pipeline.transaction is False for pipeline in connection.async_client.pipelines)
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_without_waiting_for_the_window():
+    connection = FakeConnection()
+    batcher = make_batcher(connection, window_seconds=60, max_batch_size=2)
+
+    results = await asyncio.wait_for(
+        asyncio.gather(*(batcher.submit("token_bucket", [key]) for key in ("a1", "a2"))), 1)
+
+    assert [result[1] for result in results] == ["a1", "a2"]
+    assert len(connection.async_client.pipelines) == 1
+
+
+@pytest.mark.asyncio
+async def test_submit_is_rejected_while_the_queue_is_full():
+    connection = FakeConnection()
+    connection.async_client.released.clear()
+    batcher = make_batcher(connection, max_queue_depth=2)
+    waiting = [asyncio.create_task(batcher.submit("token_bucket", [key])) for key in ("a1", "a2")]
+    await asyncio.sleep(0)
+
+    with pytest.raises(BatchQueueFullError) as excinfo:
+        await batcher.submit("token_bucket", ["a3"])
+    # Surfaces as a Redis outage, so limiters fall back rather than fail open
+    assert isinstance(excinfo.value, redis.exceptions.ConnectionError)
+
+    connection.async_client.released.set()
+    assert len(await asyncio.gather(*waiting)) == 2
+
+
+@pytest.mark.asyncio
+async def test_call_without_a_reply_by_the_deadline_times_out():
+    connection = FakeConnection()
+    connection.async_client.released.clear()
+    batcher = make_batcher(connection, window_seconds=0.001, max_wait_seconds=0.05)
+
+    with pytest.raises(BatchTimeoutError) as excinfo:
+        await batcher.submit("token_bucket", ["a1"])
+    assert isinstance(excinfo.value, redis.exceptions.TimeoutError)
+    assert batcher._outstanding == 0
+
+    connection.async_client.released.set()
+    await batcher.close()
+
+
+@pytest.mark.asyncio
+async def test_each_caller_gets_its_own_result_or_error():
+    connection = FakeConnection()
+    batcher = make_batcher(connection)
+
+    results = await asyncio.gather(*(batcher.submit("token_bucket", [key]) for key in ("a1", "a-wrongtype")),
+                                   return_exceptions=True)
+
+    assert results[0] == ["sha-token-bucket", "a1"]
+    assert isinstance(results[1], redis.exceptions.ResponseError)
+    assert connection.slot_map.errors == [results[1]]
+
+
+@pytest.mark.asyncio
+async def test_failed_pipeline_fails_every_call_in_it():
+    connection = FakeConnection()
+    connection.async_client.failure = redis.exceptions.ConnectionError("Connection refused")
+    batcher = make_batcher(connection)
+
+    results = await asyncio.gather(*(batcher.submit("token_bucket", [key]) for key in ("a1", "a2")),
+                                   return_exceptions=True)
+
+    assert results == [connection.async_client.failure] * 2
+    assert connection.slot_map.errors == [connection.async_client.failure]
+
+
+@pytest.mark.asyncio
+async def test_missing_script_is_reloaded_and_the_call_retried_alone():
+    connection = FakeConnection()
+    connection.async_client.missing.add("sha-token-bucket")
+    batcher = make_batcher(connection)
+
+    assert await batcher.submit("token_bucket", ["a1"], 5) == ["reloaded", "a1"]
+    assert connection.reloads == [("token_bucket", "a1", 5)]
+    assert connection.slot_map.errors == []
+
+
+@pytest.mark.asyncio
+async def test_limiter_falls_back_when_the_batch_queue_is_full(stand_in):
+    connection = FakeConnection()
+    redis_connection.batcher = make_batcher(connection, max_queue_depth=0)
+    limiter = TokenBucketRateLimiter(tokens_per_second=0.001, max_tokens=100, redis_client=None,
+                                     expiry_seconds=3600, tokens_per_request=1)
+    limiter.fallback = InMemoryTokenBucketRateLimiter(tokens_per_second=0.001, max_tokens=1, expiry_seconds=3600,
+                                                      tokens_per_request=1)
+
+    assert (await limiter.check_request("rate_limit:{user:batch-test}")).allowed
+    assert not (await limiter.check_request("rate_limit:{user:batch-test}")).allowed
+    assert connection.async_client.pipelines == []
@@ -0,0 +1,192 @@
+import asyncio
+
+import pytest
+import redis
+
+from app.core.in_memory import InMemoryTokenBucketRateLimiter
+from app.core.token_bucket import TokenBucketRateLimiter
+from app.database.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from app.database.redis import redis_connection, run_script
+
+KEY = "rate_limit:{user:breaker-test}"
+FAST, SLOW = 0.001, 0.5
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_breaker(clock: FakeClock, half_open_probes: int = 2) -> CircuitBreaker:
+    return CircuitBreaker(window_size=10, minimum_calls=4, failure_rate_threshold=0.5, slow_call_seconds=0.1,
+                          slow_call_rate_threshold=0.5, open_seconds=5, half_open_probes=half_open_probes,
+                          clock=clock)
+
+
+def record(breaker: CircuitBreaker, duration_seconds: float = FAST, failed: bool = False) -> None:
+    breaker.record(breaker.acquire(), duration_seconds, failed)
+
+
+def open_breaker(breaker: CircuitBreaker) -> None:
+    for _ in range(4):
+        record(breaker, failed=True)
+    assert breaker.state == OPEN
+
+
+def test_opens_once_the_failure_rate_reaches_the_threshold():
+    breaker = make_breaker(FakeClock())
+
+    for failed in (True, False, True):
+        record(breaker, failed=failed)
+    # Two of three failed, but fewer than minimum_calls were recorded
+    assert breaker.state == CLOSED
+
+    record(breaker, failed=False)
+    assert breaker.state == OPEN
+
+
+def test_opens_once_the_slow_call_rate_reaches_the_threshold():
+    breaker = make_breaker(FakeClock())
+
+    for duration_seconds in (SLOW, FAST, FAST, FAST):
+        record(breaker, duration_seconds)
+    assert breaker.state == CLOSED
+
+    record(breaker, SLOW)
+    record(breaker, SLOW)
+    assert breaker.state == OPEN
+
+
+def test_open_breaker_short_circuits_until_open_seconds_pass():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    open_breaker(breaker)
+
+    clock.now += 4.9
+    assert breaker.acquire() is None
+    assert breaker.state == OPEN
+
+    clock.now += 0.1
+    assert breaker.acquire() is not None
+    assert breaker.state == HALF_OPEN
+
+
+def test_half_open_closes_after_every_probe_succeeds():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    open_breaker(breaker)
+    clock.now += 5
+
+    probes = [breaker.acquire(), breaker.acquire()]
+    # Only half_open_probes calls go through while probing
+    assert breaker.acquire() is None
+
+    breaker.record(probes[0], FAST, failed=False)
+    assert breaker.state == HALF_OPEN
+    breaker.record(probes[1], FAST, failed=False)
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.parametrize("duration_seconds, failed", [(FAST, True), (SLOW, False)])
+def test_failed_or_slow_probe_reopens(duration_seconds, failed):
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    open_breaker(breaker)
+    clock.now += 5
+
+    breaker.record(breaker.acquire(), duration_seconds, failed)
+    assert breaker.state == OPEN
+    assert breaker.acquire() is None
+
+
+def test_outcomes_from_a_stale_generation_are_ignored():
+    clock = FakeClock()
+    breaker = make_breaker(clock, half_open_probes=1)
+    stale = breaker.acquire()
+    open_breaker(breaker)
+    clock.now += 5
+
+    probe = breaker.acquire()
+    # A call started while closed fails late; it says nothing about the probe
+    breaker.record(stale, SLOW, failed=True)
+    assert breaker.state == HALF_OPEN
+
+    breaker.record(probe, FAST, failed=False)
+    assert breaker.state == CLOSED
+    breaker.record(stale, SLOW, failed=True)
+    assert breaker.snapshot()["recent_calls"] == 0
+
+
+@pytest.mark.asyncio
+async def test_limiter_decides_with_its_fallback_while_the_breaker_is_open(stand_in):
+    redis_connection.breaker = make_breaker(FakeClock())
+    limiter = TokenBucketRateLimiter(tokens_per_second=0.001, max_tokens=100, redis_client=stand_in,
+                                     expiry_seconds=3600, tokens_per_request=1)
+    limiter.fallback = InMemoryTokenBucketRateLimiter(tokens_per_second=0.001, max_tokens=5, expiry_seconds=3600,
+                                                      tokens_per_request=1)
+    stand_in.failure = "refused"
+
+    decisions = [await limiter.check_request(KEY) for _ in range(6)]
+
+    assert redis_connection.breaker.state == OPEN
+    # Redis saw only the calls that opened the breaker
+    assert stand_in.calls == 4
+    assert [decision.allowed for decision in decisions] == [True] * 5 + [False]
+    assert decisions[-1].limit == 5
+
+
+@pytest.mark.asyncio
+async def test_fallback_charges_costs_above_its_share_as_the_whole_share():
+    limiter = TokenBucketRateLimiter(tokens_per_second=0.001, max_tokens=9, redis_client=None, expiry_seconds=3600,
+                                     tokens_per_request=1)
+    # One of three workers' share of the bucket
+    limiter.fallback = InMemoryTokenBucketRateLimiter(tokens_per_second=0.001, max_tokens=3, expiry_seconds=3600,
+                                                      tokens_per_request=1)
+
+    assert (await limiter.degraded_check(KEY, 6)).allowed
+    assert not (await limiter.degraded_check(KEY, 6)).allowed
+
+
+def test_released_probe_frees_its_slot():
+    clock = FakeClock()
+    breaker = make_breaker(clock, half_open_probes=1)
+    open_breaker(breaker)
+    clock.now += 5
+
+    breaker.release(breaker.acquire())
+    probe = breaker.acquire()
+    assert probe is not None
+
+    breaker.record(probe, FAST, failed=False)
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.asyncio
+async def test_cancelled_call_is_not_recorded(stand_in):
+    redis_connection.breaker = make_breaker(FakeClock())
+    stand_in.failure = "timeout"
+    call = asyncio.create_task(run_script("token_bucket", [KEY], 1, 1, 1, 0, 3600))
+    await asyncio.sleep(0)
+    call.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await call
+    assert redis_connection.breaker.snapshot()["recent_calls"] == 0
+
+
+@pytest.mark.asyncio
+async def test_script_error_replies_are_not_failures(stand_in, monkeypatch):
+    async def error_reply(*args):
+        raise redis.exceptions.ResponseError("ERR user_script:1: bad argument")
+
+    redis_connection.breaker = make_breaker(FakeClock())
+    monkeypatch.setattr(stand_in, "evalsha", error_reply)
+
+    for _ in range(4):
+        with pytest.raises(redis.exceptions.ResponseError):
+            await run_script("token_bucket", [KEY], 1, 1, 1, 0, 3600)
+    assert redis_connection.breaker.state == CLOSED
+    assert redis_connection.breaker.snapshot()["failure_rate"] == 0.0
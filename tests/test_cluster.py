@@ -0,0 +1,19 @@
+import pytest
+
+from app.database.cluster import key_hash_slot
+
+
+def test_slot_matches_the_cluster_spec():
+    # CRC16/XMODEM("123456789") == 0x31C3
+    assert key_hash_slot("123456789") == 0x31C3
+    assert key_hash_slot(b"123456789") == 0x31C3
+
+
+@pytest.mark.parametrize("key, hashed", [
+    ("{user1000}.following", "user1000"),
+    ("foo{}{bar}", "foo{}{bar}"),
+    ("foo{{bar}}zap", "{bar"),
+    ("foo{bar}{zap}", "bar"),
+])
+def test_only_the_first_non_empty_hash_tag_is_hashed(key, hashed):
+    assert key_hash_slot(key) == key_hash_slot(hashed)
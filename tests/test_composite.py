@@ -0,0 +1,105 @@
+import pytest
+import redis
+
+from app.core.in_memory import InMemoryCompositeTokenBucketRateLimiter
+from app.database.cluster import key_hash_slot
+
+USER = {"name": "user", "scope": "user", "tokens_per_second": 0.001, "max_tokens": 2}
+TENANT = {"name": "tenant", "scope": "tenant", "tokens_per_second": 0.001, "max_tokens": 5}
+GLOBAL = {"name": "global", "scope": "global", "tokens_per_second": 0.001, "max_tokens": 100}
+
+
+class CountingLimiter(InMemoryCompositeTokenBucketRateLimiter):
+    def __init__(self, tiers):
+        super().__init__(tiers=tiers)
+        self.calls = []
+
+    async def _run_script(self, script_name, keys, *args):
+        self.calls.append(script_name)
+        return await super()._run_script(script_name, keys, *args)
+
+
+@pytest.mark.parametrize("tiers", [[USER, TENANT, GLOBAL], [USER, TENANT], [TENANT, GLOBAL], [USER]])
+def test_tiers_of_one_request_share_a_hash_slot(tiers):
+    keys = CountingLimiter(tiers).keys_for("api", "alice", "acme")
+    assert len({key_hash_slot(key) for key in keys}) == 1
+
+
+def test_users_of_a_tenant_share_its_slot_without_a_global_tier():
+    limiter = CountingLimiter([USER, TENANT])
+    slots = {key_hash_slot(key) for user in ("alice", "bob") for key in limiter.keys_for("api", user, "acme")}
+    assert len(slots) == 1
+    assert limiter.keys_for("api", "alice", "acme")[0] != limiter.keys_for("api", "bob", "acme")[0]
+
+
+@pytest.mark.asyncio
+async def test_all_tiers_are_decided_by_one_chain_call():
+    limiter = CountingLimiter([USER, TENANT, GLOBAL])
+    keys = limiter.keys_for("api", "alice", "acme")
+
+    assert (await limiter.check(keys)).allowed
+    assert (await limiter.check(keys)).allowed
+    decision = await limiter.check(keys)
+
+    assert not decision.allowed
+    assert decision.rejected_tier == "user"
+    assert limiter.calls == ["token_bucket_chain"] * 3
+
+
+@pytest.mark.asyncio
+async def test_request_without_any_keyed_tier_is_allowed():
+    limiter = CountingLimiter([TENANT])
+    keys = limiter.keys_for("api", "alice", None)
+
+    assert keys == [None]
+    assert (await limiter.check(keys)).allowed
+    assert limiter.calls == []
+
+
+@pytest.mark.asyncio
+async def test_cross_slot_reservations_are_refunded_when_any_slot_rejects():
+    limiter = CountingLimiter([USER, {**GLOBAL, "max_tokens": 3}])
+    alice, bob = "rate_limit:{user:alice}:api", "rate_limit:{user:bob}:api"
+    assert (await limiter.check_request(alice, "api")).allowed
+    assert (await limiter.check_request(alice, "api")).allowed
+    assert (await limiter.check_request(bob, "api")).allowed
+    limiter.calls.clear()
+
+    decision = await limiter.check_request(bob, "api")
+
+    assert not decision.allowed
+    assert decision.rejected_tier == "global"
+    # One reservation per slot, then the admitted user tier gets its token back
+    assert limiter.calls == ["token_bucket_chain", "token_bucket_chain", "token_bucket_lease"]
+    bob_tokens = limiter.store._token_buckets[f"{bob}:user"].tokens
+    assert float(bob_tokens) == pytest.approx(1, abs=0.01)
+
+
+@pytest.mark.asyncio
+async def test_global_tiers_are_scoped_by_policy():
+    limiter = CountingLimiter([{**GLOBAL, "max_tokens": 1}])
+
+    assert (await limiter.check_request("rate_limit:{user:alice}:api", "api")).allowed
+    assert (await limiter.check_request("rate_limit:{user:alice}:admin", "admin")).allowed
+    assert not (await limiter.check_request("rate_limit:{user:bob}:api", "api")).allowed
+    # The same bucket keys_for gives the policy's global tier
+    assert not (await limiter.check(limiter.keys_for("api", "carol", None))).allowed
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error, degraded", [(redis.exceptions.ConnectionError("Connection refused"), True),
+                                             (ValueError("bad reply"), False)])
+async def test_only_redis_errors_use_the_fallback(monkeypatch, error, degraded):
+    limiter = CountingLimiter([USER])
+    limiter.fallback = CountingLimiter([{**USER, "max_tokens": 1}])
+    keys = limiter.keys_for("api", "alice", None)
+
+    async def failing_script(*args):
+        raise error
+
+    monkeypatch.setattr(limiter, "_run_script", failing_script)
+    decisions = [await limiter.check(keys) for _ in range(2)]
+
+    # The fallback holds one token; other errors fail open without it
+    assert [decision.allowed for decision in decisions] == ([True, False] if degraded else [True, True])
+    assert limiter.fallback.calls == (["token_bucket_chain"] * 2 if degraded else [])
@@ -0,0 +1,18 @@
+import pytest
+from pydantic import ValidationError
+
+from app.config import Settings
+
+
+def test_worker_counts_default_to_every_worker_in_the_deployment():
+    config = Settings(server_replicas=2, server_workers=4)
+
+    assert config.circuit_breaker_fallback_worker_count == 8
+    assert config.hybrid_worker_count == 8
+
+
+@pytest.mark.parametrize("name", ["circuit_breaker_fallback_worker_count", "hybrid_worker_count"])
+def test_worker_count_below_one_containers_workers_is_rejected(name):
+    assert getattr(Settings(server_workers=4, **{name: 4}), name) == 4
+    with pytest.raises(ValidationError, match=name):
+        Settings(server_workers=4, **{name: 3})
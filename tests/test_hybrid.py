@@ -0,0 +1,162 @@
+import pytest
+
+from app.core import hybrid
+from app.core.hybrid import HybridRateLimiter
+
+KEY = "rate_limit:{user:hybrid-test}"
+WINDOW_SECONDS = 10
+START = 1_000_000.0
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = START
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeTime()
+    monkeypatch.setattr(hybrid, "time", fake)
+    return fake
+
+
+def hybrid_limiter(max_requests: int = 10, worker_count: int = 1, error_bound: float = 0.0,
+                   sync_interval_seconds: float = 3600) -> HybridRateLimiter:
+    # The background syncer sleeps through the test; syncs are driven by hand
+    return HybridRateLimiter(window_size_seconds=WINDOW_SECONDS, max_requests=max_requests,
+                             worker_count=worker_count, sync_interval_seconds=sync_interval_seconds,
+                             error_bound=error_bound)
+
+
+def window_key(offset: int = 0) -> str:
+    return f"{KEY}:hybrid:{int(START // WINDOW_SECONDS) + offset}"
+
+
+def sent_commands(stand_in, command: str) -> int:
+    return sum(1 for pipeline in stand_in.pipelines for queued in pipeline.commands if queued[0] == command)
+
+
+@pytest.mark.asyncio
+async def test_admits_locally_without_calling_redis(stand_in, clock):
+    limiter = hybrid_limiter(max_requests=10)
+
+    decisions = [await limiter.check_request(KEY) for _ in range(11)]
+
+    assert [decision.allowed for decision in decisions] == [True] * 10 + [False]
+    assert decisions[-1].retry_after_seconds > 0
+    assert stand_in.calls == 0
+    await limiter.close()
+
+
+@pytest.mark.asyncio
+async def test_sync_reconciles_deltas_across_workers(stand_in, clock):
+    workers = [hybrid_limiter(max_requests=10, worker_count=2) for _ in range(2)]
+
+    for limiter in workers:
+        assert all([(await limiter.check_request(KEY)).allowed for _ in range(5)])
+        assert not (await limiter.check_request(KEY)).allowed
+    for limiter in workers:
+        await limiter.sync()
+
+    first, second = workers
+    assert stand_in.values[window_key()] == 10
+    assert [limiter._counters[KEY].pending for limiter in workers] == [0, 0]
+    assert second._counters[KEY].global_count == 10
+    assert not (await second.check_request(KEY)).allowed
+
+    # The first worker read the total before the second flushed; a check marks it for refreshing
+    assert first._counters[KEY].global_count == 5
+    await first.check_request(KEY)
+    await first.sync()
+    assert first._counters[KEY].global_count == 11
+    assert not (await first.check_request(KEY)).allowed
+    for limiter in workers:
+        await limiter.close()
+
+
+@pytest.mark.asyncio
+async def test_sync_only_sends_keys_checked_since_the_last_one(stand_in, clock):
+    limiter = hybrid_limiter(max_requests=100)
+    idle_key = "rate_limit:{user:hybrid-idle}"
+    await limiter.check_request(idle_key)
+    await limiter.check_request(KEY)
+    await limiter.sync()
+    calls = stand_in.calls
+
+    # Nothing checked: no round trip at all
+    await limiter.sync()
+    assert stand_in.calls == calls
+
+    await limiter.check_request(KEY)
+    await limiter.sync()
+    assert stand_in.pipelines[-1].transaction is False
+    assert [command[1] for command in stand_in.pipelines[-1].commands] == [window_key()]
+    # The window's TTL is set on its first flush only
+    assert sent_commands(stand_in, "expire") == 2
+    assert stand_in.values[window_key()] == 2
+    await limiter.close()
+
+
+@pytest.mark.asyncio
+async def test_rejected_key_refreshes_its_total_without_writing(stand_in, clock):
+    limiter = hybrid_limiter(max_requests=2)
+    stand_in.values[window_key()] = 2
+
+    assert (await limiter.check_request(KEY)).allowed
+    await limiter.sync()
+    assert not (await limiter.check_request(KEY)).allowed
+    await limiter.sync()
+
+    assert stand_in.pipelines[-1].commands == [("get", window_key())]
+    assert limiter._counters[KEY].global_count == 3
+    await limiter.close()
+
+
+@pytest.mark.asyncio
+async def test_retired_window_deltas_survive_a_failed_sync(stand_in, clock):
+    limiter = hybrid_limiter(max_requests=10)
+    for _ in range(3):
+        assert (await limiter.check_request(KEY)).allowed
+
+    clock.now += WINDOW_SECONDS
+    assert (await limiter.check_request(KEY)).allowed
+    stand_in.failure = "refused"
+    await limiter.sync()
+    assert stand_in.values == {}
+
+    stand_in.failure = None
+    await limiter.sync()
+    assert stand_in.values == {window_key(): 3, window_key(1): 1}
+    assert limiter._retired == []
+
+    # Once flushed and over, a window's counter is forgotten
+    clock.now += WINDOW_SECONDS
+    await limiter.sync()
+    assert KEY not in limiter._counters
+    await limiter.close()
+
+
+@pytest.mark.asyncio
+async def test_workers_stay_within_the_documented_over_admission_bound(stand_in, clock):
+    max_requests, worker_count, error_bound, sync_interval_seconds = 100, 3, 0.1, 0.1
+    requests_per_sync = 200
+    workers = [hybrid_limiter(max_requests=max_requests, worker_count=worker_count, error_bound=error_bound,
+                              sync_interval_seconds=sync_interval_seconds) for _ in range(worker_count)]
+    admitted = 0
+
+    for _ in range(round(WINDOW_SECONDS / sync_interval_seconds) - 1):
+        for i in range(requests_per_sync):
+            admitted += (await workers[i % worker_count].check_request(KEY)).allowed
+            clock.now += sync_interval_seconds / requests_per_sync
+        for limiter in workers:
+            await limiter.sync()
+
+    rate = requests_per_sync / sync_interval_seconds
+    bound = max_requests + min((1 + 2 * error_bound) * max_requests + 2 * worker_count,
+                               2 * rate * sync_interval_seconds)
+    assert max_requests <= admitted <= bound
+    for limiter in workers:
+        await limiter.close()
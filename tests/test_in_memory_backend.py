@@ -0,0 +1,156 @@
+import os
+import random
+import uuid
+
+import pytest
+import pytest_asyncio
+import redis.asyncio as redis_asyncio
+
+from app.core.in_memory import InMemoryScriptStore
+from app.database.redis import SCRIPTS, load_script, redis_connection, run_script
+from tests.benchmarks.differential_replay import random_call
+
+SEEDS = range(8)
+STEPS = 300
+START_MS = 1_700_000_000_000
+# Gaps between calls, in milliseconds; repeats of 0 exercise same-millisecond bursts
+STEP_MS = (0, 0, 0, 1, 37, 250, 1000, 2000, 5000, 30000)
+
+
+def trace_times(rng: random.Random) -> list[int]:
+    now, times = START_MS, []
+    for _ in range(STEPS):
+        now += rng.choice(STEP_MS)
+        times.append(now)
+    return times
+
+
+@pytest_asyncio.fixture
+async def real_redis():
+    """A real Redis with the scripts loaded behind run_script; set TEST_REDIS_URL to run these tests."""
+    url = os.getenv("TEST_REDIS_URL")
+    if not url:
+        pytest.skip("TEST_REDIS_URL is not set")
+
+    saved = (redis_connection.async_client, redis_connection.script_shas, redis_connection.batcher,
+             redis_connection.breaker)
+    client = redis_asyncio.from_url(url)
+    redis_connection.async_client = client
+    redis_connection.script_shas = {}
+    redis_connection.batcher = None
+    redis_connection.breaker = None
+    for script_name in SCRIPTS:
+        await load_script(script_name)
+
+    yield client
+
+    await client.aclose()
+    (redis_connection.async_client, redis_connection.script_shas, redis_connection.batcher,
+     redis_connection.breaker) = saved
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("seed", SEEDS)
+async def test_in_memory_store_matches_the_lua_scripts(real_redis, seed):
+    rng = random.Random(seed)
+    # One hash tag per trace keeps multi-key calls in a single slot
+    tag = uuid.uuid4().hex
+    keys = [f"rate_limit:{{user:{tag}}}:{scope}" for scope in ("user", "tenant", "endpoint")]
+    store = InMemoryScriptStore()
+
+    for now in trace_times(rng):
+        script_name, call_keys, args = random_call(rng, keys, now)
+        redis_reply = await run_script(script_name, call_keys, *args)
+        memory_reply = store.run(script_name, call_keys, *args)
+        assert list(redis_reply) == memory_reply, f"{script_name} keys={call_keys} args={args}"
+
+
+# The properties below hold for the Lua scripts too; they run on the in-memory mirror without Redis
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("script_name", ["token_bucket", "gcra"])
+def test_token_buckets_never_admit_more_than_burst_plus_refill(script_name, seed):
+    rng = random.Random(seed)
+    capacity, rate = rng.randint(1, 10), rng.choice((0.2, 1, 2.5, 3))
+    store = InMemoryScriptStore()
+    admitted = []
+
+    for now in trace_times(rng):
+        cost = rng.randint(1, min(3, capacity))
+        if script_name == "token_bucket":
+            reply = store.run(script_name, ["key"], capacity, rate, now, cost, 3600)
+        else:
+            reply = store.run(script_name, ["key"], round(1e6 / rate), capacity, now, cost)
+        if reply[0] == 1:
+            admitted.append((now, cost))
+
+    for i, (start, _) in enumerate(admitted):
+        taken = 0
+        for end, cost in admitted[i:]:
+            taken += cost
+            assert taken <= capacity + rate * (end - start) / 1000 + 1e-9
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("script_name", ["fixed_window", "sliding_window_counter"])
+def test_window_counters_never_exceed_the_limit_within_a_window(script_name, seed):
+    rng = random.Random(seed)
+    window_seconds, max_requests = rng.choice((1, 5, 60)), rng.randint(1, 10)
+    store = InMemoryScriptStore()
+    per_window: dict[int, int] = {}
+
+    for now in trace_times(rng):
+        if script_name == "fixed_window":
+            reply = store.run(script_name, ["key"], window_seconds, max_requests, now)
+        else:
+            reply = store.run(script_name, ["key"], window_seconds, max_requests, now, 3600)
+        if reply[0] == 1:
+            window = now // (window_seconds * 1000)
+            per_window[window] = per_window.get(window, 0) + 1
+
+    assert all(count <= max_requests for count in per_window.values())
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("bucket_ms", [0, 250])
+def test_sliding_window_log_never_exceeds_the_limit_in_any_trailing_window(bucket_ms, seed):
+    rng = random.Random(seed)
+    window_seconds, max_requests = rng.choice((0.5, 10, 60)), rng.randint(1, 10)
+    window_ms = window_seconds * 1000
+    store = InMemoryScriptStore()
+    admitted = []
+
+    for now in trace_times(rng):
+        if store.run("sliding_window_log", ["key"], window_seconds, max_requests, now, bucket_ms)[0] == 1:
+            admitted.append(now)
+
+    for i, end in enumerate(admitted):
+        in_window = [start for start in admitted[:i + 1] if start > end - window_ms]
+        assert len(in_window) <= max_requests
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_token_bucket_chain_admits_all_tiers_or_none(seed):
+    rng = random.Random(seed)
+    tiers = [(rng.randint(1, 10), rng.choice((0.2, 1, 3)), rng.randint(1, 3)) for _ in range(3)]
+    keys = ["user", "tenant", "global"]
+    store = InMemoryScriptStore()
+    chained = InMemoryScriptStore()
+
+    for now in trace_times(rng):
+        args = [now]
+        for capacity, rate, cost in tiers:
+            args.extend((capacity, rate, cost, 3600))
+        reply = chained.run("token_bucket_chain", keys, *args)
+
+        # Each tier alone, without taking tokens, says whether it could admit
+        fits = [store.run("token_bucket_lease", [key], capacity, rate, now, 0, 0, 3600)[1]
+                for key, (capacity, rate, _) in zip(keys, tiers)]
+        could_admit = all(float(tokens) >= cost for tokens, (_, _, cost) in zip(fits, tiers))
+        assert (reply[0] == 1) == could_admit
+        if reply[0] == 1:
+            for key, (capacity, rate, cost) in zip(keys, tiers):
+                store.run("token_bucket", [key], capacity, rate, now, cost, 3600)
+        else:
+            assert reply[2] > 0
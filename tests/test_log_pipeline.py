@@ -0,0 +1,98 @@
+import logging
+import queue
+
+import pytest
+from prometheus_client import REGISTRY
+
+from app.core import log_pipeline
+from app.core.log_pipeline import NonBlockingQueueHandler, SamplingFilter
+
+
+class FakeMonotonic:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class FakeRandom:
+    def __init__(self, value: float):
+        self.value = value
+
+    def random(self) -> float:
+        return self.value
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeMonotonic()
+    monkeypatch.setattr(log_pipeline, "time", fake)
+    return fake
+
+
+def make_record(name: str = "app.core.token_bucket", level: int = logging.INFO, lineno: int = 10,
+                msg: str = "Request allowed for key: %s") -> logging.LogRecord:
+    return logging.LogRecord(name, level, "/app/core/token_bucket.py", lineno, msg, ("user",), None)
+
+
+def dropped(reason: str) -> float:
+    return REGISTRY.get_sample_value("rate_limiter_log_records_dropped_total", {"reason": reason}) or 0.0
+
+
+def test_records_below_warning_are_sampled(monkeypatch, clock):
+    sampling = SamplingFilter(sample_rate=0.5, overrides={}, max_per_second=0)
+    before = dropped("sampled")
+
+    monkeypatch.setattr(log_pipeline, "random", FakeRandom(0.3))
+    assert sampling.filter(make_record())
+    monkeypatch.setattr(log_pipeline, "random", FakeRandom(0.7))
+    assert not sampling.filter(make_record())
+    # Warnings are never sampled away
+    assert sampling.filter(make_record(level=logging.WARNING))
+    assert dropped("sampled") - before == 1
+
+
+def test_longest_logger_prefix_override_wins(clock):
+    sampling = SamplingFilter(sample_rate=1.0, overrides={"app.core": 0.0, "app.core.gcra": 1.0}, max_per_second=0)
+
+    assert sampling.filter(make_record("app.core.gcra"))
+    assert sampling.filter(make_record("app.core.gcra.detail"))
+    assert not sampling.filter(make_record("app.core.token_bucket"))
+    assert not sampling.filter(make_record("app.core"))
+    # A prefix matches whole logger-name segments only
+    assert sampling.filter(make_record("app.corelib"))
+
+
+def test_each_call_site_is_throttled_and_reports_what_it_suppressed(clock):
+    sampling = SamplingFilter(sample_rate=1.0, overrides={}, max_per_second=2)
+    before = dropped("throttled")
+
+    # Different messages from one call site share its budget
+    kept = [sampling.filter(make_record(msg=f"Request allowed for key: user-{i}")) for i in range(5)]
+    assert kept == [True, True, False, False, False]
+    # Another call site has its own
+    assert sampling.filter(make_record(lineno=20))
+
+    clock.now += 0.5
+    record = make_record()
+    assert sampling.filter(record)
+    assert record.suppressed == 3
+    assert dropped("throttled") - before == 3
+
+    clock.now += 0.5
+    record = make_record()
+    assert sampling.filter(record)
+    assert not hasattr(record, "suppressed")
+
+
+def test_full_queue_drops_records_without_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    before = dropped("queue_full")
+
+    handler.handle(make_record(msg="first"))
+    handler.handle(make_record(msg="second"))
+
+    assert handler.queue.get_nowait().msg == "first"
+    assert handler.queue.empty()
+    assert dropped("queue_full") - before == 1
@@ -0,0 +1,94 @@
+import asyncio
+import random
+
+import pytest
+from prometheus_client import REGISTRY, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from app.core.metrics import LimiterMetrics, MetricsFlusher, MultiprocessCollectorSync, _HistogramBuffer
+
+BUCKETS = (0.001, 0.01, 0.1, 1.0, float("inf"))
+
+
+class _PublicChild:
+    """A histogram child exposing only the public API, like a future prometheus_client might."""
+
+    def __init__(self, child):
+        self.observe = child.observe
+
+
+def histogram_samples(histogram: Histogram) -> dict:
+    return {(sample.name, sample.labels.get("le")): sample.value
+            for family in histogram.collect() for sample in family.samples if not sample.name.endswith("_created")}
+
+
+@pytest.mark.parametrize("public_api_only", [False, True])
+def test_buffered_histogram_matches_direct_observations(public_api_only):
+    direct = Histogram("direct", "direct", ["algorithm"], registry=None, buckets=BUCKETS)
+    buffered = Histogram("buffered", "buffered", ["algorithm"], registry=None, buckets=BUCKETS)
+    child = buffered.labels(algorithm="test")
+    buffer = _HistogramBuffer(_PublicChild(child) if public_api_only else child, BUCKETS)
+    assert buffer.add_counts is not public_api_only
+
+    rng = random.Random(0)
+    for _ in range(1000):
+        value = rng.choice((0.0, 0.001, 0.5, 3.0, rng.random() / 10))
+        direct.labels(algorithm="test").observe(value)
+        buffer.observe(value)
+    buffer.flush()
+
+    expected = {(name.replace("direct", "buffered"), le): value
+                for (name, le), value in histogram_samples(direct).items()}
+    assert histogram_samples(buffered) == pytest.approx(expected)
+
+
+@pytest.mark.asyncio
+async def test_flusher_exports_an_idle_limiters_last_interval():
+    labels = {"algorithm": "idle-test", "endpoint": "idle-test"}
+    metrics = LimiterMetrics(algorithm="idle-test", endpoint="idle-test", flush_interval_ms=60_000)
+    flusher = MetricsFlusher(interval_ms=10)
+    flusher.register(metrics)
+
+    metrics.record_decision("key", True)
+    assert REGISTRY.get_sample_value("rate_limiter_allowed_total", labels) == 0
+
+    flusher.start()
+    await asyncio.sleep(0.05)
+    assert REGISTRY.get_sample_value("rate_limiter_allowed_total", labels) == 1
+
+    await flusher.close()
+
+
+class HotKeys:
+    def __init__(self):
+        self.keys = {}
+
+    def collect(self):
+        family = GaugeMetricFamily("hot_key_checks", "Checks of the hottest keys", labels=["key"])
+        for key, checks in self.keys.items():
+            family.add_metric([key], checks)
+        yield family
+
+
+@pytest.mark.asyncio
+async def test_multiprocess_sync_drops_keys_that_leave_the_top_k(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    hot_keys = HotKeys()
+    sync = MultiprocessCollectorSync(collectors=[hot_keys], interval_seconds=60)
+
+    def exported() -> dict:
+        return {sample.labels["key"]: sample.value
+                for family in MultiProcessCollector(registry=None, path=str(tmp_path)).collect()
+                for sample in family.samples}
+
+    hot_keys.keys = {"a": 5, "b": 3}
+    sync.sample()
+    assert exported() == {"a": 5, "b": 3}
+
+    hot_keys.keys = {"a": 7, "c": 4}
+    sync.sample()
+    assert exported() == {"a": 7, "c": 4}
+
+    await sync.close()
+    assert exported() == {}
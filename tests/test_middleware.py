@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import pytest
+
+from app.api.middleware.rate_limit import RateLimitMiddleware
+from app.core.base import RateLimitDecision
+from app.core.in_memory import InMemoryTokenBucketRateLimiter
+from app.core.policies import LimiterUnavailableError, PolicyEngine
+
+
+def test_rejections_share_one_body_and_carry_their_own_headers():
+    first_start, first_body = RateLimitMiddleware._rejection_response(
+        RateLimitDecision(False, limit=10, remaining=0, reset_seconds=3, retry_after_seconds=2.5), 1)
+    second_start, second_body = RateLimitMiddleware._rejection_response(RateLimitDecision(False), 7)
+
+    assert first_body is second_body
+    assert json.loads(first_body["body"]) == {"detail": "Rate limit exceeded. Please try again later."}
+    assert first_start["status"] == second_start["status"] == 429
+
+    first_headers, second_headers = dict(first_start["headers"]), dict(second_start["headers"])
+    assert first_headers[b"content-length"] == str(len(first_body["body"])).encode()
+    assert first_headers[b"ratelimit-limit"] == b"10"
+    assert first_headers[b"retry-after"] == b"3"
+    assert b"ratelimit-limit" not in second_headers
+    assert second_headers[b"retry-after"] == b"7"
+
+
+class Upstream:
+    """ASGI app answering 200 and recording the scopes it was called with."""
+
+    def __init__(self):
+        self.scopes = []
+
+    async def __call__(self, scope, receive, send):
+        self.scopes.append(scope)
+        if scope["type"] == "http":
+            await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+            await send({"type": "http.response.body", "body": b"ok"})
+
+
+class FlakyBuilder:
+    """Builds in-memory token buckets, failing ``failures`` times first as if Redis were not connected."""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+
+    def __call__(self, algorithm: str, params: dict) -> InMemoryTokenBucketRateLimiter:
+        if self.failures:
+            self.failures -= 1
+            raise LimiterUnavailableError("Redis client not initialized")
+        return InMemoryTokenBucketRateLimiter(**params)
+
+
+async def make_middleware(tmp_path, builder=None, reload_interval_seconds: float = 0.0):
+    path = tmp_path / "policies.yaml"
+    path.write_text("""
+rules:
+  - name: limited
+    route: /limited
+    algorithm: token_bucket
+    params: {tokens_per_second: 0.001, max_tokens: 2, expiry_seconds: 60, tokens_per_request: 1}
+""")
+    engine = PolicyEngine(path=str(path), build_limiter=builder or FlakyBuilder(),
+                          reload_interval_seconds=reload_interval_seconds)
+    await engine.load()
+    upstream = Upstream()
+    return RateLimitMiddleware(upstream, engine), upstream
+
+
+async def request(middleware, path: str, user_id=None, scope_type: str = "http") -> list[dict]:
+    headers = [(b"user_id", user_id.encode())] if user_id else []
+    scope = {"type": scope_type, "path": path, "method": "GET", "headers": headers}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    await middleware(scope, receive, send)
+    return sent
+
+
+@pytest.mark.asyncio
+async def test_unmatched_paths_and_other_scopes_pass_through(tmp_path):
+    middleware, upstream = await make_middleware(tmp_path)
+
+    sent = await request(middleware, "/unlimited")
+    await request(middleware, "/limited", scope_type="websocket")
+
+    assert [scope["type"] for scope in upstream.scopes] == ["http", "websocket"]
+    assert sent[0]["status"] == 200
+    assert not any(name.startswith(b"ratelimit-") for name, _ in sent[0]["headers"])
+    await middleware.engine.close()
+
+
+@pytest.mark.asyncio
+async def test_missing_user_id_is_a_bad_request(tmp_path):
+    middleware, upstream = await make_middleware(tmp_path)
+
+    start, body = await request(middleware, "/limited")
+
+    assert start["status"] == 400
+    assert json.loads(body["body"]) == {"detail": "user_id header is required"}
+    assert upstream.scopes == []
+    await middleware.engine.close()
+
+
+@pytest.mark.asyncio
+async def test_allowed_responses_carry_rate_limit_headers(tmp_path):
+    middleware, upstream = await make_middleware(tmp_path)
+
+    responses = [await request(middleware, "/limited", user_id="alice") for _ in range(3)]
+
+    first_headers = dict(responses[0][0]["headers"])
+    assert first_headers[b"content-type"] == b"text/plain"
+    assert (first_headers[b"ratelimit-limit"], first_headers[b"ratelimit-remaining"]) == (b"2", b"1")
+    assert [sent[0]["status"] for sent in responses] == [200, 200, 429]
+    assert len(upstream.scopes) == 2
+    await middleware.engine.close()
+
+
+@pytest.mark.asyncio
+async def test_limiters_that_failed_to_build_at_startup_are_retried(tmp_path):
+    middleware, upstream = await make_middleware(tmp_path, FlakyBuilder(failures=1), reload_interval_seconds=0.01)
+
+    # Skipped while Redis was not connected: the route is not limited yet
+    assert b"ratelimit-limit" not in dict((await request(middleware, "/limited", user_id="bob"))[0]["headers"])
+
+    middleware.engine.start_watching()
+    await asyncio.sleep(0.05)
+
+    assert dict((await request(middleware, "/limited", user_id="bob"))[0]["headers"])[b"ratelimit-limit"] == b"2"
+    await middleware.engine.close()
@@ -0,0 +1,242 @@
+import asyncio
+import os
+
+import pytest
+
+from app.core.base import RateLimiterStrategy
+from app.core.policies import LimiterUnavailableError, PolicyEngine, RequestCost
+
+RULES = """
+rules:
+  - name: token-bucket
+    route: /token-bucket
+    algorithm: token_bucket
+    params: {{max_tokens: {max_tokens}}}
+  - name: gcra
+    route: /gcra
+    algorithm: gcra
+    params: {{burst: 5}}
+  - name: hybrid
+    route: /hybrid
+    algorithm: hybrid
+    params: {{max_requests: 10}}
+"""
+
+
+class FakeLimiter(RateLimiterStrategy):
+    def __init__(self, algorithm: str, params: dict):
+        self.algorithm = algorithm
+        self.params = params
+        self.closed = False
+
+    async def is_request_allowed(self, key: str) -> bool:
+        return True
+
+    async def close(self):
+        self.closed = True
+
+
+class Builder:
+    """Builds fake limiters, failing for hybrid like the memory backend does."""
+
+    def __init__(self):
+        self.built: list[FakeLimiter] = []
+
+    def __call__(self, algorithm: str, params: dict) -> FakeLimiter:
+        if algorithm == "hybrid":
+            raise ValueError("The hybrid limiter needs the redis backend")
+        limiter = FakeLimiter(algorithm, params)
+        self.built.append(limiter)
+        return limiter
+
+
+def write_rules(path, max_tokens: int, mtime: float) -> None:
+    path.write_text(RULES.format(max_tokens=max_tokens))
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.mark.asyncio
+async def test_skipped_rules_do_not_reload_the_file_until_it_changes(tmp_path):
+    path = tmp_path / "policies.yaml"
+    write_rules(path, max_tokens=5, mtime=1_000_000)
+    builder = Builder()
+    engine = PolicyEngine(path=str(path), build_limiter=builder, reload_interval_seconds=0.01)
+
+    await engine.load()
+    assert [policy.name for policy in engine.index.policies] == ["token-bucket", "gcra"]
+
+    engine.start_watching()
+    await asyncio.sleep(0.05)
+    assert len(builder.built) == 2
+
+    write_rules(path, max_tokens=10, mtime=1_000_001)
+    await asyncio.sleep(0.05)
+    assert len(builder.built) == 3
+    assert engine.match("/token-bucket", "GET", {}).limiter.params == {"max_tokens": 10}
+
+    await engine.close()
+
+
+@pytest.mark.asyncio
+async def test_unparsable_file_is_not_retried_until_it_changes(tmp_path, monkeypatch):
+    path = tmp_path / "policies.yaml"
+    write_rules(path, max_tokens=5, mtime=1_000_000)
+    engine = PolicyEngine(path=str(path), build_limiter=Builder(), reload_interval_seconds=0.01)
+    await engine.load()
+
+    path.write_text("rules: [")
+    os.utime(path, (1_000_001, 1_000_001))
+    loads = 0
+    load = engine.load
+
+    async def counting_load():
+        nonlocal loads
+        loads += 1
+        await load()
+
+    monkeypatch.setattr(engine, "load", counting_load)
+    engine.start_watching()
+    await asyncio.sleep(0.05)
+
+    assert loads == 1
+    assert len(engine.index.policies) == 2
+    await engine.close()
+
+
+@pytest.mark.asyncio
+async def test_retired_limiters_close_once_in_flight_checks_finish(tmp_path):
+    path = tmp_path / "policies.yaml"
+    write_rules(path, max_tokens=5, mtime=1_000_000)
+    engine = PolicyEngine(path=str(path), build_limiter=Builder())
+    await engine.load()
+
+    previous = engine.index
+    retired = engine.match("/token-bucket", "GET", {}).limiter
+    kept = engine.match("/gcra", "GET", {}).limiter
+    previous.in_flight = 1
+
+    write_rules(path, max_tokens=10, mtime=1_000_001)
+    await engine.load()
+    assert engine.match("/gcra", "GET", {}).limiter is kept
+    await asyncio.sleep(0.1)
+    assert not retired.closed
+
+    previous.in_flight = 0
+    await asyncio.sleep(0.1)
+    assert retired.closed
+    assert not kept.closed
+
+    await engine.close()
+    assert kept.closed
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("shadow_enabled", [True, False])
+async def test_shadow_limits_are_ignored_unless_enabled(tmp_path, shadow_enabled):
+    path = tmp_path / "policies.yaml"
+    path.write_text("""
+rules:
+  - name: token-bucket
+    route: /token-bucket
+    algorithm: token_bucket
+    params: {max_tokens: 5}
+    shadow:
+      params: {max_tokens: 3}
+""")
+    engine = PolicyEngine(path=str(path), build_limiter=Builder(), shadow_enabled=shadow_enabled)
+    await engine.load()
+
+    policy = engine.match("/token-bucket", "GET", {})
+    assert policy.limiter.params == {"max_tokens": 5}
+    assert (policy.shadow is not None) is shadow_enabled
+    await engine.close()
+
+
+@pytest.mark.parametrize("value, tokens", [("4096", 4), ("5000", 5), ("abc", 1), ("inf", 1), ("1e400", 1),
+                                           ("nan", 1), ("-5", 1), ("1e12", 64)])
+def test_header_cost_falls_back_to_min_on_values_that_are_not_finite_numbers(value, tokens):
+    cost = RequestCost.from_rule({"header": "Content-Length", "per": 1024, "max": 64})
+    assert cost.for_request({"content-length": value}) == tokens
+
+
+PRECEDENCE_RULES = [
+    {"name": "api-prefix", "route": "/api/*", "algorithm": "token_bucket"},
+    {"name": "users-prefix", "route": "/api/users/*", "algorithm": "token_bucket"},
+    {"name": "users-exact", "route": "/api/users", "algorithm": "token_bucket"},
+    {"name": "reports-post", "route": "/api/reports", "method": "POST", "algorithm": "token_bucket"},
+    {"name": "orders", "route": "/orders", "algorithm": "token_bucket"},
+    {"name": "orders-post", "route": "/orders", "method": "POST", "algorithm": "token_bucket"},
+    {"name": "orders-tenant", "route": "/orders", "tenant": "acme", "algorithm": "token_bucket"},
+    {"name": "orders-header", "route": "/orders", "header": {"name": "X-Plan", "value": "gold"},
+     "algorithm": "token_bucket"},
+]
+
+
+def precedence_engine() -> PolicyEngine:
+    engine = PolicyEngine(path="", build_limiter=Builder())
+    engine.index, skipped = engine.compile(PRECEDENCE_RULES)
+    assert skipped == 0
+    return engine
+
+
+def matched(engine: PolicyEngine, path: str, method: str = "GET", headers: dict | None = None) -> str | None:
+    policy = engine.match(path, method, headers or {})
+    return None if policy is None else policy.name
+
+
+def test_exact_route_beats_prefixes_and_longest_prefix_wins():
+    engine = precedence_engine()
+
+    assert matched(engine, "/api/users") == "users-exact"
+    assert matched(engine, "/api/users/42") == "users-prefix"
+    assert matched(engine, "/api/users/42/") == "users-prefix"
+    assert matched(engine, "/api/teams/7") == "api-prefix"
+
+
+def test_method_beats_tenant_beats_header():
+    engine = precedence_engine()
+
+    gold = {"tenant_id": "acme", "x-plan": "gold"}
+
+    assert matched(engine, "/orders", "POST", gold) == "orders-post"
+    assert matched(engine, "/orders", "GET", gold) == "orders-tenant"
+    assert matched(engine, "/orders", "GET", {**gold, "tenant_id": "other"}) == "orders-header"
+    assert matched(engine, "/orders", "GET", {"x-plan": "silver"}) == "orders"
+
+
+def test_unmatched_conditions_fall_back_to_prefixes_then_to_no_policy():
+    engine = precedence_engine()
+
+    # The exact route only has a POST rule, so GET falls through to the prefix
+    assert matched(engine, "/api/reports", "POST") == "reports-post"
+    assert matched(engine, "/api/reports", "GET") == "api-prefix"
+    assert matched(engine, "/health") is None
+
+
+@pytest.mark.asyncio
+async def test_rule_whose_limiter_cannot_be_built_yet_is_retried(tmp_path):
+    path = tmp_path / "policies.yaml"
+    write_rules(path, max_tokens=5, mtime=1_000_000)
+    builder = Builder()
+    build = builder.__call__
+    unavailable = {"gcra"}
+
+    def flaky_build(algorithm: str, params: dict) -> FakeLimiter:
+        if algorithm in unavailable:
+            raise LimiterUnavailableError("Redis client not initialized")
+        return build(algorithm, params)
+
+    engine = PolicyEngine(path=str(path), build_limiter=flaky_build, reload_interval_seconds=0.01)
+    await engine.load()
+    assert [policy.name for policy in engine.index.policies] == ["token-bucket"]
+    token_bucket = engine.match("/token-bucket", "GET", {}).limiter
+
+    unavailable.clear()
+    engine.start_watching()
+    await asyncio.sleep(0.05)
+
+    # Only the skipped rule was built again; the file did not change and hybrid still fails for good
+    assert [policy.name for policy in engine.index.policies] == ["token-bucket", "gcra"]
+    assert engine.match("/token-bucket", "GET", {}).limiter is token_bucket
+    assert len(builder.built) == 2
+    await engine.close()
@@ -0,0 +1,109 @@
+import pytest
+from prometheus_client import REGISTRY
+
+from app.config import settings
+from app.core.factory import build_rate_limiter
+from app.core.fixed_window import FixedWindowRateLimiter
+from app.core.rejection_cache import RejectionCache
+from app.core.token_bucket import TokenBucketRateLimiter
+
+KEY = "rate_limit:{user:rejection-cache-test}"
+
+
+def make_cache(capacity: int = 10, max_ttl_seconds: float = 60, algorithm: str = "test") -> RejectionCache:
+    return RejectionCache(algorithm=algorithm, capacity=capacity, max_ttl_seconds=max_ttl_seconds)
+
+
+def counter(name: str, algorithm: str) -> float:
+    return REGISTRY.get_sample_value(name, {"algorithm": algorithm}) or 0.0
+
+
+def test_denial_lasts_until_its_retry_after():
+    cache = make_cache()
+    cache.deny(KEY, 100.0, 2.0, 5.0)
+
+    assert cache.denial(KEY, 101.0) == (1.0, 4.0)
+    assert cache.denial(KEY, 102.0) is None
+    # An expired entry is dropped on lookup
+    assert len(cache._denied_until) == 0
+
+
+def test_denial_is_clamped_to_the_max_ttl():
+    cache = make_cache(max_ttl_seconds=10)
+    cache.deny(KEY, 100.0, 3600.0)
+
+    assert cache.is_denied(KEY, 109.0)
+    assert not cache.is_denied(KEY, 110.0)
+
+
+def test_least_recently_used_denial_is_evicted_at_capacity():
+    cache = make_cache(capacity=2)
+    cache.deny("a", 100.0, 60.0)
+    cache.deny("b", 100.0, 60.0)
+    # A hit makes "a" the most recently used
+    assert cache.is_denied("a", 101.0)
+
+    cache.deny("c", 101.0, 60.0)
+
+    assert [cache.is_denied(key, 102.0) for key in ("a", "b", "c")] == [True, False, True]
+
+
+def test_hits_misses_and_evictions_are_counted():
+    algorithm = "counted-test"
+    before = {name: counter(name, algorithm) for name in (
+        "rejection_cache_hits_total", "rejection_cache_misses_total", "rejection_cache_evictions_total")}
+    cache = make_cache(capacity=1, algorithm=algorithm)
+
+    cache.deny("a", 100.0, 1.0)
+    cache.is_denied("a", 100.5)
+    cache.is_denied("a", 101.0)
+    cache.is_denied("b", 100.5)
+    cache.deny("a", 100.0, 1.0)
+    cache.deny("b", 100.0, 1.0)
+
+    assert {name: counter(name, algorithm) - value for name, value in before.items()} == {
+        "rejection_cache_hits_total": 1, "rejection_cache_misses_total": 2, "rejection_cache_evictions_total": 1}
+    assert REGISTRY.get_sample_value("rejection_cache_size", {"algorithm": algorithm}) == 1
+
+
+@pytest.mark.parametrize("algorithm, params", [
+    ("token_bucket", {"tokens_per_second": 1, "max_tokens": 5, "expiry_seconds": 60, "tokens_per_request": 1}),
+    ("gcra", {"requests_per_second": 1, "burst": 5}),
+    ("fixed_window", {"window_size_seconds": 60, "max_requests": 10}),
+    ("sliding_window_log", {"window_size_seconds": 60, "max_requests": 10}),
+])
+def test_memory_backend_builds_no_rejection_cache(monkeypatch, algorithm, params):
+    monkeypatch.setattr(settings, "rate_limiter_backend", "memory")
+    monkeypatch.setattr(settings, "rejection_cache_enabled", True)
+
+    assert build_rate_limiter(algorithm, params).rejection_cache is None
+
+
+@pytest.mark.asyncio
+async def test_cached_denial_keeps_the_reset_time(stand_in):
+    limiter = FixedWindowRateLimiter(window_size_seconds=60, max_requests=1, redis_client=stand_in,
+                                     rejection_cache=make_cache())
+    await limiter.check_request(KEY)
+    rejected = await limiter.check_request(KEY)
+    calls = stand_in.calls
+
+    cached = await limiter.check_request(KEY)
+
+    assert stand_in.calls == calls
+    assert not cached.allowed
+    assert cached.reset_seconds == pytest.approx(rejected.reset_seconds, abs=0.1)
+    assert "RateLimit-Reset" in dict(cached.headers())
+
+
+@pytest.mark.asyncio
+async def test_cached_batch_denial_keeps_the_reset_time(stand_in):
+    limiter = TokenBucketRateLimiter(tokens_per_second=1, max_tokens=2, redis_client=stand_in,
+                                     expiry_seconds=3600, tokens_per_request=1, rejection_cache=make_cache())
+    rejected = (await limiter.consume_many([(KEY, 2), (KEY, 1)]))[1]
+    calls = stand_in.calls
+
+    cached, = await limiter.consume_many([(KEY, 1)])
+
+    assert stand_in.calls == calls
+    assert not rejected.allowed and not cached.allowed
+    assert cached.reset_seconds == pytest.approx(rejected.reset_seconds, abs=0.1)
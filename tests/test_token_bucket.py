@@ -0,0 +1,77 @@
+import time
+
+import pytest
+
+from app.core.in_memory import InMemoryTokenBucketRateLimiter
+from app.core.rejection_cache import RejectionCache
+from app.core.token_bucket import TokenBucketRateLimiter
+from app.database.cluster import key_hash_slot
+
+KEY = "rate_limit:{user:token-bucket-a}"
+OTHER_SLOT_KEY = "rate_limit:{user:token-bucket-b}"
+
+
+def token_bucket(stand_in, tokens_per_second: float = 0.001, max_tokens: int = 5,
+                 rejection_cache: RejectionCache | None = None) -> TokenBucketRateLimiter:
+    return TokenBucketRateLimiter(tokens_per_second=tokens_per_second, max_tokens=max_tokens, redis_client=stand_in,
+                                  expiry_seconds=3600, tokens_per_request=1, rejection_cache=rejection_cache)
+
+
+@pytest.mark.asyncio
+async def test_pairs_for_one_key_are_applied_in_order(stand_in):
+    limiter = token_bucket(stand_in)
+
+    decisions = await limiter.consume_many([(KEY, 3), (KEY, 3), (KEY, 2)])
+
+    # The second pair sees the tokens the first took; the third still fits
+    assert [decision.allowed for decision in decisions] == [True, False, True]
+    assert decisions[2].remaining == 0
+
+
+@pytest.mark.asyncio
+async def test_cost_above_the_bucket_is_rejected_without_calling_redis(stand_in):
+    limiter = token_bucket(stand_in)
+
+    decision = await limiter.consume(KEY, 6)
+    batch_decisions = await limiter.consume_many([(KEY, 6), ("", 1)])
+
+    assert not decision.allowed and decision.limit == 0
+    assert [decision.allowed for decision in batch_decisions] == [False, False]
+    assert stand_in.calls == 0
+
+
+@pytest.mark.asyncio
+async def test_batch_makes_one_script_call_per_hash_slot(stand_in):
+    assert key_hash_slot(KEY) != key_hash_slot(OTHER_SLOT_KEY)
+    limiter = token_bucket(stand_in)
+
+    decisions = await limiter.consume_many([(KEY, 1), (OTHER_SLOT_KEY, 1), (KEY, 1)])
+
+    assert all(decision.allowed for decision in decisions)
+    assert stand_in.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_fallback_charges_the_same_cost(stand_in):
+    limiter = token_bucket(stand_in, max_tokens=100)
+    limiter.fallback = InMemoryTokenBucketRateLimiter(tokens_per_second=0.001, max_tokens=10, expiry_seconds=3600,
+                                                      tokens_per_request=1)
+    stand_in.failure = "refused"
+
+    decisions = [await limiter.consume(KEY, 4), *await limiter.consume_many([(KEY, 4), (KEY, 4)])]
+
+    assert [decision.allowed for decision in decisions] == [True, True, False]
+
+
+@pytest.mark.asyncio
+async def test_cached_denial_lasts_until_a_default_request_could_pass(stand_in):
+    cache = RejectionCache(algorithm="token_bucket", capacity=10, max_ttl_seconds=60)
+    limiter = token_bucket(stand_in, tokens_per_second=1, rejection_cache=cache)
+    await limiter.consume(KEY, 5)
+
+    decision = await limiter.consume(KEY, 3)
+
+    # The bucket holds 3 tokens in 3 s, but tokens_per_request (1) in 1 s
+    assert decision.retry_after_seconds == pytest.approx(3, abs=0.1)
+    retry_after_seconds, _ = cache.denial(KEY, time.time())
+    assert retry_after_seconds == pytest.approx(1, abs=0.1)
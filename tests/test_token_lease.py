@@ -0,0 +1,118 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.token_lease import TokenLeaseRateLimiter
+
+KEY = "rate_limit:{user:lease-test}"
+
+
+def lease_limiter(stand_in, tokens_per_second: float = 0.001, max_tokens: int = 100, lease_fraction: float = 0.1,
+                  lease_ttl_seconds: float = 1.0) -> TokenLeaseRateLimiter:
+    return TokenLeaseRateLimiter(tokens_per_second=tokens_per_second, max_tokens=max_tokens, redis_client=stand_in,
+                                 expiry_seconds=3600, tokens_per_request=1, lease_fraction=lease_fraction,
+                                 lease_ttl_seconds=lease_ttl_seconds)
+
+
+def bucket_tokens(stand_in, limiter: TokenLeaseRateLimiter) -> int:
+    # A lease call returning and requesting nothing only reads the bucket
+    _, tokens = stand_in.store.run('token_bucket_lease', [KEY], limiter.max_tokens, limiter.tokens_per_second,
+                                   0, 0, 0, limiter.expiry_seconds)
+    return int(float(tokens))
+
+
+def test_small_buckets_lease_more_than_one_token(stand_in):
+    # The factory defaults: a 10% lease of 5 tokens would be one Redis call per check
+    assert lease_limiter(stand_in, tokens_per_second=1, max_tokens=5).lease_size == 4
+    assert lease_limiter(stand_in, max_tokens=2).lease_size == 2
+    assert lease_limiter(stand_in, max_tokens=1000).lease_size == 100
+
+
+@pytest.mark.asyncio
+async def test_checks_spend_the_lease_before_renewing(stand_in):
+    limiter = lease_limiter(stand_in)
+
+    for _ in range(limiter.lease_size):
+        assert await limiter.is_request_allowed(KEY)
+    assert stand_in.calls == 1
+    assert bucket_tokens(stand_in, limiter) == 90
+
+    assert await limiter.is_request_allowed(KEY)
+    assert stand_in.calls == 2
+    assert bucket_tokens(stand_in, limiter) == 80
+
+    await limiter.close()
+
+
+@pytest.mark.asyncio
+async def test_empty_bucket_rejects_locally_until_the_lease_expires(stand_in):
+    limiter = lease_limiter(stand_in, max_tokens=10, lease_fraction=1.0)
+
+    for _ in range(10):
+        assert await limiter.is_request_allowed(KEY)
+    decision = await limiter.check_request(KEY)
+    calls = stand_in.calls
+
+    assert not decision.allowed
+    assert decision.retry_after_seconds > 0
+    assert not await limiter.is_request_allowed(KEY)
+    assert stand_in.calls == calls
+
+    await limiter.close()
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_is_returned_and_renewed(stand_in):
+    limiter = lease_limiter(stand_in, lease_ttl_seconds=0.05)
+
+    assert await limiter.is_request_allowed(KEY)
+    assert bucket_tokens(stand_in, limiter) == 90
+
+    # The sweeper hands back the 9 tokens of a lease nobody renewed
+    await asyncio.sleep(0.12)
+    assert bucket_tokens(stand_in, limiter) == 99
+
+    assert await limiter.is_request_allowed(KEY)
+    assert bucket_tokens(stand_in, limiter) == 89
+
+    await limiter.close()
+    assert bucket_tokens(stand_in, limiter) == 98
+
+
+@pytest.mark.asyncio
+async def test_close_gives_unused_tokens_back(stand_in):
+    limiter = lease_limiter(stand_in)
+
+    for _ in range(3):
+        assert await limiter.is_request_allowed(KEY)
+    assert bucket_tokens(stand_in, limiter) == 90
+
+    await limiter.close()
+    assert bucket_tokens(stand_in, limiter) == 97
+
+
+@pytest.mark.asyncio
+async def test_workers_stay_within_the_over_admission_bound(stand_in):
+    tokens_per_second, max_tokens, lease_ttl_seconds = 50, 20, 0.1
+    workers = [lease_limiter(stand_in, tokens_per_second=tokens_per_second, max_tokens=max_tokens,
+                             lease_fraction=0.25, lease_ttl_seconds=lease_ttl_seconds) for _ in range(3)]
+    admitted = 0
+    deadline = time.monotonic() + 0.5
+
+    async def client(limiter: TokenLeaseRateLimiter):
+        nonlocal admitted
+        while time.monotonic() < deadline:
+            admitted += await limiter.is_request_allowed(KEY)
+            await asyncio.sleep(0.001)
+
+    start = time.monotonic()
+    await asyncio.gather(*(client(limiter) for limiter in workers for _ in range(5)))
+    elapsed = time.monotonic() - start
+
+    assert admitted <= max_tokens + tokens_per_second * (elapsed + lease_ttl_seconds)
+    # Leasing must not starve the key either: at least the initial burst gets through
+    assert admitted >= max_tokens
+
+    for limiter in workers:
+        await limiter.close()
@@ -0,0 +1,40 @@
+import pytest
+import redis.asyncio as redis_asyncio
+from redis.asyncio.connection import Connection
+from redis.exceptions import MaxConnectionsError
+
+from app.database.topology import STANDALONE, RedisTopology, TimedBlockingConnectionPool
+
+
+class IdleConnection(Connection):
+    """A connection that never talks to a server."""
+
+    async def connect(self):
+        pass
+
+    @property
+    def is_connected(self) -> bool:
+        return True
+
+    async def can_read_destructive(self) -> bool:
+        return False
+
+
+@pytest.mark.asyncio
+async def test_full_standalone_pool_waits_then_raises_max_connections():
+    pool = TimedBlockingConnectionPool(connection_class=IdleConnection, max_connections=1, timeout=0.01)
+    topology = RedisTopology(STANDALONE, *[redis_asyncio.Redis(connection_pool=pool)] * 2)
+
+    await pool.get_connection()
+    with pytest.raises(MaxConnectionsError):
+        await pool.get_connection()
+
+    assert topology.pool_stats() == [("None:None", "primary", 1, 0, 1)]
+
+
+def test_pool_stats_survive_missing_redis_internals():
+    class Client:
+        connection_pool = object()
+
+    client = Client()
+    assert RedisTopology(STANDALONE, client, client).pool_stats() == []